@@ -1,192 +1,4113 @@
+# Extra stdlib imports for the AI Finder helpers (app.py provides the rest)
+import bisect
+import csv
+import heapq
+import math
+import queue
+import tempfile
+from contextlib import ExitStack, contextmanager, nullcontext
+from itertools import islice
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+import importlib
+
+# -----------------------------
+# Process-wide State (survives Streamlit reruns)
+# -----------------------------
+@st.cache_resource
+def _process_registry():
+    return {}, threading.RLock()
+
+
+# Outside `streamlit run` (the CLI, tests) st.cache_resource does not cache
+# and the script is only executed once, so a module global is process-wide
+_bare_registry = ({}, threading.RLock())
+
+
+def process_singleton(name, factory):
+    """The object registered as `name` for this server process, created by
+    factory() on first use.
+
+    Streamlit re-executes this script on every rerun, so a module global
+    would be rebuilt each time; locks, pools, caches and counters that must
+    be shared by every session and rerun are kept here instead.
+    """
+    registry, lock = _process_registry() if st.runtime.exists() else _bare_registry
+    with lock:
+        if name not in registry:
+            registry[name] = factory()
+        return registry[name]
+
+
+# -----------------------------
+# Performance Telemetry (spans, latency histograms, counters)
+# -----------------------------
+# Upper bounds (seconds) of the latency histogram buckets; the last is +Inf
+TELEMETRY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PerfTelemetry:
+    """In-process tracing: per-operation latency histograms, event counters
+    and a ring buffer of recent spans.
+
+    Recording a span is two perf_counter() calls, a bisect and a dict update
+    under one lock, so it is cheap enough to leave on in production.
+    """
+
+    def __init__(self, recent_spans=500):
+        self.enabled = True
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.histograms = {}  # operation -> [bucket counts..., +Inf count, sum, max]
+        self.counters = {}
+        self.recent = deque(maxlen=recent_spans)
+        self._local = threading.local()
+
+    def observe(self, operation, seconds, parent=None, error=False):
+        if not self.enabled:
+            return
+        slot = bisect.bisect_left(TELEMETRY_BUCKETS, seconds)
+        with self.lock:
+            hist = self.histograms.get(operation)
+            if hist is None:
+                hist = self.histograms[operation] = [0] * (len(TELEMETRY_BUCKETS) + 1) + [0.0, 0.0]
+            hist[slot] += 1
+            hist[-2] += seconds
+            hist[-1] = max(hist[-1], seconds)
+            self.recent.append((time.time(), operation, parent, seconds, error))
+
+    def count(self, event, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[event] = self.counters.get(event, 0) + amount
+
+    @contextmanager
+    def span(self, operation):
+        """Time a block; nested spans record the enclosing span as parent"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        stack.append(operation)
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            stack.pop()
+            self.observe(operation, time.perf_counter() - start, parent, error)
+
+    def traced(self, operation):
+        """Decorator form of span()"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(operation):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _quantile(hist, q):
+        """Bucket upper bound that covers quantile q (None if no samples)"""
+        counts = hist[:-2]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        running = 0
+        for bound, n in zip(TELEMETRY_BUCKETS + (hist[-1],), counts):
+            running += n
+            if running >= rank:
+                return min(bound, hist[-1])
+        return hist[-1]
+
+    def snapshot(self):
+        """JSON-friendly view of everything recorded so far"""
+        with self.lock:
+            histograms = {op: list(h) for op, h in self.histograms.items()}
+            counters = dict(self.counters)
+            recent = list(self.recent)
+        operations = {}
+        for op, hist in sorted(histograms.items()):
+            calls = sum(hist[:-2])
+            operations[op] = {
+                'count': calls,
+                'total_seconds': round(hist[-2], 6),
+                'mean_seconds': round(hist[-2] / calls, 6) if calls else 0.0,
+                'p50_seconds': self._quantile(hist, 0.5),
+                'p95_seconds': self._quantile(hist, 0.95),
+                'max_seconds': round(hist[-1], 6),
+                'buckets': dict(zip([str(b) for b in TELEMETRY_BUCKETS] + ['+Inf'], hist[:-2])),
+            }
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'operations': operations,
+            'counters': dict(sorted(counters.items())),
+            'recent_spans': [
+                {'at': at, 'operation': op, 'parent': parent,
+                 'seconds': round(seconds, 6), 'error': error}
+                for at, op, parent, seconds, error in recent
+            ],
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix='codeflix'):
+        """Prometheus text exposition format (histograms are cumulative)"""
+        with self.lock:
+            histograms = {op: list(h) for op, h in self.histograms.items()}
+            counters = dict(self.counters)
+        lines = [
+            f'# HELP {prefix}_operation_duration_seconds Latency of traced operations.',
+            f'# TYPE {prefix}_operation_duration_seconds histogram',
+        ]
+        for op, hist in sorted(histograms.items()):
+            running = 0
+            for bound, n in zip([str(b) for b in TELEMETRY_BUCKETS] + ['+Inf'], hist[:-2]):
+                running += n
+                lines.append(f'{prefix}_operation_duration_seconds_bucket{{operation="{op}",le="{bound}"}} {running}')
+            lines.append(f'{prefix}_operation_duration_seconds_sum{{operation="{op}"}} {hist[-2]:.6f}')
+            lines.append(f'{prefix}_operation_duration_seconds_count{{operation="{op}"}} {running}')
+        lines += [
+            f'# HELP {prefix}_events_total Retries, fallbacks, cache hits and other hot-path events.',
+            f'# TYPE {prefix}_events_total counter',
+        ]
+        for event, value in sorted(counters.items()):
+            lines.append(f'{prefix}_events_total{{event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.recent.clear()
+            self.started = time.time()
+
+
+# One registry per process, shared by every session
+telemetry = process_singleton('telemetry', PerfTelemetry)
+telemetry.enabled = CONFIG.get('telemetry_enabled', True)
+
+
+# -----------------------------
+# Shared HTTP Client Layer (pooled sessions + token-bucket rate limits)
+# -----------------------------
+# requests/second and burst size per upstream; override via CONFIG['rate_limits'].
+# '<upstream>_bulk' entries cap what background_requests() work may take of it
+UPSTREAM_LIMITS = {
+    'omdb': {'rate': 1.0, 'burst': 3},
+    'omdb_bulk': {'rate': 0.4, 'burst': 1},
+    'gemini': {'rate': 0.5, 'burst': 2},
+    'crunchyroll': {'rate': 2.0, 'burst': 4},
+}
+RATE_LIMIT_MAX_WAIT = 10.0  # seconds a caller may queue before giving up
+
+
+class TokenBucket:
+    """Thread-safe token bucket that queues callers in arrival order.
+
+    Each caller reserves the next free slot under the lock (tokens may go
+    negative, which is the queue), then sleeps only until its own slot -
+    nobody sleeps blindly and nobody can jump the queue.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self, max_wait):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def acquire(self, max_wait=RATE_LIMIT_MAX_WAIT):
+        """Block until a token is ours; False if the queue is longer than max_wait"""
+        wait = self._reserve(max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in SQLite so every Streamlit worker
+    process on the host draws from the same budget."""
+
+    def __init__(self, name, rate, burst, db_path):
+        super().__init__(rate, burst)
+        self.name = name
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            conn.execute(
+                'INSERT OR IGNORE INTO rate_limit_buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                (name, self.burst, time.time())
+            )
+
+    def _reserve(self, max_wait):
+        # BEGIN IMMEDIATE takes the database write lock, serializing processes
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            tokens, updated = conn.execute(
+                'SELECT tokens, updated FROM rate_limit_buckets WHERE name = ?', (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            if wait > max_wait:
+                conn.execute('ROLLBACK')
+                return None
+            conn.execute(
+                'UPDATE rate_limit_buckets SET tokens = ?, updated = ? WHERE name = ?',
+                (tokens - 1, now, self.name)
+            )
+            conn.execute('COMMIT')
+            return wait
+        finally:
+            conn.close()
+
+
+_rate_limiters, _http_sessions, _client_lock = process_singleton(
+    'http_clients', lambda: ({}, {}, threading.Lock()))
+
+def get_rate_limiter(upstream):
+    """Process-wide token bucket for an upstream (cross-process if configured)"""
+    with _client_lock:
+        if upstream not in _rate_limiters:
+            limits = dict(UPSTREAM_LIMITS.get(upstream, {'rate': 1.0, 'burst': 1}))
+            limits.update(CONFIG.get('rate_limits', {}).get(upstream, {}))
+            shared_path = CONFIG.get('shared_rate_limit_path')
+            if shared_path:
+                bucket = SQLiteTokenBucket(upstream, limits['rate'], limits['burst'], shared_path)
+            else:
+                bucket = TokenBucket(limits['rate'], limits['burst'])
+            _rate_limiters[upstream] = bucket
+        return _rate_limiters[upstream]
+
+
+def get_http_session(upstream):
+    """Keep-alive session with a connection pool, one per upstream per process"""
+    with _client_lock:
+        if upstream not in _http_sessions:
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_sessions[upstream] = session
+        return _http_sessions[upstream]
+
+
+# Consecutive failures that open a breaker, and seconds it stays open before
+# a single half-open probe; override via CONFIG['circuit_breakers']
+UPSTREAM_BREAKERS = {
+    'omdb': {'failure_threshold': 3, 'reset_timeout': 30.0},
+    'gemini': {'failure_threshold': 2, 'reset_timeout': 60.0},
+    'crunchyroll': {'failure_threshold': 2, 'reset_timeout': 120.0},
+}
+RETRY_BACKOFF_BASE = 0.5  # seconds; attempt n sleeps up to base * 2**n
+RETRY_BACKOFF_CAP = 8.0
+OMDB_CALL_DEADLINE = 20.0  # seconds for one OMDB lookup including its retries
+
+
+class CircuitOpenError(APIError):
+    """The upstream's breaker is open: use local data instead of calling it"""
+
+
+class DeadlineExceededError(APIError):
+    """The caller's overall deadline has passed"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one upstream.
+
+    Closed: calls go through, consecutive failures are counted. Open:
+    calls fail fast with CircuitOpenError until reset_timeout has passed.
+    Half-open: exactly one probe call is let through; its outcome closes or
+    re-opens the breaker. A probe that never reports back is replaced after
+    another reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+
+    def _locked(self, step):
+        with self.lock:
+            return step(time.time())
+
+    def allow(self):
+        """True if a call may go out now (claims the probe when half-open)"""
+        return self._locked(self._allow)
+
+    def record_success(self):
+        self._locked(self._success)
+
+    def record_failure(self):
+        self._locked(self._failure)
+
+    def release_probe(self):
+        """Give back a half-open probe that was claimed but never sent"""
+        self._locked(self._release_probe)
+
+    def is_open(self):
+        """True while calls would be rejected (no state change)"""
+        return self._locked(lambda now: self.state == 'open' and now - self.opened_at < self.reset_timeout)
+
+    def _allow(self, now):
+        if self.state == 'closed':
+            return True
+        if self.state == 'open':
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = 'half_open'
+            self.probe_started = now
+            return True
+        # Half-open: the probe is out; replace it only if it went missing
+        if now - self.probe_started >= self.reset_timeout:
+            self.probe_started = now
+            return True
+        return False
+
+    def _release_probe(self, now):
+        if self.state == 'half_open':
+            self.probe_started = 0.0
+
+    def _success(self, now):
+        if self.state != 'closed':
+            logging.info(f"Circuit for {self.name} closed")
+        self.state = 'closed'
+        self.failures = 0
+
+    def _failure(self, now):
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logging.warning(f"Circuit for {self.name} opened after {self.failures} failure(s)")
+                telemetry.count(f"{self.name}.breaker_opened")
+            self.state = 'open'
+            self.opened_at = now
+
+
+class SQLiteCircuitBreaker(CircuitBreaker):
+    """Circuit breaker whose state lives in SQLite so every Streamlit worker
+    process on the host sees the same outage."""
+
+    def __init__(self, name, failure_threshold, reset_timeout, db_path):
+        super().__init__(name, failure_threshold, reset_timeout)
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS circuit_breakers (
+                    name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    failures INTEGER NOT NULL,
+                    opened_at REAL NOT NULL,
+                    probe_started REAL NOT NULL
+                )
+            ''')
+            conn.execute(
+                "INSERT OR IGNORE INTO circuit_breakers VALUES (?, 'closed', 0, 0, 0)", (name,)
+            )
+
+    def _locked(self, step):
+        # BEGIN IMMEDIATE takes the database write lock, serializing processes
+        with self.lock:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                self.state, self.failures, self.opened_at, self.probe_started = conn.execute(
+                    'SELECT state, failures, opened_at, probe_started FROM circuit_breakers WHERE name = ?',
+                    (self.name,)
+                ).fetchone()
+                result = step(time.time())
+                conn.execute(
+                    'UPDATE circuit_breakers SET state = ?, failures = ?, opened_at = ?, probe_started = ? '
+                    'WHERE name = ?',
+                    (self.state, self.failures, self.opened_at, self.probe_started, self.name)
+                )
+                conn.execute('COMMIT')
+                return result
+            finally:
+                conn.close()
+
+
+_circuit_breakers = process_singleton('circuit_breakers', dict)  # guarded by _client_lock
+
+
+def get_circuit_breaker(upstream):
+    """Process-wide breaker for an upstream (cross-process if configured)"""
+    with _client_lock:
+        if upstream not in _circuit_breakers:
+            settings = dict(UPSTREAM_BREAKERS.get(upstream, {'failure_threshold': 3, 'reset_timeout': 30.0}))
+            settings.update(CONFIG.get('circuit_breakers', {}).get(upstream, {}))
+            shared_path = CONFIG.get('shared_rate_limit_path')
+            if shared_path:
+                breaker = SQLiteCircuitBreaker(upstream, db_path=shared_path, **settings)
+            else:
+                breaker = CircuitBreaker(upstream, **settings)
+            _circuit_breakers[upstream] = breaker
+        return _circuit_breakers[upstream]
+
+
+def circuit_breaker_states():
+    """{upstream: state} for every breaker created in this process"""
+    with _client_lock:
+        breakers = list(_circuit_breakers.values())
+    return {breaker.name: breaker._locked(lambda now: breaker.state) for breaker in breakers}
+
+
+_deadline_local = threading.local()
+
+
+@contextmanager
+def request_deadline(seconds):
+    """Give every upstream call made by this thread inside the block an
+    overall budget of `seconds`. Nested deadlines can only tighten it."""
+    previous = getattr(_deadline_local, 'deadline', None)
+    deadline = time.monotonic() + seconds
+    _deadline_local.deadline = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _deadline_local.deadline = previous
+
+
+def deadline_remaining():
+    """Seconds left of this thread's deadline (inf when none is set)"""
+    deadline = getattr(_deadline_local, 'deadline', None)
+    return math.inf if deadline is None else deadline - time.monotonic()
+
+
+_background_local = threading.local()
+
+
+@contextmanager
+def background_requests():
+    """Mark upstream calls made by this thread inside the block as background
+    work: they queue on the upstream's lower-rate '<upstream>_bulk' bucket
+    before the shared one, so they can never take more than that share of
+    the budget and interactive calls keep the rest."""
+    previous = getattr(_background_local, 'active', False)
+    _background_local.active = True
+    try:
+        yield
+    finally:
+        _background_local.active = previous
+
+
+def _limiters_for(upstream):
+    """Token buckets an upstream call has to pass, in acquisition order"""
+    bulk = f"{upstream}_bulk"
+    if getattr(_background_local, 'active', False) and bulk in UPSTREAM_LIMITS:
+        return [get_rate_limiter(bulk), get_rate_limiter(upstream)]
+    return [get_rate_limiter(upstream)]
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)"""
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+
+def upstream_url(upstream, default):
+    """Base URL for an upstream; CONFIG['upstream_urls'] can point it elsewhere
+    (a staging proxy, or the local stubs the benchmark suite starts)"""
+    return CONFIG.get('upstream_urls', {}).get(upstream, default).rstrip('/')
+
+
+def upstream_request(upstream, method, url, **kwargs):
+    """Rate-limited, breaker-guarded request over the upstream's pooled session.
+
+    Raises APIError when the breaker is open, the limiter queue is too long
+    to wait out or the thread's request_deadline() has passed, so callers
+    can go straight to their fallback instead of piling up. The timeout is
+    capped to whatever is left of the deadline.
+    """
+    breaker = get_circuit_breaker(upstream)
+    if not breaker.allow():
+        telemetry.count(f"{upstream}.breaker_rejected")
+        raise CircuitOpenError(f"Circuit for {upstream} is open")
+    try:
+        remaining = deadline_remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"Deadline passed before calling {upstream}")
+        with telemetry.span(f"ratelimit.{upstream}.wait"):
+            acquired = all(limiter.acquire(min(RATE_LIMIT_MAX_WAIT, deadline_remaining()))
+                           for limiter in _limiters_for(upstream))
+        if not acquired:
+            telemetry.count(f"{upstream}.rate_limit_rejected")
+            raise APIError(f"Rate limit queue for {upstream} is full")
+        remaining = deadline_remaining()
+        if remaining != math.inf:
+            kwargs['timeout'] = max(0.1, min(kwargs.get('timeout') or remaining, remaining))
+        with telemetry.span(f"http.{upstream}"):
+            response = get_http_session(upstream).request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+    except APIError:
+        # Nothing was sent, so a claimed half-open probe goes to the next caller
+        breaker.release_probe()
+        raise
+    if response.status_code == 429:
+        telemetry.count(f"{upstream}.http_429")
+    elif response.status_code >= 500:
+        telemetry.count(f"{upstream}.http_5xx")
+    # 429 means the upstream is up (just busy), so only 5xx counts against it
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+# -----------------------------
+# Shared OMDB Response Cache (disk-backed, shared across sessions)
+# -----------------------------
+class OMDbResponseCache:
+    """SQLite-backed OMDB response cache with per-kind TTLs and LRU eviction.
+
+    Entries are keyed on the normalized request params (API key dropped,
+    values stripped and lowercased), so every Streamlit session and every
+    process restart shares the same responses. "Movie not found" answers
+    are cached as negative entries with a shorter TTL.
+    """
+
+    # Seconds each kind of response stays fresh
+    TTLS = {
+        'search': 6 * 3600,
+        'details': 24 * 3600,
+        'negative': 30 * 60,
+    }
+
+    def __init__(self, db_path=None, max_entries=None):
+        self.db_path = db_path or CONFIG.get('omdb_cache_path', 'omdb_cache.db')
+        self.max_entries = max_entries or int(CONFIG.get('omdb_cache_max_entries', 20000))
+        self.lock = threading.Lock()
+        self.writes_since_evict = 0
+        self.counters = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'expired': 0,
+                         'stores': 0, 'evictions': 0}
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS omdb_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                negative INTEGER DEFAULT 0,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_omdb_cache_access ON omdb_cache(last_access)')
+        self.conn.commit()
+
+    @staticmethod
+    def request_kind(params):
+        """Classify a request: 's=' searches vs 't='/'i=' detail lookups"""
+        return 'search' if params.get('s') else 'details'
+
+    @staticmethod
+    def make_key(params):
+        """Normalize request params into a stable cache key"""
+        normalized = {
+            str(k).lower(): " ".join(str(v).split()).lower()
+            for k, v in params.items()
+            if k != 'apikey' and v not in (None, '')
+        }
+        raw = json.dumps(normalized, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, params):
+        """Return the cached payload for params, or None on a miss"""
+        key = self.make_key(params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT payload, negative, expires_at FROM omdb_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+            payload, negative, expires_at = row
+            if expires_at < now:
+                self.conn.execute('DELETE FROM omdb_cache WHERE key = ?', (key,))
+                self.conn.commit()
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return None
+            self.conn.execute('UPDATE omdb_cache SET last_access = ? WHERE key = ?', (now, key))
+            self.conn.commit()
+            self.counters['hits'] += 1
+            if negative:
+                self.counters['negative_hits'] += 1
+        return json.loads(payload)
+
+    def set(self, params, data, negative=False):
+        """Store a response; negative entries record a "not found" answer"""
+        kind = self.request_kind(params)
+        ttl = self.TTLS['negative'] if negative else self.TTLS[kind]
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                '''INSERT OR REPLACE INTO omdb_cache (key, kind, payload, negative, expires_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (self.make_key(params), kind, json.dumps(data), int(negative), now + ttl, now)
+            )
+            self.counters['stores'] += 1
+            self.writes_since_evict += 1
+            if self.writes_since_evict >= 100:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drop expired rows, then least recently used rows above max_entries"""
+        self.writes_since_evict = 0
+        c = self.conn.execute('DELETE FROM omdb_cache WHERE expires_at < ?', (time.time(),))
+        evicted = c.rowcount
+        total = self.conn.execute('SELECT COUNT(*) FROM omdb_cache').fetchone()[0]
+        overflow = total - self.max_entries
+        if overflow > 0:
+            c = self.conn.execute(
+                '''DELETE FROM omdb_cache WHERE key IN (
+                       SELECT key FROM omdb_cache ORDER BY last_access ASC LIMIT ?)''',
+                (overflow,)
+            )
+            evicted += c.rowcount
+        self.counters['evictions'] += max(evicted, 0)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM omdb_cache')
+            self.conn.commit()
+
+    def close(self):
+        """Close the connection; waits for a get/set running in another
+        thread (closing under it crashes the sqlite3 module). Later calls
+        raise sqlite3.ProgrammingError, which callers treat as a miss."""
+        with self.lock:
+            self.conn.close()
+
+    def stats(self):
+        """Hit/miss counters for this process plus the shared entry count"""
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM omdb_cache').fetchone()[0]
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['entries'] = entries
+        stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups else 0.0
+        return stats
+
+
+# _omdb_inflight: cache key -> Event set when the fetch finishes
+_omdb_state, _omdb_cache_lock, _omdb_inflight, _omdb_inflight_lock = process_singleton(
+    'omdb', lambda: ({'cache': None}, threading.Lock(), {}, threading.Lock()))
+
+
+def get_omdb_response_cache():
+    """Process-wide OMDB response cache (one SQLite connection per process)"""
+    if _omdb_state['cache'] is None:
+        with _omdb_cache_lock:
+            if _omdb_state['cache'] is None:
+                _omdb_state['cache'] = OMDbResponseCache()
+    return _omdb_state['cache']
+
+
+OMDB_API_BASE = "http://www.omdbapi.com"
+
+
+def get_streaming_finder():
+    """Process-wide EnhancedStreamingServiceFinder (it builds its own
+    AnimeIntegration, so it is not rebuilt per lookup)"""
+    return process_singleton('streaming_finder', EnhancedStreamingServiceFinder)
+
+
+def get_omdb_client():
+    """Process-wide SharedOMDbAPI; every OMDB lookup should go through it"""
+    return process_singleton('omdb_client', SharedOMDbAPI)
+
+
+class SharedOMDbAPI(RateLimitedOMDbAPI):
+    """RateLimitedOMDbAPI whose calls go through the shared response cache.
+
+    The key, URL and retry count are read from CONFIG on every call, so one
+    instance serves the whole process (see get_omdb_client()).
+    """
+
+    def __init__(self):
+        # Not super().__init__(): that builds a new streaming finder each time
+        self.last_call_time = 0
+        self.min_interval = 1.0
+        self.streaming_finder = get_streaming_finder()
+
+    @property
+    def api_key(self):
+        return CONFIG['omdb_api_key']
+
+    @property
+    def base_url(self):
+        return upstream_url('omdb', OMDB_API_BASE) + "/"
+
+    @property
+    def max_retries(self):
+        return CONFIG['max_retries']
+
+    @telemetry.traced("omdb.call")
+    def robust_omdb_call(self, params, max_retries=None):
+        """Serve from the shared cache, fetching and storing on a miss"""
+        cache = get_omdb_response_cache()
+        cached = self._cached(cache, params)
+        if cached is not None:
+            return self._answer_from(cached, params)
+
+        # Single-flight: if this exact request is already being fetched (e.g.
+        # by a background prefetch), wait for it instead of fetching twice
+        key = cache.make_key(params)
+        with _omdb_inflight_lock:
+            event = _omdb_inflight.get(key)
+            if event is None:
+                _omdb_inflight[key] = threading.Event()
+        if event is not None:
+            telemetry.count("omdb.coalesced")
+            with telemetry.span("omdb.coalesced_wait"):
+                event.wait(timeout=30)
+            cached = self._cached(cache, params)
+            if cached is not None:
+                return self._answer_from(cached, params)
+
+        try:
+            data = self._fetch_omdb(params, max_retries)
+            if data is None:
+                # Network/HTTP failure or open breaker: never cache, answer
+                # searches from the local catalogue index
+                telemetry.count("omdb.fallback")
+                return self._local_fallback(params)
+
+            if data.get("Response") == "True":
+                self._store(cache, params, data)
+                return data
+
+            error_msg = data.get('Error', 'Unknown error')
+            logging.warning(f"OMDB API error: {error_msg}")
+            if "not found" in error_msg.lower():
+                self._store(cache, params, data, negative=True)
+            telemetry.count("omdb.fallback")
+            return self._get_fallback_data(params.get("s", ""))
+        finally:
+            if event is None:
+                with _omdb_inflight_lock:
+                    _omdb_inflight.pop(key).set()
+
+    def _cached(self, cache, params):
+        try:
+            with telemetry.span("sqlite.omdb_cache.get"):
+                cached = cache.get(params)
+        except sqlite3.Error as e:
+            logging.warning(f"OMDB cache read failed: {e}")
+            return None
+        telemetry.count("omdb.cache_hit" if cached is not None else "omdb.cache_miss")
+        return cached
+
+    def _answer_from(self, cached, params):
+        if cached.get("Response") == "True":
+            return cached
+        # Negative entry - same answer the API gave last time
+        telemetry.count("omdb.fallback")
+        return self._get_fallback_data(params.get("s", ""))
+
+    def _local_fallback(self, params):
+        """OMDB-shaped answer from the local index while OMDB is unreachable"""
+        query = params.get("s", "")
+        results = self._search_local_database(query, params.get("type", "movie")) if query else []
+        if not results:
+            return {"Response": "False", "Error": "Movie database unavailable"}
+        return {"Response": "True", "Search": results, "totalResults": str(len(results))}
+
+    def _search_local_database(self, query, search_type):
+        """Ranked, typo-tolerant search of the local catalogue as fallback"""
+        return [
+            {
+                "Title": movie["title"],
+                "Year": str(movie["year"]),
+                "imdbID": movie["id"],
+                "Type": "movie",
+                "Poster": "N/A",
+                "Genre": movie["genre"]
+            }
+            for movie in get_catalog_search_index().search(query, limit=8, kind='movie')
+        ]
+
+    def _store(self, cache, params, data, negative=False):
+        try:
+            with telemetry.span("sqlite.omdb_cache.set"):
+                cache.set(params, data, negative=negative)
+        except sqlite3.Error as e:
+            logging.warning(f"OMDB cache write failed: {e}")
+
+    def _fetch_omdb(self, params, max_retries=None):
+        """Raw OMDB request: parsed JSON (either Response value), or None on failure.
+
+        Retries 429s, 5xx and network errors with jittered exponential
+        backoff, but never past OMDB_CALL_DEADLINE or the caller's own
+        request_deadline(); an open breaker fails fast to the fallback.
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        with request_deadline(OMDB_CALL_DEADLINE):
+            for attempt in range(max_retries):
+                if attempt:
+                    delay = backoff_delay(attempt - 1)
+                    if delay >= deadline_remaining():
+                        logging.warning("OMDB retry budget exhausted, using fallback")
+                        return None
+                    telemetry.count("omdb.retry")
+                    with telemetry.span("omdb.retry_backoff"):
+                        time.sleep(delay)
+                try:
+                    response = upstream_request('omdb', 'GET', self.base_url, params=params, timeout=15)
+                    if response.status_code == 429 or response.status_code >= 500:
+                        logging.warning(f"API returned status {response.status_code}, attempt {attempt + 1}")
+                        continue
+                    if response.status_code != 200:
+                        logging.warning(f"API returned status {response.status_code}, not retrying")
+                        return None
+                    return response.json()
+
+                except APIError as e:
+                    logging.warning(f"OMDB call skipped: {e}")
+                    return None
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"Attempt {attempt + 1} failed: {e}")
+
+        logging.error(f"Failed to fetch from OMDB after {max_retries} attempts, using fallback")
+        return None
+
+
+# The search page is only scraped for liveness (_parse_anime_results answers
+# from the built-in list), so there is no reason to wait long for it
+CRUNCHYROLL_TIMEOUT = 4.0
+
+
+class SharedAnimeIntegration(AnimeIntegration):
+    """AnimeIntegration that goes through the shared Crunchyroll session and limiter"""
+
+    def __init__(self):
+        super().__init__()
+        self.base_url = upstream_url('crunchyroll', self.base_url)
+        self.search_url = f"{self.base_url}/search"
+
+    @telemetry.traced("crunchyroll.search")
+    def fetch_anime(self, query):
+        """Live Crunchyroll search. Raises on a non-200 answer, network error
+        or open breaker, so search_all_sources() can report the source as
+        'failed'; use search_anime() for an answer that never raises."""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+        response = upstream_request(
+            'crunchyroll', 'GET', self.search_url,
+            params={"q": query}, headers=headers, timeout=CRUNCHYROLL_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Crunchyroll returned status {response.status_code}", response=response)
+        return self._parse_anime_results(response.text, query)
+
+    def search_anime(self, query):
+        """Search for anime on Crunchyroll, falling back to the built-in list"""
+        try:
+            return self.fetch_anime(query)
+
+        except CircuitOpenError:
+            telemetry.count("crunchyroll.fallback")
+            return self._get_fallback_anime_results(query)
+        except Exception as e:
+            logging.error(f"Error searching anime: {e}")
+            telemetry.count("crunchyroll.fallback")
+            return self._get_fallback_anime_results(query)
+
+    def _get_fallback_anime_results(self, query):
+        """Ranked search of the built-in anime list (whole list for no query)"""
+        index = get_catalog_search_index()
+        if not query or not query.strip():
+            return [self._public_anime(a) for a in index.entries if a['kind'] == 'anime']
+        matches = index.search(query, limit=8, kind='anime')
+        if not matches:
+            matches = [a for a in index.entries if a['kind'] == 'anime'][:3]
+        return [self._public_anime(a) for a in matches]
+
+    @staticmethod
+    def _public_anime(entry):
+        return {k: v for k, v in entry.items() if k not in ('kind', 'id')}
+
+
+# -----------------------------
+# Streaming Gemini Chat with a Shared Response Cache
+# -----------------------------
+GEMINI_PROMPT_VERSION = "movie-chat-v1"  # bump when build_movie_chat_prompt changes
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com"
+GEMINI_STREAM_PATH = "/v1beta/models/gemini-2.0-flash:streamGenerateContent"
+GEMINI_GENERATE_PATH = "/v1beta/models/gemini-2.0-flash:generateContent"
+
+
+class GeminiResponseCache:
+    """In-process TTL + LRU cache for Gemini answers, shared by all sessions.
+
+    Concurrent identical questions are coalesced: the first caller asks
+    Gemini, later callers wait for that answer instead of spending quota.
+    """
+
+    def __init__(self, max_entries=500, ttl=6 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, answer)
+        self.inflight = {}            # key -> threading.Event
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(user_message):
+        normalized = " ".join(user_message.lower().split()).rstrip(" .!?")
+        return hashlib.sha1(f"{GEMINI_PROMPT_VERSION}|{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def claim(self, key):
+        """Return (True, None) if the caller should ask Gemini, else
+        (False, event) to wait on while another caller does."""
+        with self.lock:
+            event = self.inflight.get(key)
+            if event is not None:
+                return False, event
+            self.inflight[key] = threading.Event()
+            return True, None
+
+    def release(self, key, answer=None):
+        """Finish a claimed request; answer=None means nothing cacheable"""
+        with self.lock:
+            if answer is not None:
+                self.entries[key] = (time.time() + self.ttl, answer)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            event = self.inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+
+_gemini_state, GEMINI_CHAT_METRICS, _gemini_metrics_lock = process_singleton('gemini', lambda: (
+    {'cache': GeminiResponseCache()},
+    {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'stream_errors': 0, 'ttft': deque(maxlen=200)},
+    threading.Lock(),
+))
+
+
+def get_gemini_response_cache():
+    """Process-wide Gemini answer cache"""
+    return _gemini_state['cache']
+
+
+def _record_gemini_metric(name, value=1):
+    """Count a chat event, or append a time-to-first-token sample for 'ttft'"""
+    with _gemini_metrics_lock:
+        if name == 'ttft':
+            GEMINI_CHAT_METRICS['ttft'].append(value)
+        else:
+            GEMINI_CHAT_METRICS[name] += value
+
+
+def get_gemini_chat_metrics():
+    """Cache hit rate and time-to-first-token summary for the chatbot"""
+    with _gemini_metrics_lock:
+        metrics = dict(GEMINI_CHAT_METRICS, ttft=sorted(GEMINI_CHAT_METRICS['ttft']))
+    ttft = metrics['ttft']
+    requests_made = metrics['requests']
+    served_from_cache = metrics['cache_hits'] + metrics['coalesced']
+    return {
+        'requests': requests_made,
+        'cache_hits': metrics['cache_hits'],
+        'coalesced': metrics['coalesced'],
+        'stream_errors': metrics['stream_errors'],
+        'hit_rate': (served_from_cache / requests_made * 100) if requests_made else 0.0,
+        'ttft_p50': ttft[len(ttft) // 2] if ttft else None,
+        'ttft_p95': ttft[int(len(ttft) * 0.95)] if ttft else None,
+    }
+
+
+def stream_gemini_api(prompt: str):
+    """Yield Gemini text chunks as they arrive (server-sent events)."""
+    api_key = CONFIG.get("gemini_api_key", "")
+    if not api_key:
+        yield "❌ Gemini API key is missing. Please configure GEMINI_API_KEY in .streamlit/secrets.toml."
+        return
+
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    resp = upstream_request(
+        'gemini', 'POST', upstream_url('gemini', GEMINI_API_BASE) + GEMINI_STREAM_PATH,
+        params={"key": api_key, "alt": "sse"}, json=payload, stream=True, timeout=25
+    )
+    try:
+        if resp.status_code == 429:
+            yield "⚠ The AI hit its usage limit (429). Please try again in a bit."
+            return
+        if resp.status_code != 200:
+            yield f"⚠ Gemini API error ({resp.status_code})."
+            return
+
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = json.loads(line[len("data:"):].strip())
+            for candidate in data.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+    finally:
+        resp.close()
+
+
+def call_gemini_api_shared(prompt: str) -> str:
+    """Non-streaming Gemini call through the shared token bucket and breaker.
+
+    Limiter, deadline and breaker failures raise APIError so the caller can
+    answer locally instead of going around them.
+    """
+    api_key = CONFIG.get("gemini_api_key", "")
+    if not api_key:
+        return "❌ Gemini API key is missing. Please configure GEMINI_API_KEY in .streamlit/secrets.toml."
+
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    resp = upstream_request(
+        'gemini', 'POST', upstream_url('gemini', GEMINI_API_BASE) + GEMINI_GENERATE_PATH,
+        params={"key": api_key}, json=payload, timeout=25
+    )
+    if resp.status_code == 429:
+        return "⚠ The AI hit its usage limit (429). Please try again in a bit."
+    if resp.status_code != 200:
+        return f"⚠ Gemini API error ({resp.status_code})."
+    try:
+        candidates = resp.json().get("candidates", [])
+    except ValueError as e:
+        return f"⚠ Gemini request failed: {e}"
+    if not candidates:
+        return "⚠ Gemini did not return any candidates."
+    text = "".join(part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []))
+    return text.strip() or "⚠ Gemini returned an empty reply."
+
+
+def local_chat_answer(user_message):
+    """Offline answer while Gemini is unreachable (breaker open, limiter queue
+    full or deadline spent): local catalogue matches
+    in the usual MOVIES: format (never cached - it starts with ⚠)"""
+    matches = get_catalog_search_index().search(user_message, limit=3, kind='movie')
+    answer = "⚠ The AI assistant is temporarily unavailable, so here are matches from the local catalogue."
+    if matches:
+        answer += "\nMOVIES: " + " | ".join(movie['title'] for movie in matches)
+    return answer
+
+
+class StreamingGeminiMovieChat(GeminiMovieChat):
+    """GeminiMovieChat that streams partial answers and reuses cached ones"""
+
+    def respond(self, user_message: str, on_partial=None):
+        """Answer a message, calling on_partial(text_so_far) while streaming.
+
+        Returns (answer_text, movie_titles) exactly like generate_ai_response;
+        the MOVIES: line is parsed once the stream completes.
+        """
+        _record_gemini_metric('requests')
+        cache = get_gemini_response_cache()
+        key = cache.make_key(user_message)
+
+        full_answer = cache.get(key)
+        if full_answer is not None:
+            _record_gemini_metric('cache_hits')
+            telemetry.count("gemini.cache_hit")
+        else:
+            is_leader, event = cache.claim(key)
+            if not is_leader:
+                event.wait(timeout=30)
+                full_answer = cache.get(key)
+                if full_answer is not None:
+                    _record_gemini_metric('coalesced')
+                    telemetry.count("gemini.coalesced")
+            if full_answer is None:
+                telemetry.count("gemini.cache_miss")
+                with telemetry.span("gemini.answer"):
+                    full_answer = self._stream_answer(cache, key, user_message, on_partial, is_leader)
+
+        answer_text, movie_titles = parse_movies_from_response(full_answer)
+        self.history.append(("user", user_message))
+        self.history.append(("assistant", answer_text))
+        return answer_text, movie_titles
+
+    def generate_ai_response(self, user_message: str):
+        return self.respond(user_message)
+
+    def _stream_answer(self, cache, key, user_message, on_partial, is_leader):
+        full_answer = None
+        try:
+            full_answer = self._fetch_answer(user_message, on_partial)
+            return full_answer
+        finally:
+            # Always release a claim, even on an unexpected error, so
+            # callers waiting on the same question are not left blocked
+            if is_leader:
+                cacheable = full_answer and not full_answer.startswith(("⚠", "❌"))
+                cache.release(key, full_answer if cacheable else None)
+
+    def _fetch_answer(self, user_message, on_partial):
+        prompt = build_movie_chat_prompt(user_message)
+        started = time.perf_counter()
+        chunks = []
+        full_answer = None
+        unreachable = False
+        try:
+            for chunk in stream_gemini_api(prompt):
+                if not chunks:
+                    _record_gemini_metric('ttft', time.perf_counter() - started)
+                    telemetry.observe("gemini.first_token", time.perf_counter() - started)
+                chunks.append(chunk)
+                if on_partial:
+                    # Never flash the raw MOVIES: line at the user
+                    on_partial("".join(chunks).split("MOVIES:", 1)[0])
+            full_answer = "".join(chunks).strip()
+        except APIError as e:
+            # Breaker open, limiter queue full or deadline spent: retrying
+            # would only go around them
+            unreachable = True
+            logging.info(f"Gemini unreachable, answering locally: {e}")
+        except Exception as e:
+            _record_gemini_metric('stream_errors')
+            logging.warning(f"Gemini stream failed, retrying without streaming: {e}")
+        if not full_answer:
+            telemetry.count("gemini.fallback")
+            if not unreachable and not get_circuit_breaker('gemini').is_open():
+                try:
+                    full_answer = call_gemini_api_shared(prompt)
+                except APIError as e:
+                    logging.info(f"Gemini unreachable, answering locally: {e}")
+                except requests.RequestException as e:
+                    logging.warning(f"Gemini request failed, answering locally: {e}")
+            if not full_answer:
+                full_answer = local_chat_answer(user_message)
+        return full_answer
+
+
+# -----------------------------
+# Bulk OMDB Enrichment (deduplicated, concurrent, cache-aware)
+# -----------------------------
+BULK_ENRICH_DEADLINE = 300.0  # seconds one enrich_movies_bulk() call waits for OMDB
+
+
+# Prefetches run enrich_movies_bulk(), which waits on lookups in the other
+# pool; one shared pool would let prefetches fill every worker and wait
+# forever on lookups queued behind them. Few lookup workers on purpose: the
+# 'omdb_bulk' token bucket is the real limit.
+_enrichment_executor, _prefetch_executor = process_singleton('enrichment_executors', lambda: (
+    ThreadPoolExecutor(max_workers=4, thread_name_prefix="omdb-enrich"),
+    ThreadPoolExecutor(max_workers=2, thread_name_prefix="omdb-prefetch"),
+))
+
+
+def is_imdb_id(value):
+    """True for an IMDb title id (tt followed by digits)"""
+    return isinstance(value, str) and re.fullmatch(r"tt\d+", value.strip()) is not None
+
+
+def omdb_details_params(item):
+    """OMDB detail params for a title, (title, year) pair or IMDb id.
+
+    Matches what RateLimitedOMDbAPI.get_movie_details sends, so bulk and
+    per-card lookups share cache entries.
+    """
+    params = {"apikey": CONFIG['omdb_api_key'], "plot": "full", "r": "json"}
+    if is_imdb_id(item):
+        params["i"] = item.strip()
+        return params
+    title, year = item if isinstance(item, (tuple, list)) else (item, None)
+    params["t"] = title
+    if year and str(year).isdigit():
+        params["y"] = int(year)
+    return params
+
+
+def enrich_movies_bulk(items, timeout=BULK_ENRICH_DEADLINE):
+    """Yield (item, details or None) in completion order.
+
+    Duplicate requests are collapsed, cache hits are yielded straight
+    away, and the misses are fetched concurrently through SharedOMDbAPI
+    (so they share its in-flight deduplication) as background_requests(),
+    which leaves interactive OMDB calls most of the rate budget. Lookups
+    still pending after `timeout` seconds (or the thread's
+    request_deadline()) are cancelled and yielded as None.
+    """
+    cache = get_omdb_response_cache()
+    omdb = get_omdb_client()
+    groups = OrderedDict()  # cache key -> (params, [items])
+    for item in items:
+        params = omdb_details_params(item)
+        groups.setdefault(cache.make_key(params), (params, []))[1].append(item)
+
+    futures = {}
+    for params, members in groups.values():
+        cached = omdb._cached(cache, params)
+        if cached is not None:
+            details = cached if cached.get("Response") == "True" else None
+            for member in members:
+                yield member, details
+            continue
+        futures[_enrichment_executor.submit(_background_omdb_call, omdb, params)] = members
+
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=max(0.0, min(timeout, deadline_remaining()))):
+            pending.discard(future)
+            try:
+                data = future.result()
+            except Exception as e:
+                logging.error(f"Bulk enrichment request failed: {e}")
+                data = None
+            details = data if data and data.get("Response") == "True" and "Title" in data else None
+            for member in futures[future]:
+                yield member, details
+    except FuturesTimeoutError:
+        logging.warning(f"Bulk enrichment timed out with {len(pending)} lookups pending")
+        for future in pending:
+            future.cancel()
+            for member in futures[future]:
+                yield member, None
+
+
+def _background_omdb_call(omdb, params):
+    with background_requests():
+        return omdb.robust_omdb_call(params)
+
+
+def enrich_with_plots_bulk(movies):
+    """Fill missing 'plot' keys on movie dicts (recommender format) in one bulk pass"""
+    pending = {}
+    for movie in movies:
+        if not movie.get('plot'):
+            pending.setdefault((movie['title'], movie.get('year')), []).append(movie)
+    for key, details in enrich_movies_bulk(list(pending)):
+        for movie in pending[key]:
+            if details:
+                movie['plot'] = details.get('Plot', 'No description available')
+            else:
+                movie['plot'] = f"A captivating {movie.get('genre', '')} story from {movie.get('year', '')}."
+    return movies
+
+
+def prefetch_movie_details(search_results):
+    """Warm the cache for visible search results in the background"""
+    items = [(r.get('Title'), r.get('Year')) for r in search_results if r.get('Title')]
+    if items:
+        _prefetch_executor.submit(lambda: list(enrich_movies_bulk(items)))
+
+
+# -----------------------------
+# Local Catalog Search Index (offline fallback for movies and anime)
+# -----------------------------
+def stable_catalog_id(title, year):
+    """Catalogue id that is the same in every process (unlike hash()). The
+    local: prefix keeps it from passing for an IMDb id, so it is never sent
+    to OMDB as an i= lookup or stored as a details_id."""
+    digest = hashlib.sha1(f"{_normalize_title(title)}|{year}".encode('utf-8')).hexdigest()
+    return f"local:{digest[:12]}"
+
+
+class CatalogSearchIndex:
+    """Ranked prefix + fuzzy search over a static catalogue of dicts.
+
+    Exact titles beat prefix matches, which beat whole-token matches, which
+    beat trigram (typo-tolerant) matches. Token postings, a sorted
+    vocabulary for prefix ranges, and trigram postings keep each query
+    proportional to the matches rather than the catalogue size.
+    """
+
+    MAX_CANDIDATES = 1000
+
+    def __init__(self, entries):
+        self.entries = []
+        self.normalized = []
+        self.postings = {}
+        self.trigrams = {}
+        for entry in entries:
+            self.add(entry)
+        self.vocabulary = sorted(self.postings)
+
+    def add(self, entry):
+        doc_id = len(self.entries)
+        normalized = _normalize_title(entry['title'])
+        self.entries.append(entry)
+        self.normalized.append(normalized)
+        for token in set(normalized.split()):
+            self.postings.setdefault(token, set()).add(doc_id)
+        for gram in _title_trigrams(normalized):
+            self.trigrams.setdefault(gram, set()).add(doc_id)
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:start + 200]:
+            if not token.startswith(prefix):
+                break
+            ids |= self.postings[token]
+        return ids
+
+    def search(self, query, limit=8, kind=None, min_score=0.3):
+        normalized = _normalize_title(query)
+        if not normalized:
+            return []
+        tokens = normalized.split()
+        query_grams = _title_trigrams(normalized)
+
+        # Titles with every whole token plus the last token as a prefix
+        # (search-as-you-type); intersect starting from the rarest set
+        sets = sorted([self.postings.get(t, set()) for t in tokens[:-1]] + [self._prefix_ids(tokens[-1])],
+                      key=len)
+        candidates = set(sets[0])
+        for ids in sets[1:]:
+            candidates &= ids
+            if not candidates:
+                break
+        if len(candidates) > self.MAX_CANDIDATES:
+            # Equally good token matches - keep catalogue order
+            candidates = heapq.nsmallest(self.MAX_CANDIDATES, candidates)
+        if not candidates:
+            rare_grams = sorted((g for g in query_grams if self.trigrams.get(g)),
+                                key=lambda g: len(self.trigrams[g]))
+            gram_hits = {}
+            for gram in rare_grams[:6]:
+                for doc_id in self.trigrams[gram]:
+                    gram_hits[doc_id] = gram_hits.get(doc_id, 0) + 1
+            candidates = heapq.nlargest(200, gram_hits, key=gram_hits.get)
+
+        scored = []
+        for doc_id in candidates:
+            entry = self.entries[doc_id]
+            if kind and entry.get('kind') != kind:
+                continue
+            title = self.normalized[doc_id]
+            title_tokens = title.split()
+            title_grams = _title_trigrams(title)
+            score = len(query_grams & title_grams) / len(query_grams | title_grams)
+            score += sum(1 for t in tokens[:-1] if t in title_tokens) / len(tokens)
+            if any(t.startswith(tokens[-1]) for t in title_tokens):
+                score += 1.0 / len(tokens)
+            if title.startswith(normalized):
+                score += 1.5
+            elif normalized in title:
+                score += 1.0
+            if title == normalized:
+                score += 2.0
+            if score >= min_score:
+                scored.append((score, -doc_id, doc_id))
+
+        return [self.entries[doc_id] for _, _, doc_id in heapq.nlargest(limit, scored)]
+
+
+def get_catalog_search_index():
+    """Built once per process from MOVIE_DATABASE and the anime fallback list"""
+    return process_singleton('catalog_search_index', _build_catalog_search_index)
+
+
+def _build_catalog_search_index():
+    entries, seen = [], set()
+    for movie in MOVIE_DATABASE:
+        key = (_normalize_title(movie['title']), movie['year'])
+        if key in seen:
+            continue
+        seen.add(key)
+        entries.append({'kind': 'movie', 'title': movie['title'], 'year': movie['year'],
+                        'genre': movie['genre'], 'id': stable_catalog_id(movie['title'], movie['year'])})
+    # The base class method returns the whole built-in list for an empty query
+    for anime in AnimeIntegration._get_fallback_anime_results(AnimeIntegration(), ""):
+        entries.append(dict(anime, kind='anime', id=stable_catalog_id(anime['title'], anime['year'])))
+    return CatalogSearchIndex(entries)
+
+
+# -----------------------------
+# Concurrent AI Finder Search (fan-out across sources)
+# -----------------------------
+AI_FINDER_SEARCH_DEADLINE = 6.0  # seconds for all sources together
+
+# Shared by every session; searches are I/O bound so threads are fine
+_search_executor = process_singleton(
+    'search_executor', lambda: ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-finder-search"))
+
+
+@telemetry.traced("search.movies")
+def _search_movie_source(query):
+    return get_omdb_client().search_movies(query, "movie", None)
+
+
+@telemetry.traced("search.anime")
+def _search_anime_source(query):
+    return SharedAnimeIntegration().fetch_anime(query)
+
+
+def _local_movie_results(query):
+    return get_omdb_client()._search_local_database(query, "movie")
+
+
+def _local_anime_results(query):
+    return SharedAnimeIntegration()._get_fallback_anime_results(query)
+
+
+AI_FINDER_SOURCES = {
+    'movies': (_search_movie_source, _local_movie_results),
+    'anime': (_search_anime_source, _local_anime_results),
+}
+AI_FINDER_SOURCE_UPSTREAMS = {'movies': 'omdb', 'anime': 'crunchyroll'}
+
+
+def _search_with_deadline(deadline, search_fn, query):
+    with request_deadline(deadline):
+        return search_fn(query)
+
+
+def search_all_sources(query, deadline=AI_FINDER_SEARCH_DEADLINE):
+    """Query every source in parallel, yielding (source, results, status) in
+    completion order. status is None for live results; otherwise the source
+    answered from its local fallback data because it was 'slow' (missed the
+    deadline), 'failed', or 'unavailable' (breaker open, so not queried).
+
+    The deadline covers collecting the results only: time the caller spends
+    between yields (rendering a section) is added back to it.
+    """
+    started = time.monotonic()
+    tripped = [
+        source for source in AI_FINDER_SOURCES
+        if get_circuit_breaker(AI_FINDER_SOURCE_UPSTREAMS[source]).is_open()
+    ]
+    futures = {
+        _search_executor.submit(_search_with_deadline, deadline, search_fn, query): source
+        for source, (search_fn, _) in AI_FINDER_SOURCES.items()
+        if source not in tripped
+    }
+    deadline_at = started + deadline
+
+    for source in tripped:
+        telemetry.count(f"search.{source}.breaker_fallback")
+        paused = time.monotonic()
+        yield source, AI_FINDER_SOURCES[source][1](query), 'unavailable'
+        deadline_at += time.monotonic() - paused
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            source = futures[future]
+            try:
+                results, status = future.result() or [], None
+                logging.info(f"AI Finder {source} search took {time.monotonic() - started:.2f}s")
+            except Exception as e:
+                logging.error(f"AI Finder {source} search failed: {e}")
+                telemetry.count(f"search.{source}.fallback")
+                results, status = AI_FINDER_SOURCES[source][1](query), 'failed'
+            paused = time.monotonic()
+            yield source, results, status
+            deadline_at += time.monotonic() - paused
+
+    if pending:
+        late = sorted(futures[future] for future in pending)
+        logging.warning(f"AI Finder search deadline hit, local fallback for: {', '.join(late)}")
+        # Late sources give up on their own: their workers run under the same deadline
+        for source in late:
+            telemetry.count(f"search.{source}.deadline_fallback")
+            yield source, AI_FINDER_SOURCES[source][1](query), 'slow'
+
+
+# -----------------------------
+# Enhanced AI Finder Page with OMDB Integration - SIMPLIFIED
+# -----------------------------
+AI_FINDER_PAGE_SIZE = 6
+AI_FINDER_MEMO_QUERIES = 10
+AI_FINDER_DEGRADED_TTL = 30  # seconds a result with local fallbacks stays memoized
+AI_CHAT_HISTORY_LIMIT = 50
+AI_CHAT_RENDER_WINDOW = 12
+
+AI_FINDER_SECTION_TITLES = {'movies': "#### 🎬 Movies & Series", 'anime': "#### 🍥 Anime"}
+# Caption per search_all_sources() fallback status
+AI_FINDER_FALLBACK_NOTES = {
+    'slow': "⏱️ Source was slow to respond - showing local results.",
+    'failed': "⚠️ Source returned an error - showing local results.",
+    'unavailable': "🔌 Source is temporarily unavailable - showing local results.",
+}
+
+# st.fragment (1.37+) / st.experimental_fragment (1.33+) let each panel rerun
+# on its own; on older Streamlit the panels simply render with the page
+_st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+
+def ai_finder_fragment(func):
+    """Run ``func`` as an independently rerunning fragment when supported."""
+    return _st_fragment(func) if _st_fragment else func
+
+
+def _normalize_search_query(query):
+    return " ".join(query.lower().split())
+
+
+def get_ai_finder_memo():
+    """Per-session LRU of search results keyed by normalized query."""
+    memo = st.session_state.get("ai_finder_results")
+    if not isinstance(memo, OrderedDict):
+        memo = st.session_state.ai_finder_results = OrderedDict()
+    return memo
+
+
+def _remember_search(memo, key, entry):
+    if entry['fallback']:
+        # Keep paging working, but retry the sources soon instead of
+        # pinning the local fallback for the rest of the session
+        entry['expires_at'] = time.time() + AI_FINDER_DEGRADED_TTL
+    memo[key] = entry
+    memo.move_to_end(key)
+    while len(memo) > AI_FINDER_MEMO_QUERIES:
+        memo.popitem(last=False)
+
+
+def _show_more_results(entry, source):
+    """Button callback: reveal the next page and warm its card details."""
+    start = entry['shown'][source]
+    entry['shown'][source] = start + AI_FINDER_PAGE_SIZE
+    if source == 'movies':
+        prefetch_movie_details(entry['results'][source][start:start + AI_FINDER_PAGE_SIZE])
+
+
+def _render_ai_finder_section(entry, source, key):
+    results = entry['results'].get(source) or []
+    if not results:
+        return
+    shown = min(entry['shown'][source], len(results))
+    st.markdown(AI_FINDER_SECTION_TITLES[source])
+    if source in entry['fallback']:
+        st.caption(AI_FINDER_FALLBACK_NOTES[entry['fallback'][source]])
+    item_type = "movie" if source == 'movies' else "anime"
+    for i, item in enumerate(results[:shown]):
+        display_enhanced_search_result(item, item_type, i)
+    if shown < len(results):
+        st.button(
+            f"Show more ({len(results) - shown} left)",
+            key=f"ai_finder_more_{source}_{key}",
+            on_click=_show_more_results,
+            args=(entry, source),
+        )
+
+
+def get_movie_details_cached(title: str, year: int = None) -> dict:
+    """Movie details through the shared OMDB client (response cache, single-flight)"""
+    return get_omdb_client().get_movie_details(title, year)
+
+
+def display_enhanced_search_result(item, item_type, index):
+    """Display enhanced search results with OMDB details and streaming options"""
+    with st.container():
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+
+        col_a, col_b, col_c = st.columns([3, 1, 1])
+
+        title = item.get('Title') if item_type == 'movie' else item.get('title')
+        year = item.get('Year') if item_type == 'movie' else item.get('year')
+        genre = item.get('Genre') if item_type == 'movie' else item.get('genre')
+        year = str(year) if year else year
+        lookup_year = int(year) if year and year.isdigit() else None
+        # Every lookup below is the same cache entry the page prefetch warmed
+        movie_details = None
+        if item_type == 'movie':
+            with st.spinner(f"Fetching details for {title}..."):
+                movie_details = get_movie_details_cached(title, lookup_year)
+
+        with col_a:
+            st.markdown(f"#### {title} ({year})")
+            st.markdown(f"**Type:** {item_type.title()} | **Genre:** {genre}")
+
+            if movie_details:
+                # Display ratings
+                ratings = movie_details.get('Ratings', [])
+                imdb_rating = movie_details.get('imdbRating', 'N/A')
+
+                if imdb_rating != 'N/A':
+                    st.markdown(f'<span class="rating-badge">⭐ IMDB: {imdb_rating}/10</span>', unsafe_allow_html=True)
+
+                # Display other ratings
+                for rating in ratings:
+                    source = rating.get('Source', '')
+                    value = rating.get('Value', '')
+                    if 'Rotten Tomatoes' in source:
+                        st.markdown(f'<span style="color: #FF6B6B">🍅 {value}</span>', unsafe_allow_html=True)
+
+                # Display other details
+                if movie_details.get('Director') and movie_details['Director'] != 'N/A':
+                    st.markdown(f"**Director:** {movie_details['Director']}")
+                if movie_details.get('Runtime') and movie_details['Runtime'] != 'N/A':
+                    st.markdown(f"**Runtime:** {movie_details['Runtime']}")
+                if movie_details.get('Plot') and movie_details['Plot'] != 'N/A':
+                    plot_preview = movie_details['Plot'][:100] + "..." if len(movie_details['Plot']) > 100 else movie_details['Plot']
+                    st.markdown(f"**Plot:** {plot_preview}")
+
+            # Show streaming availability
+            watch_options = get_streaming_finder().get_watch_options(title, lookup_year or 2023, genre)
+
+            # Display available services
+            available_services = []
+            for service_type, services in watch_options.items():
+                if service_type == 'streaming':
+                    available_services.extend([s for s in services.values() if s['available']])
+                elif service_type == 'anime':
+                    available_services.extend(services.values())
+
+            if available_services:
+                service_names = [f"{s['icon']} {s['name']}" for s in available_services[:2]]
+                st.markdown(f"**Available on:** {', '.join(service_names)}")
+
+        with col_b:
+            # Display poster if available, else the one from the OMDB details
+            poster = item.get('Poster')
+            if not poster or poster == "N/A":
+                poster = (movie_details or {}).get('Poster')
+            if poster and poster != "N/A":
+                st.image(poster, width=80)
+            else:
+                st.markdown("🎭 *No poster*")
+
+        with col_c:
+            if st.button("➕ Add", key=f"add_{item_type}_{index}", use_container_width=True, type="primary"):
+                # Extract year properly
+                if year and any(c.isdigit() for c in year):
+                    year_val = int(''.join(filter(str.isdigit, year))[:4])
+                else:
+                    year_val = 2023
+
+                # Get detailed movie data for storage
+                details_data = get_movie_details_cached(title, year_val) if item_type == 'movie' else None
+
+                # Add to collection
+                add_movie(
+                    title=title,
+                    genre=genre or "Unknown",
+                    year=year_val,
+                    watched=False,
+                    details_data=details_data
+                )
+                st.success(f"Added {title} to collection!")
+                st.rerun()
+
+            if st.button("🎯 Watch", key=f"watch_{item_type}_{index}", use_container_width=True, type="secondary"):
+                st.session_state[f"show_watch_{title}"] = True
+
+            if st.button("🔍 Details", key=f"details_{item_type}_{index}", use_container_width=True, type="secondary"):
+                st.session_state[f"show_full_details_{title}"] = True
+
+        # Show watch options if triggered
+        if st.session_state.get(f"show_watch_{title}"):
+            display_watch_options_section(title, lookup_year or 2023, genre or "Unknown", f"search_{index}", f"search_{index}")
+
+        # Show full details if triggered
+        if st.session_state.get(f"show_full_details_{title}"):
+            display_full_movie_details(title, lookup_year or 2023, f"search_{index}")
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+def display_full_movie_details(title, year, key_suffix):
+    """Display full movie details from OMDB"""
+    with st.spinner("🎬 Fetching complete movie details..."):
+        movie_data = get_movie_details_cached(title, year)
+
+    if movie_data:
+        with st.container():
+            st.markdown('<div class="movie-detail-card">', unsafe_allow_html=True)
+            st.markdown("### 🎬 Complete Movie Details")
+
+            col1, col2 = st.columns([1, 2])
+
+            with col1:
+                # Display poster if available
+                if movie_data.get("Poster") and movie_data["Poster"] != "N/A":
+                    st.image(movie_data["Poster"], use_column_width=True)
+                else:
+                    st.markdown("🎭 *No poster available*")
+
+            with col2:
+                # Comprehensive movie information
+                for label in ('Title', 'Year', 'Rated', 'Released', 'Runtime', 'Genre', 'Director',
+                              'Writer', 'Actors', 'Language', 'Country', 'Awards'):
+                    st.markdown(f"**{label}:** {movie_data.get(label, 'N/A')}")
+
+                # Enhanced ratings display
+                ratings = movie_data.get('Ratings', [])
+                if ratings:
+                    st.markdown("**Ratings:**")
+                    for rating in ratings:
+                        source = rating.get('Source', '')
+                        value = rating.get('Value', '')
+                        if 'Internet Movie Database' in source:
+                            st.markdown(f'<span class="rating-badge">🎬 IMDB: {value}</span>', unsafe_allow_html=True)
+                        elif 'Rotten Tomatoes' in source:
+                            st.markdown(f'<span style="color: #FF6B6B; font-weight: bold;">🍅 Rotten Tomatoes: {value}</span>', unsafe_allow_html=True)
+                        elif 'Metacritic' in source:
+                            st.markdown(f'<span style="color: #4D96FF; font-weight: bold;">💎 Metacritic: {value}</span>', unsafe_allow_html=True)
+
+                # IMDB specific ratings
+                imdb_rating = movie_data.get('imdbRating', 'N/A')
+                imdb_votes = movie_data.get('imdbVotes', 'N/A')
+                if imdb_rating != 'N/A':
+                    st.markdown(f'<span class="rating-badge">⭐ IMDB Rating: {imdb_rating}/10 ({imdb_votes} votes)</span>', unsafe_allow_html=True)
+
+                # Box office information
+                if movie_data.get('BoxOffice') and movie_data['BoxOffice'] != 'N/A':
+                    st.markdown(f"**Box Office:** {movie_data['BoxOffice']}")
+
+                st.markdown(f"**Plot:** {movie_data.get('Plot', 'N/A')}")
+
+            # Close button
+            if st.button("Close Details", key=f"close_full_{key_suffix}", use_container_width=True, type="secondary"):
+                st.session_state[f"show_full_details_{title}"] = False
+                st.rerun()
+
+            st.markdown('</div>', unsafe_allow_html=True)
+
+
+@ai_finder_fragment
+@telemetry.traced("render.search_panel")
+def render_ai_finder_search_panel():
+    """Search column: results are fetched once per query, then paged from session state."""
+    st.markdown("### 🤖 ENHANCED MOVIE & ANIME SEARCH")
+
+    search_query = st.text_input(
+        "🎬 Search movies or anime.",
+        placeholder="Enter movie title, anime, or genre.",
+        key="enhanced_ai_search",
+    )
+
+    if not search_query:
+        # Old behaviour: show tabs with Popular / In Theaters etc.
+        show_popular_content()
+        return
+
+    key = _normalize_search_query(search_query)
+    memo = get_ai_finder_memo()
+    entry = memo.get(key)
+    if entry is not None and entry.get('expires_at', math.inf) < time.time():
+        del memo[key]
+        entry = None
+
+    results_header = st.empty()
+    sections = {source: st.container() for source in AI_FINDER_SECTION_TITLES}
+
+    if entry is None:
+        entry = {
+            'results': {},
+            'fallback': {},
+            'shown': dict.fromkeys(AI_FINDER_SECTION_TITLES, AI_FINDER_PAGE_SIZE),
+        }
+        with st.spinner("🔍 Searching across all platforms."):
+            # All sources run in parallel; each section renders as soon as
+            # its source answers (fixed order on the page regardless)
+            for source, results, status in search_all_sources(search_query):
+                entry['results'][source] = results
+                if status:
+                    entry['fallback'][source] = status
+                if source == 'movies':
+                    # Only the first page of card details is warmed up front
+                    prefetch_movie_details(results[:AI_FINDER_PAGE_SIZE])
+                with sections[source]:
+                    _render_ai_finder_section(entry, source, key)
+                results_header.markdown(
+                    f"### 🎯 Found {sum(map(len, entry['results'].values()))} Results"
+                )
+        _remember_search(memo, key, entry)
+    else:
+        memo.move_to_end(key)
+        for source, container in sections.items():
+            with container:
+                _render_ai_finder_section(entry, source, key)
+
+    total = sum(map(len, entry['results'].values()))
+    if total:
+        results_header.markdown(f"### 🎯 Found {total} Results")
+    else:
+        st.warning(
+            "No results found. Try a different search term or check our recommendations below."
+        )
+        # If you have this helper it will still work;
+        # if not, this will just be skipped.
+        try:
+            show_search_recommendations(search_query)
+        except NameError:
+            pass
+
+    if CONFIG.get('debug_mode'):
+        cache_stats = get_omdb_response_cache().stats()
+        st.caption(
+            f"OMDB cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0f}% hit rate, {cache_stats['entries']} entries)"
+        )
+
+
+def get_ai_chat_history():
+    """Chat history as a bounded ring buffer (older turns fall off the front)."""
+    history = st.session_state.get("ai_history")
+    if not isinstance(history, deque) or history.maxlen != AI_CHAT_HISTORY_LIMIT:
+        history = st.session_state.ai_history = deque(history or (), maxlen=AI_CHAT_HISTORY_LIMIT)
+    return history
+
+
+@ai_finder_fragment
+@telemetry.traced("render.chat_panel")
+def render_ai_finder_chat_panel():
+    """Chat column: a turn reruns only this panel and costs a single Gemini call."""
+    st.markdown("### 💬 Movie Help Chatbot (Gemini)")
+
+    # Lazy init so we don't touch your global init_session_state
+    # Duck-typed: the class object is redefined on every rerun
+    if not hasattr(st.session_state.get("gemini_chat"), "respond"):
+        st.session_state.gemini_chat = StreamingGeminiMovieChat()
+    history = get_ai_chat_history()
+
+    chat = st.session_state.gemini_chat
+
+    # Show the recent window of the chat history
+    hidden = max(0, len(history) - AI_CHAT_RENDER_WINDOW)
+    if hidden:
+        st.caption(f"Showing the last {AI_CHAT_RENDER_WINDOW} of {len(history)} messages.")
+    for msg in islice(history, hidden, None):
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
+    # User input (works like before)
+    user_msg = st.chat_input(
+        "Tell me your mood, a plot, or actor names…\nExample: 'Sad mood, recommend 3 sci-fi movies' or 'Movie like Interstellar but with more romance'."
+    )
+
+    if user_msg:
+        # Store + show user message
+        history.append({"role": "user", "content": user_msg})
+        with st.chat_message("user"):
+            st.markdown(user_msg)
+
+        with st.chat_message("assistant"):
+            # Gemini-only backend (ONE API KEY); tokens render as they arrive
+            bubble = st.empty()
+            answer_text, movie_titles = chat.respond(
+                user_msg, on_partial=lambda text: bubble.markdown(text + "▌")
+            )
+            bubble.markdown(answer_text)
+
+            # Show only the movie names (up to 3)
+            if movie_titles:
+                st.markdown("**🎬 Suggested movies (max 3):**")
+                for title in movie_titles:
+                    st.markdown(f"- {title}")
+            else:
+                st.markdown(
+                    "_No specific movie titles could be found for this query._"
+                )
+
+        # Store assistant answer
+        history.append({"role": "assistant", "content": answer_text})
+
+    if CONFIG.get('debug_mode'):
+        chat_metrics = get_gemini_chat_metrics()
+        ttft = chat_metrics['ttft_p50']
+        st.caption(
+            f"Gemini cache: {chat_metrics['hit_rate']:.0f}% hit rate over {chat_metrics['requests']} requests"
+            + (f", first token p50 {ttft:.2f}s" if ttft is not None else "")
+        )
+
+    st.markdown("---")
+    st.markdown("##### ℹ️ What can I ask?")
+    st.caption(
+        """
+- *"I feel lonely, suggest 3 movies."*
+- *"Give me 3 comedy movies with Jim Carrey."*
+- *"Anime where the main character travels through time."*
+- *"Movie similar to Inception but easier to understand."*
+"""
+    )
+
+
+def show_enhanced_ai_finder_page():
+    """Enhanced AI Finder page with cinematic styling, OMDB search + Gemini chatbot."""
+    st.markdown("""
+    <div class="hero-container">
+        <h2 style="text-align: center; font-size: 2.5rem; margin-bottom: 1rem;">🔍 ENHANCED AI FINDER</h2>
+        <p style="text-align: center; font-size: 1.3rem; color: #FFD93D; margin: 0;">
+            Discover Movies & Anime Across All Platforms
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Two columns: left = search (old behaviour), right = Gemini chatbot.
+    # Each column is its own fragment, so a chat turn never re-runs the search.
+    col1, col2 = st.columns([2, 1])
+
+    # -----------------------------
+    # LEFT – your existing simple search + popular/theater tabs
+    # -----------------------------
+    with col1:
+        render_ai_finder_search_panel()
+
+    # -----------------------------
+    # RIGHT – Gemini movie chatbot
+    # -----------------------------
+    with col2:
+        render_ai_finder_chat_panel()
+
+    if CONFIG.get('debug_mode'):
+        with st.expander("⚙️ Performance"):
+            render_performance_panel()
+
+
+def render_performance_panel():
+    """Latency and event tables from the process-wide telemetry registry."""
+    snapshot = telemetry.snapshot()
+    operations = snapshot['operations']
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Uptime", f"{snapshot['uptime_seconds'] / 60:.1f} min")
+    col2.metric("Traced calls", sum(op['count'] for op in operations.values()))
+    col3.metric("Events", sum(snapshot['counters'].values()))
+
+    if operations:
+        st.markdown("#### ⏱️ Latency by operation")
+        st.dataframe(pd.DataFrame([
+            {
+                'Operation': name,
+                'Calls': op['count'],
+                'Mean (ms)': round(op['mean_seconds'] * 1000, 1),
+                'p50 ≤ (ms)': round(op['p50_seconds'] * 1000, 1),
+                'p95 ≤ (ms)': round(op['p95_seconds'] * 1000, 1),
+                'Max (ms)': round(op['max_seconds'] * 1000, 1),
+                'Total (s)': round(op['total_seconds'], 2),
+            }
+            for name, op in operations.items()
+        ]).sort_values('Total (s)', ascending=False), use_container_width=True, hide_index=True)
+    else:
+        st.info("No operations traced yet in this process.")
+
+    if snapshot['counters']:
+        st.markdown("#### 🔢 Counters")
+        st.dataframe(pd.DataFrame(
+            list(snapshot['counters'].items()), columns=['Event', 'Count']
+        ), use_container_width=True, hide_index=True)
+
+    breakers = circuit_breaker_states()
+    if breakers:
+        st.markdown("#### 🔌 Circuit breakers")
+        st.dataframe(pd.DataFrame(
+            list(breakers.items()), columns=['Upstream', 'State']
+        ), use_container_width=True, hide_index=True)
+
+    if snapshot['recent_spans']:
+        st.markdown("#### 🧵 Recent spans")
+        st.dataframe(pd.DataFrame([
+            {
+                'Time': datetime.fromtimestamp(span['at']).strftime('%H:%M:%S'),
+                'Operation': span['operation'],
+                'Parent': span['parent'] or '',
+                'ms': round(span['seconds'] * 1000, 1),
+                'Error': '❌' if span['error'] else '',
+            }
+            for span in reversed(snapshot['recent_spans'][-50:])
+        ]), use_container_width=True, hide_index=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 Prometheus metrics", telemetry.to_prometheus(),
+                           file_name="codeflix_metrics.prom", mime="text/plain")
+    with col2:
+        st.download_button("📥 JSON dump", telemetry.to_json(),
+                           file_name="codeflix_metrics.json", mime="application/json")
+    with col3:
+        if st.button("🔄 Reset counters", key="perf_reset"):
+            telemetry.reset()
+            st.rerun()
+
+
+def show_performance_page():
+    """Admin page: where AI Finder and chat time goes in this process."""
+    st.markdown("""
+    <div class="hero-container">
+        <h2 style="text-align: center; font-size: 2.5rem; margin-bottom: 1rem;">⚙️ PERFORMANCE</h2>
+        <p style="text-align: center; font-size: 1.3rem; color: #FFD93D; margin: 0;">
+            Latency, retries, fallbacks and cache hits
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    render_performance_panel()
+
+
+# -----------------------------
+# Chat Intent Classifier (single-pass, compiled once per process)
+# -----------------------------
+# Intents in priority order - the first listed intent wins when several match
+CHAT_INTENT_KEYWORDS = [
+    ('streaming', ['watch', 'stream', 'streaming', 'where to watch', 'netflix', 'amazon', 'hulu', 'disney', 'youtube']),
+    ('ticketing', ['ticket', 'tickets', 'theater', 'theaters', 'theatre', 'cinema', 'buy ticket']),
+    ('anime', ['anime', 'crunchyroll']),
+    ('greeting', ['hello', 'hi', 'hey', 'greetings']),
+    ('recommendation', ['recommend', 'recommendation', 'recommendations', 'suggest', 'suggestion',
+                        'suggestions', 'what should i watch', 'what to watch']),
+    ('genre', ['action', 'comedy', 'drama', 'sci-fi', 'romance', 'horror', 'thriller']),
+    ('details', ['details', 'info', 'information', 'about movie', 'tell me about']),
+    ('search', ['search', 'find movie', 'look for']),
+    ('analysis', ['analyze', 'stats', 'statistics', 'my collection', 'how many']),
+    ('watch_status', ['watched', 'unwatched', 'watchlist']),
+    ('help', ['help', 'what can you do', 'features']),
+    ('best', ['best', 'top', 'greatest']),
+]
+
+# Words that signal a genre the user is interested in (for user_preferences)
+CHAT_GENRE_SIGNALS = {
+    'action': ['action', 'fight', 'adventure', 'thriller', 'exciting'],
+    'comedy': ['comedy', 'funny', 'laugh', 'humor', 'hilarious'],
+    'drama': ['drama', 'emotional', 'serious', 'story', 'deep'],
+    'sci-fi': ['sci-fi', 'science fiction', 'future', 'space', 'alien'],
+    'romance': ['romance', 'love', 'relationship', 'romantic', 'couple'],
+    'anime': ['anime', 'manga', 'japanese animation'],
+}
+
+
+class ChatIntentClassifier:
+    """Classifies a chat message with one regex scan.
+
+    All intent keywords and genre signals are compiled into a single
+    word-bounded alternation (longest phrases first), so "this" is no
+    longer a greeting and "what should i watch" is a recommendation
+    rather than a streaming question.
+    """
+
+    def __init__(self, intent_keywords=CHAT_INTENT_KEYWORDS, genre_signals=CHAT_GENRE_SIGNALS):
+        self.priority = {intent: rank for rank, (intent, _) in enumerate(intent_keywords)}
+        self.keyword_map = {}  # keyword -> (intent or None, genres)
+
+        for intent, keywords in intent_keywords:
+            for keyword in keywords:
+                self.keyword_map.setdefault(keyword, [None, []])[0] = intent
+        for genre, keywords in genre_signals.items():
+            for keyword in keywords:
+                self.keyword_map.setdefault(keyword, [None, []])[1].append(genre)
+
+        alternation = "|".join(
+            r"\s+".join(re.escape(word) for word in keyword.split())
+            for keyword in sorted(self.keyword_map, key=len, reverse=True)
+        )
+        self.pattern = re.compile(rf"(?<![\w-])(?:{alternation})(?![\w-])", re.IGNORECASE)
+
+    def classify(self, text):
+        """Return (intent, genres); intent is 'fallback' when nothing matches"""
+        best_intent, best_rank = 'fallback', len(self.priority)
+        genres = []
+        for match in self.pattern.finditer(text):
+            intent, signal_genres = self.keyword_map[" ".join(match.group(0).lower().split())]
+            if intent is not None and self.priority[intent] < best_rank:
+                best_intent, best_rank = intent, self.priority[intent]
+            for genre in signal_genres:
+                if genre not in genres:
+                    genres.append(genre)
+        return best_intent, genres
+
+
+def get_chat_intent_classifier():
+    """The intent classifier, built (and its patterns compiled) once per process"""
+    return process_singleton('chat_intent_classifier', ChatIntentClassifier)
+
+
+# -----------------------------
+# Collection Title Index (chat title lookups without full scans)
+# -----------------------------
+def _normalize_title(text):
+    """Lowercase and reduce to alphanumeric words separated by single spaces"""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(text).lower()).split())
+
+
+def _title_trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CollectionTitleIndex:
+    """In-memory index over enhanced_movies rows.
+
+    Keeps token postings plus a trigram index over normalized titles for
+    ranked exact/partial matches, and year/watched bookkeeping so the chat
+    handlers never walk the whole collection. Rows are the same tuples
+    get_movies_safe() returns (id, title, genre, year, watched, ...).
+    signature is the (database, collection_version) the rows were read at.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rows = {}        # id -> row
+        self.order = {}       # id -> position (lower = more recently added)
+        self.normalized = {}  # id -> normalized title
+        self.postings = {}    # token -> set(ids)
+        self.trigrams = {}    # trigram -> set(ids)
+        self.by_year = {}     # year -> set(ids)
+        self.watched_ids = set()
+        self.ordered_ids = None  # ids newest first, built lazily
+        self.next_front = -1     # position for the next add()
+        self.signature = None
+
+    def build(self, movie_data, signature):
+        """(Re)build from rows ordered like get_movies_safe (newest first)"""
+        with self.lock:
+            self._reset()
+            for position, row in enumerate(movie_data or []):
+                self._insert(row, position)
+            self.next_front = -1
+            self.signature = signature
+
+    def _reset(self):
+        self.rows, self.order, self.normalized = {}, {}, {}
+        self.postings, self.trigrams, self.by_year = {}, {}, {}
+        self.watched_ids = set()
+        self.ordered_ids = None
+
+    def _insert(self, row, position):
+        movie_id = row[0]
+        normalized = _normalize_title(row[1])
+        self.ordered_ids = None
+        self.rows[movie_id] = row
+        self.order[movie_id] = position
+        self.normalized[movie_id] = normalized
+        for token in set(normalized.split()):
+            self.postings.setdefault(token, set()).add(movie_id)
+        for gram in _title_trigrams(normalized):
+            self.trigrams.setdefault(gram, set()).add(movie_id)
+        if len(row) > 3 and row[3] is not None:
+            self.by_year.setdefault(row[3], set()).add(movie_id)
+        if len(row) > 4 and row[4] == 1:
+            self.watched_ids.add(movie_id)
+
+    def _remove(self, movie_id):
+        row = self.rows.pop(movie_id, None)
+        if row is None:
+            return None
+        self.ordered_ids = None
+        normalized = self.normalized.pop(movie_id)
+        for token in set(normalized.split()):
+            self.postings.get(token, set()).discard(movie_id)
+        for gram in _title_trigrams(normalized):
+            self.trigrams.get(gram, set()).discard(movie_id)
+        if len(row) > 3:
+            self.by_year.get(row[3], set()).discard(movie_id)
+        self.watched_ids.discard(movie_id)
+        return self.order.pop(movie_id)
+
+    # Incremental updates, applied from the collection change log
+    def add(self, row):
+        """Index a newly inserted movie (goes to the front, like ORDER BY added_at DESC)"""
+        with self.lock:
+            self._remove(row[0])
+            self._insert(row, self.next_front)
+            self.next_front -= 1
+
+    def update(self, row):
+        """Re-index a changed movie in place; unknown ids are added"""
+        with self.lock:
+            position = self._remove(row[0])
+            if position is None:
+                self.add(row)
+            else:
+                self._insert(row, position)
+
+    def remove(self, movie_id):
+        with self.lock:
+            self._remove(movie_id)
+
+    def _ordered(self):
+        if self.ordered_ids is None:
+            self.ordered_ids = sorted(self.order, key=self.order.get)
+        return self.ordered_ids
+
+    # Queries
+    def search(self, query, limit=5, min_score=0.35):
+        """Ranked (score, row) matches for a title or title fragment"""
+        normalized = _normalize_title(query)
+        if not normalized:
+            return []
+        with self.lock:
+            return self._search(normalized, limit, min_score)
+
+    def _search(self, normalized, limit, min_score):
+        tokens = set(normalized.split())
+        query_grams = _title_trigrams(normalized)
+
+        # Candidates: titles containing every query token (rarest posting
+        # first); for typos/fragments, titles sharing one of the rarest trigrams
+        postings = sorted((self.postings.get(token, set()) for token in tokens), key=len)
+        candidates = set(postings[0]) if postings and postings[0] else set()
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        if not candidates:
+            rare_grams = sorted((g for g in query_grams if self.trigrams.get(g)),
+                                key=lambda g: len(self.trigrams[g]))
+            gram_hits = {}
+            for gram in rare_grams[:6]:
+                for movie_id in self.trigrams[gram]:
+                    gram_hits[movie_id] = gram_hits.get(movie_id, 0) + 1
+            candidates = heapq.nlargest(200, gram_hits, key=gram_hits.get)
+
+        scored = []
+        for movie_id in candidates:
+            title = self.normalized[movie_id]
+            title_grams = _title_trigrams(title)
+            shared = len(query_grams & title_grams)
+            score = shared / len(query_grams | title_grams)
+            score += len(tokens.intersection(title.split())) / len(tokens)
+            if normalized in title:
+                score += 1.0
+            if normalized == title:
+                score += 1.0
+            if score >= min_score:
+                scored.append((score, -self.order[movie_id], movie_id))
+
+        scored.sort(reverse=True)
+        return [(score, self.rows[movie_id]) for score, _, movie_id in scored[:limit]]
+
+    def best_match(self, query):
+        matches = self.search(query, limit=1)
+        return matches[0][1] if matches else None
+
+    def _newest_first(self, ids, limit):
+        return [self.rows[i] for i in sorted(ids, key=self.order.get)[:limit]]
+
+    def total(self):
+        return len(self.rows)
+
+    def watched_count(self):
+        return len(self.watched_ids)
+
+    def unwatched(self, limit=3):
+        """Most recently added unwatched movies"""
+        found = []
+        with self.lock:
+            for movie_id in self._ordered():
+                if movie_id not in self.watched_ids:
+                    found.append(self.rows[movie_id])
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def released_since(self, min_year, limit=5):
+        """Most recently added movies released in min_year or later"""
+        ids = set()
+        with self.lock:
+            for year, year_ids in self.by_year.items():
+                if isinstance(year, int) and year >= min_year:
+                    ids |= year_ids
+            return self._newest_first(ids, limit)
+
+
+# Every write to enhanced_movies bumps a change counter and logs the row id
+# under the new version, so the title index applies just the changed rows.
+# The counter doubles as a consistency check: when the log is missing
+# versions (bulk imports bump the counter once per chunk without logging,
+# old entries are pruned) the index is rebuilt instead.
+COLLECTION_CHANGE_LOG_KEEP = 1000  # versions kept in collection_changes
+TITLE_INDEX_MAX_DELTA = 500  # changed rows above which a rebuild is cheaper
+
+
+def _collection_version_trigger(event, row):
+    return f'''CREATE TRIGGER trg_version_{event.lower()} AFTER {event} ON enhanced_movies
+    BEGIN
+        UPDATE collection_version SET version = version + 1 WHERE id = 1;
+        INSERT INTO collection_changes (version, movie_id)
+            SELECT version, {row}.id FROM collection_version WHERE id = 1;
+        DELETE FROM collection_changes
+            WHERE version <= (SELECT version FROM collection_version WHERE id = 1) - {COLLECTION_CHANGE_LOG_KEEP};
+    END'''
+
+
+COLLECTION_VERSION_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS collection_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )''',
+    "INSERT OR IGNORE INTO collection_version (id, version) VALUES (1, 0)",
+    '''CREATE TABLE IF NOT EXISTS collection_changes (
+        version INTEGER PRIMARY KEY,
+        movie_id INTEGER NOT NULL
+    )''',
+    # Re-created so databases with the counter-only triggers get the log
+    "DROP TRIGGER IF EXISTS trg_version_insert",
+    "DROP TRIGGER IF EXISTS trg_version_update",
+    "DROP TRIGGER IF EXISTS trg_version_delete",
+    _collection_version_trigger('INSERT', 'NEW'),
+    _collection_version_trigger('UPDATE', 'NEW'),
+    _collection_version_trigger('DELETE', 'OLD'),
+]
+
+
+# The index, and the db paths with the counter installed
+_title_index, _title_index_ready = process_singleton('title_index', lambda: (CollectionTitleIndex(), set()))
+
+
+def init_collection_version():
+    """Install the change counter, log and triggers once per process per database"""
+    ready = _title_index_ready
+    db_path = CONFIG['database_url']
+    if db_path not in ready:
+        with db_transaction() as c:
+            for statement in COLLECTION_VERSION_SCHEMA:
+                c.execute(statement)
+        ready.add(db_path)
+
+
+def _collection_version(c):
+    return c.execute('SELECT version FROM collection_version WHERE id = 1').fetchone()[0]
+
+
+def _refresh_title_index(index, db_path):
+    """Bring the index up to the database's collection_version: apply the
+    logged changes when the log covers every version since the last
+    refresh, otherwise rebuild from all rows"""
+    with db_snapshot() as c:
+        version = _collection_version(c)
+        signature = index.signature
+        if signature == (db_path, version):
+            return
+        if signature is not None and signature[0] == db_path and signature[1] < version:
+            changed = [movie_id for (movie_id,) in c.execute(
+                'SELECT movie_id FROM collection_changes WHERE version > ?', (signature[1],)
+            )]
+            changed_ids = set(changed)
+            if len(changed) == version - signature[1] and len(changed_ids) <= TITLE_INDEX_MAX_DELTA:
+                rows = c.execute(
+                    f"SELECT * FROM enhanced_movies WHERE id IN ({','.join('?' * len(changed_ids))}) "
+                    "ORDER BY added_at, id",
+                    tuple(changed_ids)
+                ).fetchall()
+                with index.lock, telemetry.span("title_index.apply"):
+                    for row in rows:
+                        if row[0] in index.rows:
+                            index.update(row)
+                        else:
+                            index.add(row)
+                    for movie_id in changed_ids - {row[0] for row in rows}:
+                        index.remove(movie_id)
+                    index.signature = (db_path, version)
+                return
+        with telemetry.span("title_index.build"):
+            rows = c.execute('SELECT * FROM enhanced_movies ORDER BY added_at DESC').fetchall()
+            index.build(rows, (db_path, version))
+
+
+def get_collection_title_index(movie_data=None):
+    """Process-wide title index, kept in step with the database through the
+    collection change log (see _refresh_title_index()).
+
+    movie_data is only used if the database cannot be read.
+    """
+    index = _title_index
+    try:
+        init_collection_version()
+        _refresh_title_index(index, CONFIG['database_url'])
+    except sqlite3.Error as e:
+        logging.warning(f"Title index built from the rows in hand: {e}")
+        index.build(movie_data, None)
+    return index
+
+
+# -----------------------------
+# SQLite Data Layer (pooled WAL connections, keyset pages, FTS5 search)
+# -----------------------------
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # readers never block the writer
+    "PRAGMA synchronous=NORMAL",      # safe with WAL, far fewer fsyncs
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",       # 16 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+DATA_LAYER_SCHEMA = [
+    # Keyset pagination walks this index instead of sorting the table
+    'CREATE INDEX IF NOT EXISTS idx_movies_added_id ON enhanced_movies(added_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_movies_genre_added_id ON enhanced_movies(genre, added_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_movies_watched_added_id ON enhanced_movies(watched, added_at, id)',
+]
+
+# External-content FTS5 table: stores only the index, rows stay in enhanced_movies
+FTS_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS enhanced_movies_fts USING fts5(
+        title, genre, plot, actors,
+        content='enhanced_movies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON enhanced_movies
+    BEGIN
+        INSERT INTO enhanced_movies_fts (rowid, title, genre, plot, actors)
+        VALUES (NEW.id, NEW.title, NEW.genre, NEW.plot, NEW.actors);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON enhanced_movies
+    BEGIN
+        INSERT INTO enhanced_movies_fts (enhanced_movies_fts, rowid, title, genre, plot, actors)
+        VALUES ('delete', OLD.id, OLD.title, OLD.genre, OLD.plot, OLD.actors);
+    END''',
+    # Only text changes touch the index - watched/rating toggles stay cheap
+    '''CREATE TRIGGER IF NOT EXISTS trg_fts_update
+    AFTER UPDATE OF title, genre, plot, actors ON enhanced_movies
+    BEGIN
+        INSERT INTO enhanced_movies_fts (enhanced_movies_fts, rowid, title, genre, plot, actors)
+        VALUES ('delete', OLD.id, OLD.title, OLD.genre, OLD.plot, OLD.actors);
+        INSERT INTO enhanced_movies_fts (rowid, title, genre, plot, actors)
+        VALUES (NEW.id, NEW.title, NEW.genre, NEW.plot, NEW.actors);
+    END''',
+]
+
+# Per-thread connection pools, and db path -> True when FTS5 is available
+_db_local, _data_layer_ready, _data_layer_lock = process_singleton(
+    'data_layer', lambda: (threading.local(), {}, threading.Lock()))
+
+
+def get_db_connection(db_path=None):
+    """This thread's pooled connection to db_path (default: the app database).
+
+    Connections are opened once per thread in autocommit mode with the WAL
+    pragmas applied; the sqlite3 statement cache keeps the fixed SQL strings
+    below prepared between calls.
+    """
+    db_path = db_path or CONFIG['database_url']
+    pool = getattr(_db_local, 'connections', None)
+    if pool is None:
+        pool = _db_local.connections = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=5, isolation_level=None, cached_statements=256)
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        pool[db_path] = conn
+    return conn
+
+
+@contextmanager
+def db_transaction(db_path=None):
+    """Write transaction on the pooled connection.
+
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+    queue on busy_timeout instead of failing on a read-to-write upgrade.
+    """
+    conn = get_db_connection(db_path)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    else:
+        conn.execute('COMMIT')
+
+
+@contextmanager
+def db_snapshot(db_path=None):
+    """Read transaction on the pooled connection, so several SELECTs see one
+    committed state. Inside an already open transaction it just reads in
+    that one."""
+    conn = get_db_connection(db_path)
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+    conn.execute('BEGIN')
+    try:
+        yield conn.cursor()
+    finally:
+        if conn.in_transaction:
+            conn.execute('COMMIT')
+
+
+def pooled_db_operation(operation, *args):
+    """safe_db_operation() on the pooled connection"""
+    init_data_layer()
+    try:
+        with telemetry.span("sqlite.write"), db_transaction() as c:
+            return operation(c, *args)
+    except sqlite3.Error as e:
+        logging.error(f"Database operation error: {e}")
+        st.error(f"Database error: {e}")
+        return None
+
+
+def init_data_layer():
+    """Create the pagination indexes and the FTS5 table once per database.
+
+    Returns True when FTS5 search is available; without it (SQLite built
+    without FTS5) searches fall back to LIKE.
+    """
+    db_path = CONFIG['database_url']
+    if db_path in _data_layer_ready:
+        return _data_layer_ready[db_path]
+    with _data_layer_lock:
+        if db_path in _data_layer_ready:
+            return _data_layer_ready[db_path]
+        conn = get_db_connection(db_path)
+        try:
+            for statement in DATA_LAYER_SCHEMA:
+                conn.execute(statement)
+        except sqlite3.Error as e:
+            logging.error(f"Could not create pagination indexes: {e}")
+            return False
+        fts_available = True
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'enhanced_movies_fts'"
+            ).fetchone()
+            with db_transaction(db_path) as c:
+                for statement in FTS_SCHEMA:
+                    c.execute(statement)
+                if not exists:
+                    # First run against this database: index the existing rows
+                    c.execute("INSERT INTO enhanced_movies_fts (enhanced_movies_fts) VALUES ('rebuild')")
+        except sqlite3.Error as e:
+            logging.warning(f"FTS5 unavailable, search falls back to LIKE: {e}")
+            fts_available = False
+        _data_layer_ready[db_path] = fts_available
+        return fts_available
+
+
+def fts_match_query(text):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _movie_filter_sql(filters, fts_available):
+    """WHERE clauses (on alias m) and params for the collection filters"""
+    clauses, params = [], []
+    filters = filters or {}
+    search = (filters.get('search') or '').strip()
+    if search:
+        match = fts_match_query(search) if fts_available else None
+        if match:
+            clauses.append('m.id IN (SELECT rowid FROM enhanced_movies_fts WHERE enhanced_movies_fts MATCH ?)')
+            params.append(match)
+        else:
+            clauses.append('(m.title LIKE ? OR m.genre LIKE ?)')
+            params.extend([f"%{search}%"] * 2)
+    if filters.get('genre') and filters['genre'] != 'All':
+        clauses.append('m.genre = ?')
+        params.append(filters['genre'])
+    if filters.get('watched') == 'Watched':
+        clauses.append('m.watched = 1')
+    elif filters.get('watched') == 'Unwatched':
+        clauses.append('m.watched = 0')
+    return clauses, params
+
+
+@telemetry.traced("sqlite.movies_page")
+def get_movies_page(cursor=None, page_size=20, filters=None):
+    """One page of the collection, newest first, using keyset pagination.
+
+    cursor is the (added_at, id) of the last row of the previous page (None
+    for the first page). Returns (rows, next_cursor); next_cursor is None on
+    the last page. Cost does not grow with how deep the page is.
+    """
+    fts_available = init_data_layer()
+    clauses, params = _movie_filter_sql(filters, fts_available)
+    if cursor is not None:
+        clauses.append('(m.added_at, m.id) < (?, ?)')
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    try:
+        c = get_db_connection().execute(
+            f'''SELECT m.* FROM enhanced_movies m {where}
+                ORDER BY m.added_at DESC, m.id DESC LIMIT ?''',
+            params + [page_size + 1]
+        )
+        rows = c.fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Database error in keyset pagination: {e}")
+        return [], None
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    # Migrated databases have added_at at a different position
+    added_at = [column[0] for column in c.description].index('added_at')
+    return rows, (rows[-1][added_at], rows[-1][0])
+
+
+@telemetry.traced("sqlite.count_movies")
+def count_movies(filters=None):
+    """Number of movies matching filters (O(1) from the summary tables when unfiltered)"""
+    fts_available = init_data_layer()
+    clauses, params = _movie_filter_sql(filters, fts_available)
+    if not clauses:
+        return get_stats_incremental()['total_movies']
+    try:
+        return get_db_connection().execute(
+            f"SELECT COUNT(*) FROM enhanced_movies m WHERE {' AND '.join(clauses)}", params
+        ).fetchone()[0]
+    except sqlite3.Error as e:
+        logging.error(f"Database error counting movies: {e}")
+        return 0
+
+
+def search_movies_fts(text, limit=20):
+    """Collection rows matching text in title/genre/plot/actors, best match first"""
+    if not init_data_layer():
+        return get_movies_page(page_size=limit, filters={'search': text})[0]
+    match = fts_match_query(text)
+    if not match:
+        return []
+    try:
+        return get_db_connection().execute(
+            '''SELECT m.* FROM enhanced_movies_fts f JOIN enhanced_movies m ON m.id = f.rowid
+               WHERE enhanced_movies_fts MATCH ? ORDER BY bm25(enhanced_movies_fts, 10.0, 3.0, 1.0, 1.0)
+               LIMIT ?''',
+            (match, limit)
+        ).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Database error in full-text search: {e}")
+        return []
+
+
+def toggle_watched_atomic(movie_id):
+    """toggle_watched() as one UPDATE - no read-then-write race between sessions"""
+    def operation(c, movie_id):
+        c.execute('''
+            UPDATE enhanced_movies
+            SET watched = NOT watched, last_modified = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (movie_id,))
+        return c.rowcount
+    return pooled_db_operation(operation, movie_id)
+
+
+# -----------------------------
+# Bulk Import / Export (streaming CSV/JSONL, chunked inserts)
+# -----------------------------
+BULK_IMPORT_CHUNK = 5000
+BULK_ENRICH_BATCH = 200
+
+# Column name aliases (lowercased) across our own export, Letterboxd and IMDb
+IMPORT_COLUMN_ALIASES = {
+    'title': ('title', 'name', 'movie', 'film'),
+    'year': ('year', 'release year', 'release_year'),
+    'genre': ('genre', 'genres'),
+    'rating': ('rating', 'your rating', 'my rating'),
+    'review': ('review', 'notes'),
+    'details_id': ('details_id', 'imdbid', 'imdb_id', 'const', 'tconst'),
+    'url': ('url', 'letterboxd uri', 'imdb url'),
+    'watched': ('watched',),
+    'added_at': ('added_at', 'watched date', 'date rated', 'date', 'created'),
+    'plot': ('plot',),
+    'director': ('director', 'directors'),
+    'actors': ('actors', 'cast'),
+    'runtime': ('runtime', 'runtime (mins)'),
+    'details_rating': ('details_rating', 'imdb rating'),
+    'poster_url': ('poster_url', 'poster'),
+}
+
+# Row triggers a bulk chunk replaces with one set-based statement each
+BULK_SUSPENDED_TRIGGERS = ('trg_fts_insert', 'trg_stats_insert', 'trg_analytics_insert', 'trg_version_insert')
+
+IMPORT_COLUMNS = ('title', 'genre', 'year', 'watched', 'rating', 'review', 'details_id', 'poster_url',
+                  'plot', 'director', 'actors', 'runtime', 'details_rating', 'ticket_available', 'added_at')
+
+
+@dataclass
+class BulkImportReport:
+    """Running totals for an import; passed to on_progress after every chunk"""
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    enrichment_queued: int = 0
+    fraction: float = 0.0
+    elapsed: float = 0.0
+
+
+def import_field_map(keys):
+    """Which record keys feed each column, in alias order.
+
+    Computed once per header (CSV) or key layout (JSONL) rather than per row.
+    """
+    lowered = {str(k).strip().lower(): k for k in keys if k is not None}
+    field_map = {
+        field_name: [lowered[alias] for alias in aliases if alias in lowered]
+        for field_name, aliases in IMPORT_COLUMN_ALIASES.items()
+    }
+    field_map['_ten_point_rating'] = 'your rating' in lowered  # IMDb exports rate out of 10
+    field_map['_watch_date'] = lowered.get('watched date')
+    return field_map
+
+
+def _pick(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'watched')
+
+
+def normalize_import_record(record, current_year=None, field_map=None):
+    """Map one CSV/JSONL record onto enhanced_movies columns (None if unusable).
+
+    Ratings are scaled to our 0-5 stars: IMDb's "Your Rating" is out of 10,
+    Letterboxd's half stars are rounded up. A rating or a watch date marks
+    the movie as watched unless a watched column says otherwise.
+    """
+    field_map = field_map or import_field_map(record)
+    title = _pick(record, field_map['title'])
+    if not title or not str(title).strip():
+        return None
+    year = _pick(record, field_map['year'])
+    try:
+        year = int(str(year).strip()[:4]) if year is not None else None
+    except ValueError:
+        year = None
+
+    rating = 0
+    raw_rating = _pick(record, field_map['rating'])
+    if raw_rating is not None:
+        try:
+            value = float(raw_rating)
+            if field_map['_ten_point_rating'] or value > 5:
+                value /= 2
+            rating = max(0, min(5, math.ceil(value)))
+        except ValueError:
+            rating = 0
+
+    details_id = _pick(record, field_map['details_id'])
+    details_id = str(details_id).strip() or None if details_id else None
+    if not is_imdb_id(details_id):
+        match = re.search(r"tt\d{7,}", str(_pick(record, field_map['url']) or ''))
+        details_id = match.group(0) if match else details_id
+
+    watched = _pick(record, field_map['watched'])
+    if watched is None:
+        watched = rating > 0 or bool(field_map['_watch_date'] and record.get(field_map['_watch_date']))
+    else:
+        watched = _truthy(watched)
+
+    genre = str(_pick(record, field_map['genre']) or 'Unknown').split(',')[0].strip() or 'Unknown'
+    current_year = current_year or datetime.now().year
+    added_at = _pick(record, field_map['added_at'])
+    return {
+        'title': str(title).strip(),
+        'genre': genre,
+        'year': year,
+        'watched': bool(watched),
+        'rating': rating,
+        'review': str(_pick(record, field_map['review']) or ''),
+        'details_id': details_id,
+        'poster_url': _pick(record, field_map['poster_url']),
+        'plot': _pick(record, field_map['plot']),
+        'director': _pick(record, field_map['director']),
+        'actors': _pick(record, field_map['actors']),
+        'runtime': _pick(record, field_map['runtime']),
+        'details_rating': _pick(record, field_map['details_rating']),
+        # Same rule as EnhancedStreamingServiceFinder.is_movie_in_theaters
+        'ticket_available': bool(year and year >= current_year - 1),
+        'added_at': str(added_at) if added_at else datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def _open_import_source(source):
+    """(binary file, size in bytes, name, close_when_done) for a path or file-like"""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), os.path.getsize(source), str(source), True
+    size = getattr(source, 'size', None)
+    if size is None:
+        position = source.tell()
+        size = source.seek(0, io.SEEK_END)
+        source.seek(position)
+    return source, size, getattr(source, 'name', ''), False
+
+
+def iter_import_records(raw, fmt):
+    """Stream dict records from a binary CSV or JSONL file (constant memory).
+
+    JSONL lines that do not parse to an object come out as {}, which
+    normalize_import_record rejects, so they count as invalid rows.
+    """
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'jsonl':
+            for line in text:
+                line = line.strip()
+                if line:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        record = {}
+                    yield record if isinstance(record, dict) else {}
+        else:
+            yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def _existing_duplicates(conn, records):
+    """Keys from records that are already in the collection"""
+    ids = {r['details_id'] for r in records if r['details_id']}
+    titles = {r['title'].lower() for r in records}
+    found_ids, found_titles = set(), set()
+    for batch in (list(ids)[i:i + 500] for i in range(0, len(ids), 500)):
+        found_ids.update(row[0] for row in conn.execute(
+            f"SELECT details_id FROM enhanced_movies WHERE details_id IN ({','.join('?' * len(batch))})", batch))
+    for batch in (list(titles)[i:i + 500] for i in range(0, len(titles), 500)):
+        found_titles.update((row[0].lower(), row[1]) for row in conn.execute(
+            f"SELECT title, year FROM enhanced_movies WHERE title COLLATE NOCASE IN ({','.join('?' * len(batch))})",
+            batch))
+    return found_ids, found_titles
+
+
+def _add_chunk_to_collection_stats(c, rows):
+    """What trg_stats_insert would have added for these IMPORT_COLUMNS rows"""
+    column = {name: position for position, name in enumerate(IMPORT_COLUMNS)}
+    ratings = [row[column['rating']] for row in rows if row[column['rating']] > 0]
+    c.execute('''UPDATE collection_stats SET
+                     total_movies = total_movies + ?, watched_count = watched_count + ?,
+                     rating_sum = rating_sum + ?, rated_count = rated_count + ?,
+                     in_theaters_count = in_theaters_count + ?
+                 WHERE id = 1''',
+              (len(rows), sum(1 for row in rows if row[column['watched']]), sum(ratings), len(ratings),
+               sum(1 for row in rows if row[column['ticket_available']])))
+    genre_counts = {}
+    for row in rows:
+        genre_counts[row[column['genre']]] = genre_counts.get(row[column['genre']], 0) + 1
+    c.executemany('INSERT OR IGNORE INTO collection_genre_counts (genre, movie_count) VALUES (?, 0)',
+                  [(genre,) for genre in genre_counts])
+    c.executemany('UPDATE collection_genre_counts SET movie_count = movie_count + ? WHERE genre = ?',
+                  [(count, genre) for genre, count in genre_counts.items()])
+
+
+def _insert_import_chunk(records, report):
+    """Dedupe one chunk against the table (and itself), insert the rest.
+
+    Returns the ids of the inserted rows. The chunk runs in a single
+    BEGIN IMMEDIATE transaction, so the new ids are one contiguous range.
+    """
+    with db_transaction() as c:
+        found_ids, found_titles = _existing_duplicates(c.connection, records)
+        rows, seen = [], set()
+        for record in records:
+            key = (record['title'].lower(), record['year'])
+            if key in found_titles or key in seen or (record['details_id'] and record['details_id'] in found_ids):
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            if record['details_id']:
+                found_ids.add(record['details_id'])
+            rows.append(tuple(record[column] for column in IMPORT_COLUMNS))
+        if not rows:
+            return range(0)
+        # Do the per-row trigger work once per chunk instead: the DROP and
+        # re-CREATE are part of this transaction, so a failure restores them
+        suspended = c.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+            f"AND name IN ({','.join('?' * len(BULK_SUSPENDED_TRIGGERS))})",
+            BULK_SUSPENDED_TRIGGERS
+        ).fetchall()
+        for name, _ in suspended:
+            c.execute(f'DROP TRIGGER {name}')
+        c.executemany(
+            f"INSERT INTO enhanced_movies ({', '.join(IMPORT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(IMPORT_COLUMNS))})",
+            rows
+        )
+        last_id = c.execute('SELECT last_insert_rowid()').fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        suspended_names = {name for name, _ in suspended}
+        if 'trg_fts_insert' in suspended_names:
+            c.execute('''INSERT INTO enhanced_movies_fts (rowid, title, genre, plot, actors)
+                         SELECT id, title, genre, plot, actors FROM enhanced_movies WHERE id BETWEEN ? AND ?''',
+                      (first_id, last_id))
+        if 'trg_stats_insert' in suspended_names:
+            _add_chunk_to_collection_stats(c, rows)
+        if 'trg_analytics_insert' in suspended_names:
+            _add_movies_to_analytics(c, 'id BETWEEN ? AND ?', (first_id, last_id))
+        if 'trg_version_insert' in suspended_names:
+            # Unlogged bump: the title index sees the gap and rebuilds
+            c.execute('UPDATE collection_version SET version = version + 1 WHERE id = 1')
+        for _, sql in suspended:
+            c.execute(sql)
+        report.inserted += len(rows)
+        return range(first_id, last_id + 1)
+
+
+@telemetry.traced("bulk.import")
+def bulk_import_movies(source, fmt=None, on_progress=None, enrich=True, chunk_size=BULK_IMPORT_CHUNK):
+    """Import a CSV or JSONL watch history (path or binary file-like) into enhanced_movies.
+
+    Rows are streamed, normalized (Letterboxd, IMDb and our own export
+    columns are recognised), deduplicated against details_id and
+    title+year, and inserted with executemany in chunked transactions.
+    New rows without a plot are queued for background OMDB enrichment.
+    on_progress(report) is called after every chunk.
+    """
+    init_data_layer()
+    init_import_indexes()
+    raw, size, name, close_when_done = _open_import_source(source)
+    fmt = fmt or ('jsonl' if name.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    report = BulkImportReport()
+    started = time.perf_counter()
+    current_year = datetime.now().year
+    field_maps = {}
+    try:
+        records = iter_import_records(raw, fmt)
+        while True:
+            batch = list(islice(records, chunk_size))
+            if not batch:
+                break
+            report.read += len(batch)
+            chunk = []
+            for record in batch:
+                layout = tuple(record)
+                if layout not in field_maps:
+                    field_maps[layout] = import_field_map(layout)
+                normalized = normalize_import_record(record, current_year, field_maps[layout])
+                if normalized is None:
+                    report.invalid += 1
+                else:
+                    chunk.append(normalized)
+            if chunk:
+                new_ids = _insert_import_chunk(chunk, report)
+                if enrich and new_ids:
+                    # Enrichment starts while the rest of the file is still importing
+                    queue_enrichment(new_ids)
+                    report.enrichment_queued += len(new_ids)
+            report.fraction = min(1.0, raw.tell() / size) if size else 0.0
+            report.elapsed = time.perf_counter() - started
+            if on_progress:
+                on_progress(report)
+    finally:
+        if close_when_done:
+            raw.close()
+
+    report.fraction = 1.0
+    report.elapsed = time.perf_counter() - started
+    if on_progress:
+        on_progress(report)
+    telemetry.count("bulk.imported_rows", report.inserted)
+    logging.info(f"Bulk import: {report.inserted} new, {report.duplicates} duplicates, "
+                 f"{report.invalid} invalid in {report.elapsed:.1f}s")
+    return report
+
+
+def init_import_indexes():
+    """Indexes the import dedupe lookups need (created once per database)"""
+    conn = get_db_connection()
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_movies_details_id ON enhanced_movies(details_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_movies_title_nocase ON enhanced_movies(title COLLATE NOCASE)')
+
+
+_enrichment_queue, BULK_ENRICHMENT_STATUS, _enrichment_state, _enrichment_worker_lock = process_singleton(
+    'enrichment_queue',
+    lambda: (queue.Queue(), {'queued': 0, 'enriched': 0, 'not_found': 0, 'skipped': 0}, {'worker': None},
+             threading.Lock()))
+
+
+def queue_enrichment(movie_ids):
+    """Queue collection rows for background OMDB enrichment (plots, posters, ids)"""
+    movie_ids = list(movie_ids)
+    for start in range(0, len(movie_ids), BULK_ENRICH_BATCH):
+        _enrichment_queue.put((CONFIG['database_url'], movie_ids[start:start + BULK_ENRICH_BATCH]))
+    with _enrichment_worker_lock:
+        BULK_ENRICHMENT_STATUS['queued'] += len(movie_ids)
+        worker = _enrichment_state['worker']
+        if worker is None or not worker.is_alive():
+            worker = threading.Thread(target=_run_enrichment_queue, daemon=True, name="bulk-enrichment")
+            _enrichment_state['worker'] = worker
+            worker.start()
+
+
+def _run_enrichment_queue():
+    while True:
+        try:
+            db_path, movie_ids = _enrichment_queue.get(timeout=30)
+        except queue.Empty:
+            return
+        try:
+            enrich_collection_rows(movie_ids, db_path)
+        except Exception as e:
+            logging.error(f"Background enrichment batch failed: {e}")
+        finally:
+            _enrichment_queue.task_done()
+
+
+@telemetry.traced("bulk.enrich_batch")
+def enrich_collection_rows(movie_ids, db_path=None):
+    """Fill OMDB details for the given rows; lookups run concurrently via enrich_movies_bulk.
+
+    Rows whose details_id is set but is not an IMDb id are skipped rather
+    than looked up by that id as if it were a title.
+    """
+    conn = get_db_connection(db_path)
+    placeholders = ','.join('?' * len(movie_ids))
+    rows = conn.execute(
+        f"SELECT id, title, year, details_id FROM enhanced_movies WHERE id IN ({placeholders}) AND plot IS NULL",
+        list(movie_ids)
+    ).fetchall()
+    by_item = {}
+    for movie_id, title, year, details_id in rows:
+        if details_id and not is_imdb_id(details_id):
+            BULK_ENRICHMENT_STATUS['skipped'] += 1
+            continue
+        by_item.setdefault(details_id or (title, year), []).append(movie_id)
+
+    updates = []
+    for item, details in enrich_movies_bulk(list(by_item)):
+        if not details:
+            BULK_ENRICHMENT_STATUS['not_found'] += len(by_item[item])
+            continue
+        for movie_id in by_item[item]:
+            updates.append((
+                details.get('imdbID'), details.get('Poster'), details.get('Plot'), details.get('Director'),
+                details.get('Actors'), details.get('Runtime'), details.get('imdbRating'),
+                (details.get('Genre') or 'Unknown').split(',')[0].strip(), movie_id,
+            ))
+    if updates:
+        with db_transaction(db_path) as c:
+            c.executemany('''
+                UPDATE enhanced_movies SET
+                    details_id = COALESCE(details_id, ?), poster_url = ?, plot = ?, director = ?,
+                    actors = ?, runtime = ?, details_rating = ?,
+                    genre = CASE WHEN genre = 'Unknown' THEN ? ELSE genre END,
+                    last_modified = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', updates)
+        BULK_ENRICHMENT_STATUS['enriched'] += len(updates)
+    return len(updates)
+
+
+def _export_chunks(fmt, filters, chunk_size):
+    """(text, row count) per keyset page; the CSV header comes first"""
+    cursor = None
+    columns = [row[1] for row in get_db_connection().execute('PRAGMA table_info(enhanced_movies)')]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue(), 0
+    while True:
+        rows, cursor = get_movies_page(cursor, chunk_size, filters)
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue(), len(rows)
+        else:
+            yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows), len(rows)
+        if cursor is None:
+            return
+
+
+def iter_export_movies(fmt='csv', filters=None, chunk_size=BULK_IMPORT_CHUNK):
+    """Yield the collection as CSV or JSONL text, one keyset page at a time"""
+    for text, _ in _export_chunks(fmt, filters, chunk_size):
+        yield text
+
+
+@telemetry.traced("bulk.export")
+def bulk_export_movies(path, fmt=None, filters=None):
+    """Stream the collection to a CSV/JSONL file; returns the number of rows written"""
+    fmt = fmt or ('jsonl' if str(path).lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for text, rows in _export_chunks(fmt, filters, BULK_IMPORT_CHUNK):
+            f.write(text)
+            written += rows
+    return written
+
+
+BULK_EXPORT_SPOOL_SIZE = 8 * 1024 * 1024  # bytes kept in memory before spilling to disk
+
+
+def spool_export_movies(fmt='csv', filters=None):
+    """The collection export in a rewound binary temp file, for st.download_button.
+
+    Building it stays bounded (memory up to BULK_EXPORT_SPOOL_SIZE, disk
+    beyond), but st.download_button reads the whole file into memory to
+    serve it; Streamlit has no streaming downloads. For collections too
+    big for that, write the file with bulk_export_movies instead.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_EXPORT_SPOOL_SIZE, mode='w+b')
+    for text in iter_export_movies(fmt, filters):
+        spool.write(text.encode('utf-8'))
+    spool.seek(0)
+    return spool
+
+
+def show_bulk_import_panel():
+    """Upload a Letterboxd / IMDb / CodeFlix export and download the collection"""
+    st.markdown("### 📦 Import / Export Collection")
+    uploaded = st.file_uploader("CSV or JSONL (Letterboxd, IMDb or CodeFlix export)",
+                                type=['csv', 'jsonl', 'ndjson'], key="bulk_import_file")
+    if uploaded is not None and st.button("⬆️ Import", key="bulk_import_go"):
+        progress = st.progress(0.0)
+        status = st.empty()
+
+        def on_progress(report):
+            progress.progress(report.fraction)
+            status.caption(f"{report.read:,} read · {report.inserted:,} new · "
+                           f"{report.duplicates:,} duplicates · {report.elapsed:.1f}s")
+
+        report = bulk_import_movies(uploaded, on_progress=on_progress)
+        st.success(f"Imported {report.inserted:,} movies ({report.duplicates:,} already in your collection).")
+        if report.enrichment_queued:
+            st.info(f"🔄 Fetching details for {report.enrichment_queued:,} movies in the background.")
+
+    fmt = st.radio("Export format", ['csv', 'jsonl'], horizontal=True, key="bulk_export_format")
+    if st.button("⬇️ Prepare export", key="bulk_export_go"):
+        with spool_export_movies(fmt) as export:
+            st.download_button("Download", export, file_name=f"codeflix_collection.{fmt}",
+                               key="bulk_export_download")
+
+
+# -----------------------------
+# Incremental Collection Statistics (trigger-maintained summary tables)
+# -----------------------------
+COLLECTION_STATS_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS collection_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_movies INTEGER NOT NULL DEFAULT 0,
+        watched_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        rated_count INTEGER NOT NULL DEFAULT 0,
+        in_theaters_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS collection_genre_counts (
+        genre TEXT PRIMARY KEY,
+        movie_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    # Dropped and re-created so databases with the older triggers get these
+    "DROP TRIGGER IF EXISTS trg_stats_insert",
+    "DROP TRIGGER IF EXISTS trg_stats_delete",
+    "DROP TRIGGER IF EXISTS trg_stats_update",
+    '''CREATE TRIGGER trg_stats_insert AFTER INSERT ON enhanced_movies
+    BEGIN
+        UPDATE collection_stats SET
+            total_movies = total_movies + 1,
+            watched_count = watched_count + IFNULL(NEW.watched = 1, 0),
+            rating_sum = rating_sum + IFNULL(CASE WHEN NEW.rating > 0 THEN NEW.rating END, 0),
+            rated_count = rated_count + IFNULL(NEW.rating > 0, 0),
+            in_theaters_count = in_theaters_count + IFNULL(NEW.ticket_available = 1, 0)
+        WHERE id = 1;
+        INSERT OR IGNORE INTO collection_genre_counts (genre, movie_count) VALUES (NEW.genre, 0);
+        UPDATE collection_genre_counts SET movie_count = movie_count + 1 WHERE genre = NEW.genre;
+    END''',
+    '''CREATE TRIGGER trg_stats_delete AFTER DELETE ON enhanced_movies
+    BEGIN
+        UPDATE collection_stats SET
+            total_movies = total_movies - 1,
+            watched_count = watched_count - IFNULL(OLD.watched = 1, 0),
+            rating_sum = rating_sum - IFNULL(CASE WHEN OLD.rating > 0 THEN OLD.rating END, 0),
+            rated_count = rated_count - IFNULL(OLD.rating > 0, 0),
+            in_theaters_count = in_theaters_count - IFNULL(OLD.ticket_available = 1, 0)
+        WHERE id = 1;
+        UPDATE collection_genre_counts SET movie_count = movie_count - 1 WHERE genre = OLD.genre;
+        DELETE FROM collection_genre_counts WHERE genre = OLD.genre AND movie_count <= 0;
+    END''',
+    '''CREATE TRIGGER trg_stats_update
+    AFTER UPDATE OF watched, rating, genre, ticket_available ON enhanced_movies
+    BEGIN
+        UPDATE collection_stats SET
+            watched_count = watched_count - IFNULL(OLD.watched = 1, 0) + IFNULL(NEW.watched = 1, 0),
+            rating_sum = rating_sum - IFNULL(CASE WHEN OLD.rating > 0 THEN OLD.rating END, 0)
+                                    + IFNULL(CASE WHEN NEW.rating > 0 THEN NEW.rating END, 0),
+            rated_count = rated_count - IFNULL(OLD.rating > 0, 0) + IFNULL(NEW.rating > 0, 0),
+            in_theaters_count = in_theaters_count - IFNULL(OLD.ticket_available = 1, 0) + IFNULL(NEW.ticket_available = 1, 0)
+        WHERE id = 1;
+        UPDATE collection_genre_counts SET movie_count = movie_count - 1 WHERE genre = OLD.genre;
+        DELETE FROM collection_genre_counts WHERE genre = OLD.genre AND movie_count <= 0;
+        INSERT OR IGNORE INTO collection_genre_counts (genre, movie_count) VALUES (NEW.genre, 0);
+        UPDATE collection_genre_counts SET movie_count = movie_count + 1 WHERE genre = NEW.genre;
+    END''',
+]
+
+_stats_ready, _stats_lock = process_singleton('collection_stats', lambda: (set(), threading.Lock()))
+
+
+def _rebuild_collection_stats(c):
+    """Recompute the summary tables from enhanced_movies (one aggregate pass)"""
+    c.execute('''
+        INSERT OR REPLACE INTO collection_stats
+            (id, total_movies, watched_count, rating_sum, rated_count, in_theaters_count)
+        SELECT 1, COUNT(*),
+               COALESCE(SUM(watched = 1), 0),
+               COALESCE(SUM(CASE WHEN rating > 0 THEN rating ELSE 0 END), 0),
+               COALESCE(SUM(rating > 0), 0),
+               COALESCE(SUM(ticket_available = 1), 0)
+        FROM enhanced_movies
+    ''')
+    c.execute('DELETE FROM collection_genre_counts')
+    c.execute('''
+        INSERT INTO collection_genre_counts (genre, movie_count)
+        SELECT genre, COUNT(*) FROM enhanced_movies GROUP BY genre
+    ''')
+
+
+def init_collection_stats():
+    """Install the summary tables and triggers once per process per database"""
+    db_path = CONFIG['database_url']
+    if db_path in _stats_ready:
+        return
+    with _stats_lock:
+        if db_path in _stats_ready:
+            return
+        try:
+            with db_transaction(db_path) as c:
+                for statement in COLLECTION_STATS_SCHEMA:
+                    c.execute(statement)
+                c.execute('SELECT 1 FROM collection_stats WHERE id = 1')
+                if not c.fetchone():
+                    # First run against this database: backfill from the table
+                    _rebuild_collection_stats(c)
+            _stats_ready.add(db_path)
+        except sqlite3.Error as e:
+            logging.error(f"Could not set up collection stats: {e}")
+
+
+@telemetry.traced("sqlite.collection_stats")
+def get_stats_incremental(verify=False):
+    """get_stats() in O(1) from the trigger-maintained summary tables.
+
+    verify=True also runs the full get_stats() scan, logs any drift and
+    rebuilds the summary tables from scratch when they disagree.
+    """
+    init_collection_stats()
+    try:
+        c = get_db_connection().cursor()
+        c.execute('''SELECT total_movies, watched_count, rating_sum, rated_count, in_theaters_count
+                     FROM collection_stats WHERE id = 1''')
+        row = c.fetchone()
+        c.execute('SELECT COUNT(*) FROM collection_genre_counts')
+        unique_genres = c.fetchone()[0]
+    except sqlite3.Error as e:
+        logging.error(f"Stats summary unavailable, falling back to full scan: {e}")
+        return get_stats()
+
+    if row is None:
+        return get_stats()
+
+    total_movies, watched_count, rating_sum, rated_count, in_theaters_count = row
+    stats = {
+        'total_movies': total_movies,
+        'watched_count': watched_count,
+        'completion_rate': (watched_count / total_movies * 100) if total_movies > 0 else 0,
+        'unique_genres': unique_genres,
+        'average_rating': rating_sum / rated_count if rated_count else 0,
+        'in_theaters_count': in_theaters_count,
+    }
+
+    if verify:
+        full_scan = get_stats()
+        drift = {
+            key: (stats[key], full_scan[key]) for key in stats
+            if abs(float(stats[key]) - float(full_scan[key])) > 1e-6
+        }
+        if drift:
+            logging.warning(f"Collection stats drifted, rebuilding: {drift}")
+            with db_transaction() as c:
+                _rebuild_collection_stats(c)
+            return full_scan
+
+    return stats
+
+
+# -----------------------------
+# Incremental Analytics Store (trigger-maintained chart aggregates)
+# -----------------------------
+# Chart dimension -> SQL bucket expression over a movie row ({row} is NEW,
+# OLD or the table itself). Unknown years/ratings land in bucket 0 and
+# rows without a usable added_at in bucket ''.
+ANALYTICS_DIMENSIONS = {
+    'genre_watched': "{row}.genre || '|' || IFNULL({row}.watched = 1, 0)",
+    'year': "IFNULL({row}.year, 0)",
+    'rating': "IFNULL({row}.rating, 0)",
+    'month': "IFNULL(strftime('%Y-%m', {row}.added_at), '')",
+}
+
+
+def _analytics_upsert(dimension, row, amount="1"):
+    return (f"INSERT INTO analytics_counts (dimension, bucket, movie_count) "
+            f"VALUES ('{dimension}', {ANALYTICS_DIMENSIONS[dimension].format(row=row)}, {amount}) "
+            f"ON CONFLICT(dimension, bucket) DO UPDATE SET movie_count = movie_count + {amount};")
+
+
+def _analytics_decrement(dimension, row):
+    return (f"UPDATE analytics_counts SET movie_count = movie_count - 1 "
+            f"WHERE dimension = '{dimension}' AND bucket = {ANALYTICS_DIMENSIONS[dimension].format(row=row)};")
+
+
+ANALYTICS_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS analytics_counts (
+        dimension TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        movie_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, bucket)
+    ) WITHOUT ROWID''',
+    "CREATE TRIGGER IF NOT EXISTS trg_analytics_insert AFTER INSERT ON enhanced_movies BEGIN "
+    + " ".join(_analytics_upsert(d, 'NEW') for d in ANALYTICS_DIMENSIONS) + " END",
+    "CREATE TRIGGER IF NOT EXISTS trg_analytics_delete AFTER DELETE ON enhanced_movies BEGIN "
+    + " ".join(_analytics_decrement(d, 'OLD') for d in ANALYTICS_DIMENSIONS)
+    + " DELETE FROM analytics_counts WHERE movie_count <= 0; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_analytics_update "
+    "AFTER UPDATE OF genre, watched, year, rating, added_at ON enhanced_movies BEGIN "
+    + " ".join(_analytics_decrement(d, 'OLD') + " " + _analytics_upsert(d, 'NEW') for d in ANALYTICS_DIMENSIONS)
+    + " DELETE FROM analytics_counts WHERE movie_count <= 0; END",
+]
+
+_analytics_ready, _analytics_lock = process_singleton('analytics', lambda: (set(), threading.Lock()))
+
+
+def _add_movies_to_analytics(c, where="", params=()):
+    """Add the aggregates of the matching rows (all rows when where is empty)"""
+    for dimension, expression in ANALYTICS_DIMENSIONS.items():
+        c.execute(f'''
+            INSERT INTO analytics_counts (dimension, bucket, movie_count)
+            SELECT '{dimension}', {expression.format(row='enhanced_movies')}, COUNT(*)
+            FROM enhanced_movies WHERE {where or 1} GROUP BY 2
+            ON CONFLICT(dimension, bucket) DO UPDATE SET movie_count = movie_count + excluded.movie_count
+        ''', params)
+
+
+def _rebuild_analytics(c):
+    """Recompute every chart aggregate from enhanced_movies (GROUP BY per dimension)"""
+    c.execute('DELETE FROM analytics_counts')
+    _add_movies_to_analytics(c)
+
+
+def init_analytics_store():
+    """Install the aggregate table and triggers once per process per database"""
+    db_path = CONFIG['database_url']
+    if db_path in _analytics_ready:
+        return True
+    with _analytics_lock:
+        if db_path in _analytics_ready:
+            return True
+        try:
+            exists = get_db_connection().execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'analytics_counts'"
+            ).fetchone()
+            with db_transaction() as c:
+                for statement in ANALYTICS_SCHEMA:
+                    c.execute(statement)
+                if not exists:
+                    # First run against this database: backfill from the table
+                    _rebuild_analytics(c)
+            _analytics_ready.add(db_path)
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Could not set up the analytics store: {e}")
+            return False
+
+
+@telemetry.traced("sqlite.analytics_snapshot")
+def get_analytics_snapshot():
+    """Chart-ready aggregates, read from the (small) analytics_counts table.
+
+    Returns None when the store is unavailable, otherwise a dict of
+    genre_counts, watch_counts, genre_watch, year_counts, rating_counts
+    and monthly_added - sizes depend on distinct values, not on rows.
+    """
+    if not init_analytics_store():
+        return None
+    try:
+        rows = get_db_connection().execute(
+            'SELECT dimension, bucket, movie_count FROM analytics_counts ORDER BY dimension, bucket'
+        ).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Analytics store read failed: {e}")
+        return None
+
+    snapshot = {'genre_counts': {}, 'watch_counts': {'Watched': 0, 'Unwatched': 0}, 'genre_watch': {},
+                'year_counts': {}, 'rating_counts': {}, 'monthly_added': {}}
+    current_month = datetime.now().strftime('%Y-%m')
+    for dimension, bucket, count in rows:
+        if dimension == 'genre_watched':
+            genre, watched = bucket.rsplit('|', 1)
+            status = 'Watched' if watched == '1' else 'Unwatched'
+            snapshot['genre_counts'][genre] = snapshot['genre_counts'].get(genre, 0) + count
+            snapshot['watch_counts'][status] += count
+            snapshot['genre_watch'].setdefault(genre, {'Watched': 0, 'Unwatched': 0})[status] += count
+        elif dimension == 'year' and bucket.isdigit() and int(bucket) > 0:
+            snapshot['year_counts'][int(bucket)] = count
+        elif dimension == 'rating' and bucket.isdigit() and int(bucket) > 0:
+            snapshot['rating_counts'][int(bucket)] = count
+        elif dimension == 'month':
+            # Same as the DataFrame version: undated rows count as this month
+            month = bucket or current_month
+            snapshot['monthly_added'][month] = snapshot['monthly_added'].get(month, 0) + count
+    snapshot['year_counts'] = dict(sorted(snapshot['year_counts'].items()))
+    snapshot['rating_counts'] = dict(sorted(snapshot['rating_counts'].items()))
+    snapshot['monthly_added'] = dict(sorted(snapshot['monthly_added'].items()))
+    return snapshot
+
+
+def create_analytics_charts_incremental():
+    """create_advanced_analytics_charts() built from the analytics store.
+
+    No movie rows are loaded: the six figures come from the aggregates, and
+    are rebuilt only when those aggregates change.
+    """
+    snapshot = get_analytics_snapshot()
+    if snapshot is None:
+        return create_advanced_analytics_charts(get_movies_safe())
+    if not snapshot['genre_counts']:
+        return tuple([None] * 6)
+    return _analytics_figures(json.dumps(snapshot, sort_keys=True))
+
+
+@st.cache_resource(max_entries=4)
+def _analytics_figures(snapshot_json):
+    snapshot = json.loads(snapshot_json)
+    chart_config = {
+        'paper_bgcolor': 'rgba(0,0,0,0)',
+        'plot_bgcolor': 'rgba(0,0,0,0)',
+        'font_color': 'white',
+        'title_font_size': 20,
+        'title_x': 0.5
+    }
+    charts = []
+
+    # 1. Genre Distribution
+    try:
+        genre_counts = sorted(snapshot['genre_counts'].items(), key=lambda item: -item[1])
+        fig = px.pie(values=[count for _, count in genre_counts], names=[genre for genre, _ in genre_counts],
+                     title="🎭 Genre Distribution", hole=0.5)
+        fig.update_layout(**chart_config)
+        charts.append(fig)
+    except Exception:
+        charts.append(None)
+
+    # 2. Watch Status
+    try:
+        watch_counts = snapshot['watch_counts']
+        fig = px.bar(x=['Watched', 'Unwatched'],
+                     y=[watch_counts['Watched'], watch_counts['Unwatched']],
+                     title="✅ Watch Status Overview",
+                     color=['Watched', 'Unwatched'],
+                     color_discrete_map={'Watched': '#6BCF7F', 'Unwatched': '#FF6B6B'})
+        fig.update_layout(**chart_config)
+        fig.update_traces(marker_line_color='white', marker_line_width=1.5)
+        charts.append(fig)
+    except Exception:
+        charts.append(None)
+
+    # 3. Year Distribution
+    try:
+        year_counts = snapshot['year_counts']
+        if year_counts:
+            fig = px.area(x=[int(year) for year in year_counts], y=list(year_counts.values()),
+                          title="📅 Movie Collection Timeline",
+                          color_discrete_sequence=['#FFD93D'])
+            fig.update_layout(**chart_config, xaxis_title="Release Year", yaxis_title="Number of Movies")
+            fig.update_traces(fillgradient=dict(
+                type="vertical",
+                colorscale=[[0, 'rgba(255,217,61,0.3)'], [1, 'rgba(255,217,61,0.8)']]
+            ))
+            charts.append(fig)
+        else:
+            charts.append(None)
+    except Exception:
+        charts.append(None)
+
+    # 4. Rating Distribution
+    try:
+        rating_counts = snapshot['rating_counts']
+        if len(rating_counts) > 1:
+            fig = px.line_polar(r=list(rating_counts.values()), theta=[int(r) for r in rating_counts],
+                                title="⭐ User Ratings Distribution", line_close=True,
+                                color_discrete_sequence=['#FF6B6B'])
+            fig.update_traces(fill='toself')
+            fig.update_layout(
+                paper_bgcolor='rgba(0,0,0,0)',
+                font_color='white',
+                polar=dict(
+                    bgcolor='rgba(0,0,0,0)',
+                    radialaxis=dict(visible=True, color='white'),
+                    angularaxis=dict(color='white')
+                ),
+                title_font_size=20,
+                title_x=0.5
+            )
+            charts.append(fig)
+        else:
+            charts.append(None)
+    except Exception:
+        charts.append(None)
+
+    # 5. Monthly Activity
+    try:
+        monthly = snapshot['monthly_added']
+        if monthly:
+            fig = px.bar(x=list(monthly), y=list(monthly.values()),
+                         title="📈 Monthly Collection Growth",
+                         color_discrete_sequence=['#4D96FF'])
+            fig.update_layout(**chart_config, xaxis_title="Month", yaxis_title="Movies Added")
+            charts.append(fig)
+        else:
+            charts.append(None)
+    except Exception as e:
+        logging.error(f"Error creating monthly activity chart: {e}")
+        charts.append(None)
+
+    # 6. Genre vs Watch Status
+    try:
+        genre_watch = pd.DataFrame.from_dict(snapshot['genre_watch'], orient='index').sort_index()
+        fig = px.bar(genre_watch, x=genre_watch.index, y=['Watched', 'Unwatched'],
+                     title="🎯 Genre Completion Analysis",
+                     color_discrete_map={'Watched': '#6BCF7F', 'Unwatched': '#FF6B6B'})
+        fig.update_layout(**chart_config, xaxis_title="Genre", yaxis_title="Number of Movies", barmode='stack')
+        charts.append(fig)
+    except Exception:
+        charts.append(None)
+
+    return tuple(charts)
+
+
 # -----------------------------
-# Enhanced AI Finder Page with OMDB Integration - SIMPLIFIED
+# Persistent TF-IDF Recommendation Index
 # -----------------------------
-def show_enhanced_ai_finder_page():
-    """Enhanced AI Finder page with cinematic styling, OMDB search + Gemini chatbot."""
-    st.markdown("""
-    <div class="hero-container">
-        <h2 style="text-align: center; font-size: 2.5rem; margin-bottom: 1rem;">🔍 ENHANCED AI FINDER</h2>
-        <p style="text-align: center; font-size: 1.3rem; color: #FFD93D; margin: 0;">
-            Discover Movies & Anime Across All Platforms
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+RECOMMENDER_STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its me movie movies my of on or
+recommend show similar so some suggest that the this to was what watch with you
+""".split())
 
-    # Two columns: left = search (old behaviour), right = Gemini chatbot
-    col1, col2 = st.columns([2, 1])
 
-    # -----------------------------
-    # LEFT – your existing simple search + popular/theater tabs
-    # -----------------------------
-    with col1:
-        st.markdown("### 🤖 ENHANCED MOVIE & ANIME SEARCH")
+def _recommender_tokens(text):
+    return [t for t in re.findall(r"[0-9a-z]+(?:-[0-9a-z]+)?", str(text).lower())
+            if t not in RECOMMENDER_STOP_WORDS]
 
-        search_query = st.text_input(
-            "🎬 Search movies or anime.",
-            placeholder="Enter movie title, anime, or genre.",
-            key="enhanced_ai_search",
-        )
 
-        if search_query:
-            with st.spinner("🔍 Searching across all platforms."):
-                # OMDB search
-                omdb = RateLimitedOMDbAPI()
-                movie_results = omdb.search_movies(search_query, "movie", None)
-
-                # Anime search
-                anime_integration = AnimeIntegration()
-                anime_results = anime_integration.search_anime(search_query)
-
-                if movie_results or anime_results:
-                    st.markdown(
-                        f"### 🎯 Found {len(movie_results) + len(anime_results)} Results"
-                    )
-
-                    if movie_results:
-                        st.markdown("#### 🎬 Movies & Series")
-                        for i, movie in enumerate(movie_results):
-                            display_enhanced_search_result(movie, "movie", i)
-
-                    if anime_results:
-                        st.markdown("#### 🍥 Anime")
-                        for i, anime in enumerate(anime_results):
-                            display_enhanced_search_result(anime, "anime", i)
-                else:
-                    st.warning(
-                        "No results found. Try a different search term or check our recommendations below."
-                    )
-                    # If you have this helper it will still work;
-                    # if not, this will just be skipped.
-                    try:
-                        show_search_recommendations(search_query)
-                    except NameError:
-                        pass
-        else:
-            # Old behaviour: show tabs with Popular / In Theaters etc.
-            show_popular_content()
+def _recommender_text(doc):
+    """Text a movie is matched on - genre counted twice so it outweighs title words"""
+    return f"{doc.get('title', '')} {doc.get('genre', '')} {doc.get('genre', '')} {doc.get('year', '')} {doc.get('plot', '')}"
 
-    # -----------------------------
-    # RIGHT – Gemini movie chatbot
-    # -----------------------------
-    with col2:
-        st.markdown("### 💬 Movie Help Chatbot (Gemini)")
 
-        # Lazy init so we don't touch your global init_session_state
-        if "gemini_chat" not in st.session_state:
-            st.session_state.gemini_chat = GeminiMovieChat()
-        if "ai_history" not in st.session_state:
-            st.session_state.ai_history = []
+class RecommendationIndex:
+    """Fitted TF-IDF vocabulary plus L2-normalized document vectors.
 
-        chat = st.session_state.gemini_chat
+    Vectors are stored term-major (posting arrays per term), so a query is
+    one sparse dot product over just its own terms' postings, followed by
+    argpartition for the top k. The arrays are saved with np.save and
+    memory-mapped on load; documents added later go into a small delta
+    scored with the same IDF until the next refit.
+    """
 
-        # Show chat history
-        for msg in st.session_state.ai_history:
-            with st.chat_message(msg["role"]):
-                st.markdown(msg["content"])
+    REFIT_RATIO = 0.2  # refit once the delta exceeds 20% of the base
 
-        # User input (works like before)
-        user_msg = st.chat_input(
-            "Tell me your mood, a plot, or actor names…\nExample: 'Sad mood, recommend 3 sci-fi movies' or 'Movie like Interstellar but with more romance'."
-        )
+    def __init__(self):
+        self.docs = []
+        self.vocab = {}
+        self.idf = []
+        self.term_ptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.base_size = 0
+        self.delta_postings = {}  # term id -> list of (doc id, weight)
+        self.title_ids = {}       # normalized title -> doc ids
+        self.lock = threading.Lock()
+
+    def _index_title(self, doc_id, doc):
+        self.title_ids.setdefault(_normalize_title(doc.get('title', '')), []).append(doc_id)
+
+    # Building
+    def fit(self, docs):
+        docs = list(docs)
+        n_docs = len(docs)
+        tokenized = [_recommender_tokens(_recommender_text(d)) for d in docs]
+        df = {}
+        for tokens in tokenized:
+            for token in set(tokens):
+                df[token] = df.get(token, 0) + 1
+
+        vocab = {term: i for i, term in enumerate(sorted(df))}
+        # Same smoothed IDF as sklearn's TfidfVectorizer default
+        idf = [math.log((1 + n_docs) / (1 + df[term])) + 1 for term in sorted(df)]
+
+        postings = [[] for _ in vocab]
+        for doc_id, tokens in enumerate(tokenized):
+            for term_id, weight in self._vectorize(tokens, vocab, idf):
+                postings[term_id].append((doc_id, weight))
+
+        lengths = [len(p) for p in postings]
+        self.term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.term_ptr[1:])
+        flat = [pair for p in postings for pair in p]
+        self.doc_ids = np.array([d for d, _ in flat], dtype=np.int32)
+        self.weights = np.array([w for _, w in flat], dtype=np.float32)
+        self.docs, self.vocab, self.idf = docs, vocab, idf
+        self.base_size = n_docs
+        self.delta_postings = {}
+        self.title_ids = {}
+        for doc_id, doc in enumerate(docs):
+            self._index_title(doc_id, doc)
+        return self
+
+    @staticmethod
+    def _vectorize(tokens, vocab, idf):
+        """L2-normalized (term id, weight) pairs for known tokens"""
+        counts = {}
+        for token in tokens:
+            term_id = vocab.get(token)
+            if term_id is not None:
+                counts[term_id] = counts.get(term_id, 0) + 1
+        vector = [(term_id, tf * idf[term_id]) for term_id, tf in counts.items()]
+        norm = math.sqrt(sum(w * w for _, w in vector)) or 1.0
+        return [(term_id, w / norm) for term_id, w in vector]
+
+    def add_documents(self, docs):
+        """Index new movies incrementally; refits when the delta gets large"""
+        with self.lock:
+            for doc in docs:
+                doc_id = len(self.docs)
+                self.docs.append(doc)
+                self._index_title(doc_id, doc)
+                tokens = _recommender_tokens(_recommender_text(doc))
+                for token in tokens:
+                    if token not in self.vocab:
+                        # Unseen term: rarest possible IDF until the next refit
+                        self.vocab[token] = len(self.idf)
+                        self.idf.append(math.log((1 + len(self.docs)) / 2) + 1)
+                for term_id, weight in self._vectorize(tokens, self.vocab, self.idf):
+                    self.delta_postings.setdefault(term_id, []).append((doc_id, weight))
+            if len(self.docs) - self.base_size > max(1, self.base_size) * self.REFIT_RATIO:
+                self.fit(self.docs)
+
+    # Persistence
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "term_ptr.npy"), self.term_ptr)
+        np.save(os.path.join(path, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(path, "weights.npy"), self.weights)
+        base_terms = sorted((t for t, i in self.vocab.items() if i < len(self.term_ptr) - 1),
+                            key=self.vocab.get)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({'docs': self.docs[:self.base_size], 'vocab': base_terms,
+                       'idf': self.idf[:len(base_terms)]}, f)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index.docs = meta['docs']
+        index.vocab = {term: i for i, term in enumerate(meta['vocab'])}
+        index.idf = meta['idf']
+        index.base_size = len(index.docs)
+        for doc_id, doc in enumerate(index.docs):
+            index._index_title(doc_id, doc)
+        index.term_ptr = np.load(os.path.join(path, "term_ptr.npy"), mmap_mode='r')
+        index.doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode='r')
+        index.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode='r')
+        return index
+
+    # Queries
+    def scores(self, text):
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        vector = self._vectorize(_recommender_tokens(text), self.vocab, self.idf)
+        base_terms = len(self.term_ptr) - 1
+        for term_id, q_weight in vector:
+            if term_id < base_terms:
+                start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+                scores[self.doc_ids[start:end]] += q_weight * self.weights[start:end]
+            for doc_id, weight in self.delta_postings.get(term_id, ()):
+                scores[doc_id] += q_weight * weight
+        return scores
+
+    def _top_k(self, scores, top_k, exclude):
+        for title in exclude or ():
+            for doc_id in self.title_ids.get(title, ()):
+                scores[doc_id] = 0
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [dict(self.docs[i], similarity_score=float(scores[i])) for i in ranked if scores[i] > 0]
+
+    @telemetry.traced("recommender.query")
+    def query(self, text, top_k=5, exclude=None):
+        """Top-k documents for a free-text query; exclude is a set of normalized titles"""
+        return self._top_k(self.scores(text), top_k, exclude)
+
+    def query_batch(self, texts, top_k=5, exclude=None):
+        return [self.query(text, top_k, exclude) for text in texts]
+
+    def similar_to(self, title, top_k=5):
+        """Movies similar to an indexed title (falls back to a text query)"""
+        wanted = _normalize_title(title)
+        doc_ids = self.title_ids.get(wanted)
+        if doc_ids:
+            return self.query(_recommender_text(self.docs[doc_ids[0]]), top_k, exclude={wanted})
+        return self.query(title, top_k)
+
+
+def _recommendation_catalog():
+    """MOVIE_DATABASE with duplicate titles merged"""
+    catalog, seen = [], {}
+    for movie in MOVIE_DATABASE:
+        key = (_normalize_title(movie['title']), movie['year'])
+        if key in seen:
+            seen[key].update({k: v for k, v in movie.items() if k not in seen[key]})
+            continue
+        seen[key] = dict(movie)
+        catalog.append(seen[key])
+    return catalog
+
+
+def _save_recommendation_index(index, path):
+    try:
+        index.save(path)
+    except OSError as e:
+        logging.warning(f"Could not save recommendation index: {e}")
 
-        if user_msg:
-            # Store + show user message
-            st.session_state.ai_history.append({"role": "user", "content": user_msg})
-            with st.chat_message("user"):
-                st.markdown(user_msg)
 
-            # Gemini-only backend (ONE API KEY)
-            answer_text, movie_titles = chat.generate_ai_response(user_msg)
+def _load_recommendation_index(path):
+    """Load the saved index (memory-mapped) or fit and save it"""
+    catalog = _recommendation_catalog()
+    try:
+        index = RecommendationIndex.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logging.info(f"Building recommendation index ({e})")
+        index = RecommendationIndex().fit(catalog)
+        _save_recommendation_index(index, path)
+        return index
+    missing = [m for m in catalog if _normalize_title(m['title']) not in index.title_ids]
+    if missing:
+        # save() only writes the fitted base, so fold the new titles in
+        # before saving; the next start loads them instead of re-adding them
+        index = RecommendationIndex().fit(index.docs + missing)
+        _save_recommendation_index(index, path)
+    return index
 
-            # Store + show assistant answer
-            st.session_state.ai_history.append(
-                {"role": "assistant", "content": answer_text}
+
+def get_recommendation_index():
+    """The process-wide recommendation index for the configured path"""
+    path = CONFIG.get('recommendation_index_path', 'recommendation_index')
+    return process_singleton(f'recommendation_index:{path}', lambda: _load_recommendation_index(path))
+
+
+# -----------------------------
+# Streaming Availability Snapshot (deterministic, bulk, stored in SQLite)
+# -----------------------------
+# Same catalogue hints and odds as the StreamingServiceFinder mocks, but the
+# "random" part is a stable hash of (service, title, year), so answers no
+# longer change between reruns and can be stored.
+AVAILABILITY_RULES = {
+    'netflix': (["stranger things", "the crown", "wednesday", "squid game", "the irishman", "bird box",
+                 "the gray man", "red notice", "don't look up", "the adam project", "enola holmes"], 0.4),
+    'amazon': (["the boys", "the marvelous mrs. maisel", "jack ryan", "the terminal list", "reacher",
+                "the tomorrow war", "coming 2 america", "the boys in the boat"], 0.5),
+    'disney': (["star wars", "marvel", "pixar", "national geographic", "the simpsons", "black panther",
+                "avatar", "guardians of the galaxy", "the little mermaid", "wish", "elemental"], 0.3),
+    'hbo': (["game of thrones", "succession", "the last of us", "euphoria", "house of the dragon",
+             "dune", "the batman", "elvis", "shazam", "blue beetle", "the nun"], 0.35),
+    'hulu': ([], 0.4),
+    'apple': (["ted lasso", "see", "the morning show", "foundation", "for all mankind", "napoleon", "argylle"], 0.25),
+    'youtube': ([], 0.6),
+    'crunchyroll': (["demon slayer", "jujutsu kaisen", "attack on titan", "my hero academia", "one piece",
+                     "naruto", "dragon ball", "death note", "hunter x hunter", "fullmetal alchemist",
+                     "spy x family", "chainsaw man", "bleach", "one punch man", "tokyo revengers",
+                     "jojo's bizarre adventure"], 0.7),
+}
+AVAILABILITY_REFRESH_SECONDS = 6 * 3600
+
+
+def _stable_fraction(*parts):
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) / 0x100000000
+
+
+class StreamingAvailabilitySnapshot(EnhancedStreamingServiceFinder):
+    """Per-(title, year) service bitmask built in bulk for the whole collection.
+
+    Bit i of the mask is service i of streaming_services. get_watch_options
+    keeps the parent's return shape, but answers from the snapshot table
+    instead of calling every availability check on every request.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.service_ids = list(self.streaming_services)
+        self.db_path = CONFIG['database_url']
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS availability_snapshot (
+                    title_key TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    service_mask INTEGER NOT NULL,
+                    anime_url TEXT,
+                    refreshed_at REAL NOT NULL,
+                    PRIMARY KEY (title_key, year)
+                )
+            ''')
+
+    @staticmethod
+    def title_key(title):
+        # The only place titles are normalized: SQL's lower() is ASCII-only,
+        # so lookups compute keys here and never in a query
+        return str(title).strip().lower()
+
+    def compute_entry(self, title, year, genre):
+        """(service_mask, anime_url) for one title - pure and deterministic"""
+        title_lower = self.title_key(title)
+        mask = 0
+        for bit, service_id in enumerate(self.service_ids):
+            keywords, probability = AVAILABILITY_RULES.get(service_id, ([], 0.0))
+            if (any(keyword in title_lower for keyword in keywords)
+                    or _stable_fraction(service_id, title_lower, year) < probability):
+                mask |= 1 << bit
+        anime_url = None
+        if self._is_anime_content(title, genre):
+            # search_anime only ever returns the local catalogue, so skip the HTTP call
+            anime_results = self.anime_integration._get_fallback_anime_results(title)
+            anime_url = anime_results[0]['url'] if anime_results else None
+        return mask, anime_url
+
+    @telemetry.traced("availability.build")
+    def build(self, movies=None):
+        """Recompute the snapshot for every (title, year, genre) in one
+        transaction; returns {(title_key, year): (service_mask, anime_url)}"""
+        with sqlite3.connect(self.db_path) as conn:
+            if movies is None:
+                movies = conn.execute('SELECT DISTINCT title, year, genre FROM enhanced_movies').fetchall()
+            now = time.time()
+            entries = {}
+            for title, year, genre in movies:
+                entries[(self.title_key(title), year or 0)] = self.compute_entry(title, year or 0, genre)
+            conn.executemany(
+                '''INSERT OR REPLACE INTO availability_snapshot
+                   (title_key, year, service_mask, anime_url, refreshed_at) VALUES (?, ?, ?, ?, ?)''',
+                [(key, year, mask, anime_url, now) for (key, year), (mask, anime_url) in entries.items()]
             )
-            with st.chat_message("assistant"):
-                st.markdown(answer_text)
-
-                # Show only the movie names (up to 3)
-                if movie_titles:
-                    st.markdown("**🎬 Suggested movies (max 3):**")
-                    for title in movie_titles:
-                        st.markdown(f"- {title}")
-                else:
-                    st.markdown(
-                        "_No specific movie titles could be found for this query._"
-                    )
+            conn.commit()
+        return entries
 
-        st.markdown("---")
-        st.markdown("##### ℹ️ What can I ask?")
-        st.caption(
-            """
-- *"I feel lonely, suggest 3 movies."*
-- *"Give me 3 comedy movies with Jim Carrey."*
-- *"Anime where the main character travels through time."*
-- *"Movie similar to Inception but easier to understand."*
-"""
-        )
+    def is_stale(self, max_age=AVAILABILITY_REFRESH_SECONDS):
+        with sqlite3.connect(self.db_path) as conn:
+            oldest = conn.execute('SELECT MIN(refreshed_at) FROM availability_snapshot').fetchone()[0]
+        return oldest is None or oldest < time.time() - max_age
+
+    def expand(self, title, year, mask, anime_url):
+        """Turn a snapshot row back into the get_watch_options() dict"""
+        streaming = {}
+        for bit, service_id in enumerate(self.service_ids):
+            service = self.streaming_services[service_id]
+            streaming[service_id] = {
+                'name': service['name'],
+                'available': bool(mask & (1 << bit)),
+                'url': f"{service['base_url']}{quote(title)}",
+                'color': service['color'],
+                'icon': service['icon']
+            }
+        in_theaters = self.is_movie_in_theaters(year)
+        watch_options = {
+            'streaming': streaming,
+            'ticketing': self.get_ticketing_links(title, year) if in_theaters else {},
+            'in_theaters': in_theaters
+        }
+        if anime_url:
+            watch_options['anime'] = {
+                'crunchyroll': {
+                    'name': 'Crunchyroll',
+                    'available': True,
+                    'url': anime_url,
+                    'color': '#F47521',
+                    'icon': '🍥',
+                    'type': 'anime'
+                }
+            }
+        return watch_options
+
+    def get_watch_options(self, title, year, genre):
+        """Snapshot lookup; computes and stores the entry on a miss"""
+        year = year or 0
+        key = self.title_key(title)
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT service_mask, anime_url FROM availability_snapshot WHERE title_key = ? AND year = ?',
+                (key, year)
+            ).fetchone()
+        if row is None:
+            row = self.build([(title, year, genre)])[(key, year)]
+        return self.expand(title, year, *row)
+
+    def get_watch_options_bulk(self, movie_ids):
+        """{movie id: watch options} for collection movies with one query"""
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return {}
+        with sqlite3.connect(self.db_path) as conn:
+            movies = conn.execute(
+                f"SELECT id, title, year, genre FROM enhanced_movies WHERE id IN ({','.join('?' * len(movie_ids))})",
+                movie_ids
+            ).fetchall()
+            keys = sorted({self.title_key(title) for _, title, _, _ in movies})
+            entries = {
+                (key, year): (mask, anime_url)
+                for key, year, mask, anime_url in conn.execute(
+                    f"SELECT title_key, year, service_mask, anime_url FROM availability_snapshot "
+                    f"WHERE title_key IN ({','.join('?' * len(keys))})",
+                    keys
+                )
+            } if keys else {}
+
+        missing = [(title, year or 0, genre) for _, title, year, genre in movies
+                   if (self.title_key(title), year or 0) not in entries]
+        if missing:
+            entries.update(self.build(missing))
+        return {
+            movie_id: self.expand(title, year or 0, *entries[(self.title_key(title), year or 0)])
+            for movie_id, title, year, genre in movies
+        }
+
+
+# _availability_state: database path -> StreamingAvailabilitySnapshot
+_availability_state, _availability_lock, _availability_refreshing = process_singleton(
+    'availability', lambda: ({}, threading.Lock(), threading.Event()))
+
+
+def get_availability_snapshot():
+    """Process-wide snapshot of the app database; kicks off a background
+    rebuild when it is stale"""
+    db_path = CONFIG['database_url']
+    with _availability_lock:
+        if db_path not in _availability_state:
+            _availability_state[db_path] = StreamingAvailabilitySnapshot()
+        snapshot = _availability_state[db_path]
+    if not _availability_refreshing.is_set() and snapshot.is_stale():
+        _availability_refreshing.set()
+
+        def refresh():
+            try:
+                logging.info(f"Availability snapshot refreshed: {len(snapshot.build())} titles")
+            except sqlite3.Error as e:
+                logging.error(f"Availability snapshot refresh failed: {e}")
+            finally:
+                _availability_refreshing.clear()
+
+        threading.Thread(target=refresh, daemon=True, name="availability-refresh").start()
+    return snapshot
+
+
+@telemetry.traced("availability.bulk")
+def get_watch_options_bulk(movie_ids):
+    """Watch options for a page of collection movies in one lookup"""
+    return get_availability_snapshot().get_watch_options_bulk(movie_ids)
 
 
 # -----------------------------
 # Enhanced AI Chat System
 # -----------------------------
 class AdvancedAIChat:
-    def __init__(self):
+    def __init__(self, interactive=True):
+        self.interactive = interactive  # False: no Streamlit widgets (batch mode)
         self.conversation_history = []
-        self.omdb = RateLimitedOMDbAPI()
+        self.omdb = get_omdb_client()
         self.user_preferences = {
             "favorite_genres": [],
             "watch_habits": {},
             "recent_interests": []
         }
-        self.streaming_finder = EnhancedStreamingServiceFinder()
+        self.streaming_finder = get_streaming_finder()
         
+    def _progress(self, message):
+        return st.spinner(message) if self.interactive else nullcontext()
+
     def generate_ai_response(self, user_input, movie_data):
         """Generate intelligent AI response with streaming integration"""
-        user_input_lower = user_input.lower()
+        intent, genres = get_chat_intent_classifier().classify(user_input)
         
-        # Update user preferences based on conversation
-        self._update_user_preferences(user_input, movie_data)
+        # One latency histogram per intent handler
+        with telemetry.span(f"chat.intent.{intent}"):
+            # Update user preferences based on conversation
+            self._update_user_preferences(user_input, movie_data, genres)
         
-        # Enhanced response system with streaming integration
-        if any(word in user_input_lower for word in ['watch', 'stream', 'where to watch', 'netflix', 'amazon', 'hulu', 'disney', 'youtube']):
-            return self._get_streaming_response(user_input, movie_data)
+            # Enhanced response system with streaming integration
+            if intent == 'streaming':
+                return self._get_streaming_response(user_input, movie_data)
         
-        elif any(word in user_input_lower for word in ['ticket', 'theater', 'cinema', 'buy ticket']):
-            return self._get_ticketing_response(user_input, movie_data)
+            elif intent == 'ticketing':
+                return self._get_ticketing_response(user_input, movie_data)
         
-        elif any(word in user_input_lower for word in ['anime', 'crunchyroll']):
-            return self._get_anime_response(user_input, movie_data)
+            elif intent == 'anime':
+                return self._get_anime_response(user_input, movie_data)
         
-        elif any(word in user_input_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-            return self._get_greeting_response(movie_data)
+            elif intent == 'greeting':
+                return self._get_greeting_response(movie_data)
         
-        elif any(word in user_input_lower for word in ['recommend', 'suggest', 'what should i watch', 'what to watch']):
-            return self._get_recommendation_response(user_input, movie_data)
+            elif intent == 'recommendation':
+                return self._get_recommendation_response(user_input, movie_data)
         
-        elif any(word in user_input_lower for word in ['action', 'comedy', 'drama', 'sci-fi', 'romance', 'horror', 'thriller']):
-            return self._get_genre_response(user_input_lower, movie_data)
+            elif intent == 'genre':
+                return self._get_genre_response(user_input.lower(), movie_data)
         
-        elif any(word in user_input_lower for word in ['details', 'info', 'about movie', 'tell me about']):
-            return self._get_movie_details_response(user_input)
+            elif intent == 'details':
+                return self._get_movie_details_response(user_input)
         
-        elif any(word in user_input_lower for word in ['search', 'find movie', 'look for']):
-            return self._get_movie_search_response(user_input)
+            elif intent == 'search':
+                return self._get_movie_search_response(user_input)
         
-        elif any(word in user_input_lower for word in ['analyze', 'stats', 'statistics', 'my collection', 'how many']):
-            return self._get_analysis_response(movie_data)
+            elif intent == 'analysis':
+                return self._get_analysis_response(movie_data)
         
-        elif any(word in user_input_lower for word in ['watched', 'unwatched', 'watchlist']):
-            return self._get_watch_status_response(movie_data)
+            elif intent == 'watch_status':
+                return self._get_watch_status_response(movie_data)
         
-        elif any(word in user_input_lower for word in ['help', 'what can you do', 'features']):
-            return self._get_help_response()
+            elif intent == 'help':
+                return self._get_help_response()
         
-        elif any(word in user_input_lower for word in ['best', 'top', 'greatest']):
-            return self._get_best_movies_response(user_input_lower)
+            elif intent == 'best':
+                return self._get_best_movies_response(user_input.lower())
         
-        else:
-            return self._get_intelligent_fallback(user_input, movie_data)
+            else:
+                return self._get_intelligent_fallback(user_input, movie_data)
     
     def _get_streaming_response(self, user_input, movie_data):
         """Handle streaming-related queries"""
@@ -197,20 +4118,18 @@ class AdvancedAIChat:
         if movie_keywords:
             movie_title = " ".join(movie_keywords[:4])
             
-            # Check if movie is in collection
+            # Check if movie is in collection (ranked title index lookup)
             collection_movie = None
             if movie_data:
-                for movie in movie_data:
-                    if movie_title.lower() in movie[1].lower():
-                        collection_movie = movie
-                        break
+                collection_movie = get_collection_title_index(movie_data).best_match(movie_title)
             
             if collection_movie:
                 title = collection_movie[1]
                 year = collection_movie[3]
                 genre = collection_movie[2]
                 
-                watch_options = self.streaming_finder.get_watch_options(title, year, genre)
+                watch_options = get_watch_options_bulk([collection_movie[0]]).get(collection_movie[0]) \
+                    or get_availability_snapshot().get_watch_options(title, year, genre)
                 available_streaming = [s for s in watch_options['streaming'].values() if s['available']]
                 
                 response = f"🎬 **{title}** ({year})\n\n"
@@ -244,7 +4163,7 @@ class AdvancedAIChat:
     def _get_ticketing_response(self, user_input, movie_data):
         """Handle ticketing-related queries"""
         current_year = datetime.now().year
-        in_theaters_movies = [movie for movie in movie_data if len(movie) > 3 and movie[3] >= current_year - 1]
+        in_theaters_movies = get_collection_title_index(movie_data).released_since(current_year - 1, limit=5)
         
         if not in_theaters_movies:
             return "🎟️ No recent movies found in your collection that might be in theaters. Recent releases from 2023-2024 are most likely to be in theaters!"
@@ -263,7 +4182,7 @@ class AdvancedAIChat:
 
     def _get_anime_response(self, user_input, movie_data):
         """Handle anime-related queries"""
-        anime_integration = AnimeIntegration()
+        anime_integration = SharedAnimeIntegration()
         
         words = user_input.split()
         anime_keywords = [word for word in words if word.lower() not in ['anime', 'watch', 'find', 'search']]
@@ -286,8 +4205,9 @@ class AdvancedAIChat:
 
     def _get_greeting_response(self, movie_data):
         """Personalized greeting based on user's collection"""
-        total_movies = len(movie_data) if movie_data else 0
-        watched_count = sum(1 for movie in movie_data if len(movie) > 4 and movie[4] == 1) if movie_data else 0
+        stats = get_stats_incremental()
+        total_movies = stats['total_movies']
+        watched_count = stats['watched_count']
         
         greetings = [
             f"🎬 Welcome back, cinephile! I see you have {total_movies} movies in your collection ({watched_count} watched). I can help you search for movies, get details, and recommend films!",
@@ -303,8 +4223,16 @@ class AdvancedAIChat:
         if not movie_data:
             return "🎬 I'd love to recommend some movies! First, let's build your collection. You can also ask me to search for any movie, or try adding a few movies you enjoy!"
         
-        # Get popular movies from enhanced database
-        popular_movies = [m for m in MOVIE_DATABASE if m.get('streaming_service') or m.get('in_theaters')][:6]
+        # Rank the catalog against the user's request, favourite genres and
+        # their best-rated / watched movies; skip what they already own
+        liked = [m for m in movie_data if (len(m) > 5 and m[5] >= 4) or (len(m) > 4 and m[4] == 1)][:20]
+        profile = " ".join(
+            [user_input] + self.user_preferences["favorite_genres"] + [f"{m[1]} {m[2]}" for m in liked]
+        )
+        owned = {_normalize_title(m[1]) for m in movie_data}
+        popular_movies = get_recommendation_index().query(profile, top_k=6, exclude=owned)
+        if not popular_movies:
+            popular_movies = [m for m in MOVIE_DATABASE if m.get('streaming_service') or m.get('in_theaters')][:6]
         
         response = "🎯 **Popular Movies You Might Like**\n\n"
         
@@ -320,6 +4248,20 @@ class AdvancedAIChat:
         response += "\n🔍 *Use the AI Finder to search for these movies and add them to your collection!*"
         return response
 
+    def _get_genre_response(self, user_input, movie_data):
+        """Genre recommendations from the recommendation index"""
+        owned = {_normalize_title(m[1]) for m in movie_data} if movie_data else set()
+        matches = get_recommendation_index().query(user_input, top_k=5, exclude=owned)
+        if not matches:
+            return self._get_recommendation_response(user_input, movie_data)
+        
+        response = "🎭 **Movies Matching That Genre**\n\n"
+        for i, movie in enumerate(matches, 1):
+            response += f"{i}. **{movie['title']}** ({movie['year']}) - {movie['genre']}\n"
+        
+        response += "\n🔍 *Use the AI Finder to search for these movies and add them to your collection!*"
+        return response
+
     def _get_movie_details_response(self, user_input):
         """Get movie details from OMDB API based on user query"""
         words = user_input.split()
@@ -328,7 +4270,7 @@ class AdvancedAIChat:
         if movie_keywords:
             movie_title = " ".join(movie_keywords[:4])
             
-            with st.spinner(f"🔍 Searching for '{movie_title}'..."):
+            with self._progress(f"🔍 Searching for '{movie_title}'..."):
                 movie_data = self.omdb.get_movie_details(movie_title)
             
             if movie_data:
@@ -370,7 +4312,7 @@ class AdvancedAIChat:
         if not movie_data:
             return "📊 I'd love to analyze your movie taste! Start by adding some films to your collection, or use the AI Finder to discover and add new movies!"
         
-        stats = get_stats()
+        stats = get_stats_incremental()
         
         analysis = f"🎯 **Your Cinema Profile**\n\n"
         analysis += f"• **Collection Size**: {stats['total_movies']} films\n"
@@ -387,13 +4329,15 @@ class AdvancedAIChat:
         if not movie_data:
             return "📝 Your collection is empty. Add some movies using the AI Finder feature to start tracking your watch progress!"
         
-        watched_movies = [movie for movie in movie_data if len(movie) > 4 and movie[4] == 1]
-        unwatched_movies = [movie for movie in movie_data if len(movie) > 4 and movie[4] == 0]
+        index = get_collection_title_index(movie_data)
+        watched_count = index.watched_count()
+        unwatched_count = index.total() - watched_count
+        unwatched_movies = index.unwatched(limit=3)
         
         response = f"📊 **Watch Status Overview**\n\n"
-        response += f"• **Watched**: {len(watched_movies)} movies\n"
-        response += f"• **Unwatched**: {len(unwatched_movies)} movies\n"
-        response += f"• **Completion Rate**: {len(watched_movies)/len(movie_data)*100:.1f}%\n\n"
+        response += f"• **Watched**: {watched_count} movies\n"
+        response += f"• **Unwatched**: {unwatched_count} movies\n"
+        response += f"• **Completion Rate**: {watched_count/index.total()*100:.1f}%\n\n"
         
         if unwatched_movies:
             response += "🎬 **Top Unwatched Movies**:\n"
@@ -489,19 +4433,936 @@ What would you like to explore today?
         
         return random.choice(fallbacks)
 
-    def _update_user_preferences(self, user_input, movie_data):
+    def _update_user_preferences(self, user_input, movie_data, genres=None):
         """Learn from user interactions"""
-        # Basic preference tracking
-        genre_keywords = {
-            'action': ['action', 'fight', 'adventure', 'thriller', 'exciting'],
-            'comedy': ['comedy', 'funny', 'laugh', 'humor', 'hilarious'],
-            'drama': ['drama', 'emotional', 'serious', 'story', 'deep'],
-            'sci-fi': ['sci-fi', 'science fiction', 'future', 'space', 'alien'],
-            'romance': ['romance', 'love', 'relationship', 'romantic', 'couple'],
-            'anime': ['anime', 'manga', 'japanese animation']
-        }
+        # Basic preference tracking - genre signals come from the intent classifier
+        if genres is None:
+            _, genres = get_chat_intent_classifier().classify(user_input)
         
-        for genre, keywords in genre_keywords.items():
-            if any(keyword in user_input.lower() for keyword in keywords):
-                if genre not in self.user_preferences["favorite_genres"]:
-                    self.user_preferences["favorite_genres"].append(genre)
+        for genre in genres:
+            if genre not in self.user_preferences["favorite_genres"]:
+                self.user_preferences["favorite_genres"].append(genre)
+
+
+# -----------------------------
+# Fast Cold Start (lazy imports, one-time init, background key check)
+# -----------------------------
+# main() at the end of this section replaces app.py's (this file sits above
+# its __main__ guard). px, pd and np are rebound to LazyModule handles; for
+# the imports to actually be deferred, app.py's header must also drop its
+# eager plotly / pandas / numpy imports, and the PIL, graph_objects,
+# subplots and matplotlib ones that nothing uses.
+class LazyModule:
+    """Module stand-in that imports on first attribute access.
+
+    `px = LazyModule('plotly.express')` costs nothing until a page actually
+    draws a chart; the deferred import is recorded as startup.import.<name>.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    telemetry.observe(f"startup.import.{self._name}", time.perf_counter() - started)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+# One set of handles per process, so each import is timed once, not per rerun
+px, pd, np = process_singleton('lazy_modules', lambda: (
+    LazyModule('plotly.express'), LazyModule('pandas'), LazyModule('numpy')))
+
+APP_SCHEMA_VERSION = '5'  # bump when a step in ensure_schema_once() changes
+API_KEY_CHECK_TTL = 3600  # seconds before a key verdict is re-checked
+
+
+def _process_start_time():
+    """Wall-clock time this process started (Linux /proc), else None"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration, AttributeError):
+        return None
+
+
+def _record_process_start():
+    # Everything before the first script run got here (app.py's imports and
+    # module-level code) counts as import time
+    started = _process_start_time() or time.time()
+    telemetry.observe("startup.import", time.time() - started)
+    return {'process_started': started, 'first_paint_done': False}, threading.Lock()
+
+
+_startup_state, _startup_lock = process_singleton('startup', _record_process_start)
+
+
+# _api_key_status: key hash -> (checked at, True/False, or None while pending)
+_schema_ready, _schema_lock, _api_key_status, _api_key_lock = process_singleton(
+    'schema', lambda: (set(), threading.Lock(), {}, threading.Lock()))
+
+
+def _read_app_metadata(conn):
+    """app_metadata as a dict ({} before init_db() has created it)"""
+    try:
+        return dict(conn.execute('SELECT key, value FROM app_metadata').fetchall())
+    except sqlite3.Error:
+        return {}
+
+
+def ensure_schema_once():
+    """Schema migration and seeding, once per process per database.
+
+    A database already stamped with APP_SCHEMA_VERSION costs one metadata
+    read: the per-feature readiness flags are set directly instead of
+    re-running init_db()'s inspection and the CREATE ... IF NOT EXISTS
+    statements. Otherwise every step runs (all are idempotent, so racing
+    processes are harmless) and the marker is written last.
+    """
+    db_path = CONFIG['database_url']
+    if db_path in _schema_ready:
+        return
+    with _schema_lock:
+        if db_path in _schema_ready:
+            return
+        with telemetry.span("startup.schema"):
+            conn = get_db_connection(db_path)
+            metadata = _read_app_metadata(conn)
+            if metadata.get('schema_version') == APP_SCHEMA_VERSION:
+                fts_exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'enhanced_movies_fts'"
+                ).fetchone()
+                with _data_layer_lock:
+                    _data_layer_ready[db_path] = fts_exists is not None
+                _stats_ready.add(db_path)
+                _analytics_ready.add(db_path)
+                _title_index_ready.add(db_path)
+                if metadata.get('seeded') == 'false':
+                    check_and_seed_database()
+            else:
+                telemetry.count("startup.schema_migration")
+                init_db()
+                # Seed before the triggers exist: the backfills below are one
+                # aggregate pass instead of a trigger firing per sample row
+                check_and_seed_database()
+                init_collection_stats()
+                init_data_layer()
+                init_analytics_store()
+                init_collection_version()
+                init_import_indexes()
+                try:
+                    with db_transaction(db_path) as c:
+                        c.execute('''
+                            INSERT INTO app_metadata (key, value) VALUES ('schema_version', ?)
+                            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                        ''', (APP_SCHEMA_VERSION,))
+                except sqlite3.Error as e:
+                    # Not fatal: the next process simply migrates again
+                    logging.error(f"Could not record schema version: {e}")
+        _schema_ready.add(db_path)
+
+
+def _check_api_key(key_hash):
+    valid = False
+    try:
+        with telemetry.span("startup.api_key_check"):
+            valid = get_omdb_client().validate_api_key()
+    except Exception as e:
+        # Record a verdict anyway: a pending (None) entry is never rechecked
+        logging.error(f"OMDb key check failed: {e}")
+    finally:
+        with _api_key_lock:
+            _api_key_status[key_hash] = (time.time(), valid)
+
+
+def get_api_key_status():
+    """Cached OMDb key check: True/False, or None while the first check runs.
+
+    The check runs on a background thread once per process per key (and
+    again after API_KEY_CHECK_TTL), so no rerun waits on the network or the
+    OMDb rate limiter; a recheck keeps serving the previous verdict.
+    """
+    key_hash = hashlib.sha256((CONFIG.get('omdb_api_key') or '').encode()).hexdigest()[:16]
+    now = time.time()
+    with _api_key_lock:
+        entry = _api_key_status.get(key_hash)
+        if entry is not None and (entry[1] is None or now - entry[0] < API_KEY_CHECK_TTL):
+            return entry[1]
+        previous = entry[1] if entry else None
+        _api_key_status[key_hash] = (now, previous)
+    threading.Thread(target=_check_api_key, args=(key_hash,),
+                     name="omdb-key-check", daemon=True).start()
+    return previous
+
+
+def fast_startup():
+    """Cold-start friendly version of main()'s init block.
+
+    Returns the OMDb key status from get_api_key_status(); the verdict of
+    the first check shows up on the rerun after it completes.
+    """
+    with telemetry.span("startup.init"):
+        ensure_schema_once()
+        init_session_state()
+        try:
+            has_secrets = st.secrets.get("OMDB_API_KEY", None) is not None
+        except Exception:
+            has_secrets = False
+        if not has_secrets:
+            # Only shows the setup hints: without secrets it returns before
+            # its own (blocking) key validation
+            check_environment()
+        return get_api_key_status()
+
+
+def mark_first_paint():
+    """Record process start -> end of the first script run, once per process"""
+    with _startup_lock:
+        if _startup_state['first_paint_done']:
+            return
+        _startup_state['first_paint_done'] = True
+    telemetry.observe("startup.first_paint", time.time() - _startup_state['process_started'])
+
+
+def main():
+    """app.py's main() with fast_startup() as its init block"""
+    st.set_page_config(
+        page_title="CodeFlix",
+        page_icon="🎬",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # Initialize everything
+    inject_color_bends_background()  # Add ColorBends background first
+    inject_advanced_style()          # Then add enhanced CSS
+    # Schema, seeding and the key check run once per process; the key
+    # verdict is None until the background check has finished
+    if fast_startup() is False:
+        st.error("⚠️ Movie database API key is invalid or not working. Some features may be limited.")
+
+    movies_data = get_movies_safe()
+    stats = get_stats()
+
+    # -----------------------------
+    # Enhanced Sidebar with Streaming
+    # -----------------------------
+    with st.sidebar:
+        st.markdown("""
+        <div style='text-align: center; padding: 2rem 1rem;'>
+            <h1 style='color: #FF6B6B; font-size: 2.5rem; font-weight: 900; margin: 0; font-family: "Orbitron", sans-serif;'>CODEFLIX</h1>
+            <p style='color: #FFD93D; font-size: 1rem; margin: 0; font-family: "Rajdhani", sans-serif;'>Your Personal Movie Universe</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("---")
+
+        # Enhanced Navigation with Streaming and Anime
+        page = st.radio("NAVIGATION", [
+            "🏠 DASHBOARD",
+            "➕ ADD MOVIES",
+            "🎬 MY COLLECTION",
+            "🎯 WATCH NOW",
+            "🔍 AI FINDER",
+            "📊 ANALYTICS"
+        ], index=0)
+
+        st.markdown("### 📈 LIVE STATS")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Total Movies", stats['total_movies'])
+        with col2:
+            st.metric("Watched", stats['watched_count'])
+
+        st.markdown(f"**Completion:** {stats['completion_rate']:.1f}%")
+        if stats['average_rating'] > 0:
+            st.markdown(f"**Avg Rating:** {stats['average_rating']:.1f} ⭐")
+        if stats['in_theaters_count'] > 0:
+            st.markdown(f"**In Theaters:** {stats['in_theaters_count']} 🎟️")
+
+    # -----------------------------
+    # Page Routing
+    # -----------------------------
+    if page == "🏠 DASHBOARD":
+        show_dashboard(movies_data, stats)
+    elif page == "➕ ADD MOVIES":
+        show_add_movies_page()
+    elif page == "🎬 MY COLLECTION":
+        show_collection_page(movies_data)
+    elif page == "🎯 WATCH NOW":
+        show_streaming_page(movies_data)
+    elif page == "🔍 AI FINDER":
+        show_enhanced_ai_finder_page()
+    elif page == "📊 ANALYTICS":
+        show_analytics_page(movies_data)
+
+    mark_first_paint()
+
+
+# -----------------------------
+# Benchmark Suite (local upstream stubs + seeded databases)
+# -----------------------------
+# Usage (no network, no API keys needed):
+#   python -c "import app; app.run_benchmark_suite(sizes=(1000, 100000))"
+BENCHMARK_SIZES = (1000, 100000, 1000000)
+BENCHMARK_ENV_ROWS = 1000  # movies in the collection benchmark_environment() switches to
+BENCHMARK_QUERIES = ("the matrix", "inception", "spirited away", "dark knight",
+                     "romantic comedy", "naruto")
+CHAT_BENCHMARK_MESSAGES = [
+    "hi", "Hello there!", "hey, what's up", "Where can I watch Oppenheimer?", "Is Barbie on Netflix?",
+    "Get tickets for Dune 2", "any cinema showing The Marvels this week", "Find anime Demon Slayer",
+    "Search for Jujutsu Kaisen anime", "What should I watch tonight?", "Recommend action movies",
+    "suggest something funny for a date night", "I love sci-fi with space battles",
+    "Get details about The Dark Knight", "Tell me about Parasite", "Find information about Inception",
+    "Analyze my movie taste", "how many movies do I have", "What haven't I watched?", "My watchlist status",
+    "what can you do", "help", "best movies of all time", "top recent films", "something emotional and deep",
+    "this is a movie I saw with my dad about a history teacher", "horror movies that are not too scary",
+    "romantic comedy from the 90s", "thriller with a twist ending", "look for a movie about a heist",
+]
+BENCHMARK_GEMINI_ANSWER = (
+    "Here are a few picks that match that mood. Each one balances heart and "
+    "spectacle, and all of them hold up on a rewatch.\n"
+    "MOVIES: Interstellar | Arrival | The Martian"
+)
+
+
+@dataclass
+class StubUpstreamConfig:
+    """Behaviour of one stub upstream (latency in seconds, rates in 0..1)"""
+    latency: float = 0.05
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+
+
+class StubUpstreamServer:
+    """Local HTTP stand-in for OMDb, Gemini or Crunchyroll.
+
+    Answers are deterministic for a given request; latency, 5xx errors and
+    429s are drawn from a seeded RNG so two runs see the same sequence.
+    """
+
+    def __init__(self, upstream, config=None, seed=0):
+        self.upstream = upstream
+        self.config = config or StubUpstreamConfig()
+        self.rng = random.Random(f"{upstream}:{seed}")
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'throttled': 0}
+        self.server = None
+        self.url = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.handle(self)
+
+            def do_POST(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True,
+                         name=f"stub-{self.upstream}").start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _draw(self):
+        with self.lock:
+            self.counters['requests'] += 1
+            roll = self.rng.random()
+            delay = max(0.0, self.config.latency + self.rng.uniform(-1, 1) * self.config.jitter)
+            if roll < self.config.rate_429:
+                self.counters['throttled'] += 1
+                return delay, 429
+            if roll < self.config.rate_429 + self.config.error_rate:
+                self.counters['errors'] += 1
+                return delay, 500
+        return delay, 200
+
+    def handle(self, request):
+        from urllib.parse import urlsplit, parse_qs
+        delay, status = self._draw()
+        time.sleep(delay)
+        parts = urlsplit(request.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if status != 200:
+            self._send(request, status, 'application/json', json.dumps({"error": {"code": status}}))
+            return
+        if self.upstream == 'omdb':
+            self._send(request, 200, 'application/json', json.dumps(self._omdb_payload(params)))
+        elif self.upstream == 'crunchyroll':
+            self._send(request, 200, 'text/html', self._crunchyroll_page(params.get('q', '')))
+        elif parts.path.endswith(':streamGenerateContent'):
+            length = int(request.headers.get('Content-Length') or 0)
+            request.rfile.read(length)
+            self._stream_gemini(request)
+        else:
+            self._send(request, 200, 'application/json', json.dumps(
+                {"candidates": [{"content": {"parts": [{"text": BENCHMARK_GEMINI_ANSWER}]}}]}))
+
+    @staticmethod
+    def _send(request, status, content_type, body):
+        data = body.encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    @staticmethod
+    def _omdb_payload(params):
+        query = params.get('s') or params.get('t') or params.get('i') or ''
+        if not query or 'notfound' in query.lower():
+            return {"Response": "False", "Error": "Movie not found!"}
+        digest = int(hashlib.sha1(query.lower().encode('utf-8')).hexdigest()[:8], 16)
+        if params.get('s'):
+            return {
+                "Search": [
+                    {"Title": f"{query.title()} {n + 1}", "Year": str(1980 + (digest + n) % 45),
+                     "imdbID": f"tt{(digest + n) % 10000000:07d}", "Type": "movie", "Poster": "N/A"}
+                    for n in range(10)
+                ],
+                "totalResults": "10",
+                "Response": "True",
+            }
+        return {
+            "Title": query.title() if not params.get('i') else f"Title {query}",
+            "Year": str(1980 + digest % 45),
+            "Rated": "PG-13",
+            "Runtime": f"{90 + digest % 60} min",
+            "Genre": ["Action", "Drama", "Comedy", "Sci-Fi"][digest % 4],
+            "Director": "Stub Director",
+            "Actors": "Actor One, Actor Two",
+            "Plot": f"A benchmark plot about {query}.",
+            "imdbRating": f"{5 + digest % 50 / 10:.1f}",
+            "imdbID": params.get('i') or f"tt{digest % 10000000:07d}",
+            "Type": "movie",
+            "Poster": "N/A",
+            "Response": "True",
+        }
+
+    @staticmethod
+    def _crunchyroll_page(query):
+        items = "".join(
+            f'<li class="series"><a href="/series/STUB{n}">{html.escape(query.title())} {n + 1}</a></li>'
+            for n in range(5)
+        )
+        return f"<html><body><ul>{items}</ul></body></html>"
+
+    def _stream_gemini(self, request):
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/event-stream')
+        request.end_headers()
+        words = BENCHMARK_GEMINI_ANSWER.split(" ")
+        step = max(1, len(words) // 6)
+        for start in range(0, len(words), step):
+            chunk = " ".join(words[start:start + step]) + " "
+            event = {"candidates": [{"content": {"parts": [{"text": chunk}]}}]}
+            request.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            request.wfile.flush()
+            time.sleep(self.config.latency / 6)
+        request.close_connection = True
+
+
+def _benchmark_sample_movies():
+    """seed.py's sample catalogue (falls back to MOVIE_DATABASE without it)"""
+    try:
+        import seed
+        return seed.get_sample_movies()
+    except ImportError:
+        return [
+            {"title": m["title"], "genre": m["genre"], "year": m["year"], "watched": False, "rating": 0}
+            for m in MOVIE_DATABASE
+        ]
+
+
+def seed_benchmark_database(db_path, rows, seed=0, chunk_size=50000):
+    """Create db_path with init_db()'s schema and `rows` synthetic movies.
+
+    Rows cycle through seed.py's sample films (numbered after the first
+    pass) with seeded watched/rating/added_at values, inserted in chunks.
+    An existing file with exactly `rows` movies is reused as-is.
+    """
+    if os.path.exists(db_path):
+        try:
+            with sqlite3.connect(db_path) as conn:
+                if conn.execute('SELECT COUNT(*) FROM enhanced_movies').fetchone()[0] == rows:
+                    return db_path
+        except sqlite3.Error:
+            pass
+        os.remove(db_path)
+
+    previous = CONFIG['database_url']
+    CONFIG['database_url'] = db_path
+    try:
+        init_db()
+    finally:
+        CONFIG['database_url'] = previous
+
+    sample = _benchmark_sample_movies()
+    rng = random.Random(seed)
+    epoch = datetime(2024, 1, 1)
+
+    def generate():
+        for i in range(rows):
+            movie = sample[i % len(sample)]
+            cycle = i // len(sample)
+            rating = rng.randint(1, 5) if rng.random() < 0.3 else 0
+            title = movie["title"] if cycle == 0 else f"{movie['title']} {cycle + 1}"
+            yield (
+                title, movie["genre"], movie["year"], rng.random() < 0.4, rating,
+                f"Sample review for {title}" if rating else "",
+                (epoch + timedelta(seconds=rng.randint(0, 365 * 86400))).strftime('%Y-%m-%d %H:%M:%S'),
+            )
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        rows_iter = generate()
+        while True:
+            chunk = list(islice(rows_iter, chunk_size))
+            if not chunk:
+                break
+            conn.executemany('''
+                INSERT INTO enhanced_movies (title, genre, year, watched, rating, review, added_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+        conn.commit()
+    return db_path
+
+
+def _summarize_samples(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {'runs': 0}
+    return {
+        'runs': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def _time_once(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def _measure(func, repeats=5, before_each=None):
+    samples = []
+    for _ in range(repeats):
+        if before_each:
+            before_each()
+        samples.append(_time_once(func))
+    return _summarize_samples(samples)
+
+
+@contextmanager
+def benchmark_environment(stubs, workdir, unthrottled=True):
+    """Point CONFIG and the process-wide caches at the stubs and workdir,
+    restoring everything afterwards. The app database is swapped for a
+    seeded one in workdir, so chats never read or write the real
+    collection. unthrottled=False keeps the production rate limits."""
+    saved_config = {key: CONFIG.get(key) for key in
+                    ('database_url', 'omdb_cache_path', 'upstream_urls', 'rate_limits',
+                     'shared_rate_limit_path', 'omdb_api_key', 'gemini_api_key')}
+    saved_state = (_omdb_state['cache'], _gemini_state['cache'], dict(_rate_limiters), dict(_circuit_breakers))
+    bench_db = seed_benchmark_database(os.path.join(workdir, 'bench_app.db'), BENCHMARK_ENV_ROWS)
+    CONFIG.update({
+        'database_url': bench_db,
+        'omdb_cache_path': os.path.join(workdir, 'bench_omdb_cache.db'),
+        'upstream_urls': {name: stub.url for name, stub in stubs.items()},
+        # The stubs are local: measure our code, not the production quotas
+        'rate_limits': ({name: {'rate': 1000.0, 'burst': 1000} for name in UPSTREAM_LIMITS}
+                        if unthrottled else CONFIG.get('rate_limits', {})),
+        'shared_rate_limit_path': None,
+        'omdb_api_key': CONFIG.get('omdb_api_key') or 'benchmark',
+        'gemini_api_key': CONFIG.get('gemini_api_key') or 'benchmark',
+    })
+    _omdb_state['cache'] = None
+    _gemini_state['cache'] = GeminiResponseCache()
+    _rate_limiters.clear()
+    _circuit_breakers.clear()
+    _batch_collection_rows.cache_clear()
+    try:
+        yield
+    finally:
+        if _omdb_state['cache'] is not None:
+            _omdb_state['cache'].close()
+        bench_conn = getattr(_db_local, 'connections', {}).pop(bench_db, None)
+        if bench_conn is not None:
+            bench_conn.close()
+        for key, value in saved_config.items():
+            if value is None:
+                CONFIG.pop(key, None)
+            else:
+                CONFIG[key] = value
+        _omdb_state['cache'], _gemini_state['cache'] = saved_state[0], saved_state[1]
+        _rate_limiters.clear()
+        _rate_limiters.update(saved_state[2])
+        _circuit_breakers.clear()
+        _circuit_breakers.update(saved_state[3])
+        _batch_collection_rows.cache_clear()
+
+
+def _bench_ai_finder(queries):
+    """End-to-end search_all_sources latency, cold (empty cache) then warm"""
+    get_omdb_response_cache().clear()
+    run = lambda query: [results for _, results, _ in search_all_sources(query)]
+    cold = [_time_once(lambda: run(q)) for q in queries]
+    warm = [_time_once(lambda: run(q)) for q in queries]
+    return {'cold': _summarize_samples(cold), 'warm': _summarize_samples(warm)}
+
+
+def _bench_gemini_chat(queries):
+    chat = StreamingGeminiMovieChat()
+    ask = lambda query: chat.respond(f"recommend something like {query}")
+    cold = [_time_once(lambda: ask(q)) for q in queries]
+    warm = [_time_once(lambda: ask(q)) for q in queries]
+    return {'cold': _summarize_samples(cold), 'warm': _summarize_samples(warm)}
+
+
+def _bench_chat_intents(movie_data, rounds):
+    """generate_ai_response latency and throughput per classified intent"""
+    classifier = get_chat_intent_classifier()
+    by_intent = {}
+    for message in CHAT_BENCHMARK_MESSAGES:
+        by_intent.setdefault(classifier.classify(message)[0], []).append(message)
+
+    chat = AdvancedAIChat()
+    chat.generate_ai_response("hello", movie_data)  # builds the title index once
+    results = {}
+    for intent, messages in sorted(by_intent.items()):
+        samples = [
+            _time_once(lambda: chat.generate_ai_response(message, movie_data))
+            for _ in range(rounds) for message in messages
+        ]
+        summary = _summarize_samples(samples)
+        summary['per_second'] = round(len(samples) / sum(samples), 1) if sum(samples) else None
+        results[intent] = summary
+    return results
+
+
+def _bench_recommenders(movie_data, queries, max_rows):
+    rows = movie_data[:max_rows]
+    movies = [{'title': m[1], 'genre': m[2], 'year': m[3]} for m in rows]
+    results = {'rows': len(movies)}
+    try:
+        from recommender import tfidf_recommend
+    except ImportError as e:
+        results['tfidf_recommend'] = {'skipped': f"recommender unavailable: {e}"}
+    else:
+        results['tfidf_recommend'] = _summarize_samples([
+            _time_once(lambda: tfidf_recommend(q, movies)) for q in queries
+        ])
+
+    index = RecommendationIndex()
+    fit_seconds = _time_once(lambda: index.fit([dict(m, plot='') for m in movies]))
+    results['recommendation_index_fit_ms'] = round(fit_seconds * 1000, 3)
+    results['recommendation_index_query'] = _summarize_samples([
+        _time_once(lambda: index.query(q)) for q in queries
+    ])
+    return results
+
+
+def _bench_database(db_path, repeats, chat_rounds, queries, tfidf_max_rows):
+    previous = CONFIG['database_url']
+    CONFIG['database_url'] = db_path
+    clear_page_cache = getattr(get_movies_paginated, 'clear', None)
+    try:
+        results = {
+            'get_stats': _measure(get_stats, repeats),
+            'get_stats_incremental': _measure(get_stats_incremental, repeats),
+            'get_movies_paginated_first_page': _measure(
+                lambda: get_movies_paginated(0, 20), repeats, clear_page_cache),
+            'get_movies_paginated_deep_page': _measure(
+                lambda: get_movies_paginated(get_stats_incremental()['total_movies'] // 40, 20),
+                repeats, clear_page_cache),
+            'get_movies_paginated_search': _measure(
+                lambda: get_movies_paginated(0, 20, {'search': 'dark', 'genre': 'All', 'watched': 'All'}),
+                repeats, clear_page_cache),
+        }
+        init_data_layer()
+        middle = get_db_connection().execute(
+            'SELECT added_at, id FROM enhanced_movies ORDER BY added_at DESC, id DESC LIMIT 1 OFFSET ?',
+            (get_stats_incremental()['total_movies'] // 2,)
+        ).fetchone()
+        results.update({
+            'get_movies_page_first': _measure(lambda: get_movies_page(None, 20), repeats),
+            'get_movies_page_deep': _measure(lambda: get_movies_page(tuple(middle), 20), repeats),
+            'get_movies_page_search': _measure(
+                lambda: get_movies_page(None, 20, {'search': 'dark', 'genre': 'All', 'watched': 'All'}),
+                repeats),
+            'search_movies_fts': _measure(lambda: search_movies_fts('dark knight'), repeats),
+        })
+        movie_data = get_movies_safe()
+        results['analytics_charts'] = _measure(
+            lambda: create_advanced_analytics_charts(movie_data), max(1, repeats // 2))
+        init_analytics_store()
+        results['analytics_snapshot'] = _measure(get_analytics_snapshot, repeats)
+        results['analytics_charts_incremental'] = _measure(create_analytics_charts_incremental, repeats)
+        results['chat_intents'] = _bench_chat_intents(movie_data, chat_rounds)
+        results['recommenders'] = _bench_recommenders(movie_data, queries, tfidf_max_rows)
+        return results
+    finally:
+        CONFIG['database_url'] = previous
+
+
+def run_benchmark_suite(sizes=BENCHMARK_SIZES, output_path='benchmark_results.json',
+                        workdir='benchmark_data', stub_configs=None, repeats=5,
+                        chat_rounds=3, queries=BENCHMARK_QUERIES, tfidf_max_rows=100000, seed=0):
+    """Run every benchmark against local stubs and seeded databases.
+
+    stub_configs maps 'omdb' / 'gemini' / 'crunchyroll' to a
+    StubUpstreamConfig (latency, jitter, error_rate, rate_429). Results,
+    the stub settings and the telemetry counters are written to
+    output_path as JSON so runs can be diffed.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    random.seed(seed)  # the API fallbacks draw random ids
+    stub_configs = stub_configs or {}
+    stubs = {
+        name: StubUpstreamServer(name, stub_configs.get(name), seed).start()
+        for name in ('omdb', 'gemini', 'crunchyroll')
+    }
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': {
+            'sizes': list(sizes), 'repeats': repeats, 'chat_rounds': chat_rounds,
+            'queries': list(queries), 'tfidf_max_rows': tfidf_max_rows, 'seed': seed,
+            'stubs': {name: vars(stub.config) for name, stub in stubs.items()},
+        },
+        'results': {},
+    }
+    telemetry.reset()
+    try:
+        with benchmark_environment(stubs, workdir):
+            report['results']['ai_finder_search'] = _bench_ai_finder(queries)
+            report['results']['gemini_chat'] = _bench_gemini_chat(queries)
+            for rows in sizes:
+                db_path = os.path.join(workdir, f"bench_{rows}.db")
+                started = time.perf_counter()
+                seed_benchmark_database(db_path, rows, seed)
+                logging.info(f"Benchmark database with {rows} rows ready in {time.perf_counter() - started:.1f}s")
+                report['results'][f"db_{rows}"] = _bench_database(
+                    db_path, repeats, chat_rounds, queries, tfidf_max_rows)
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+    report['stub_counters'] = {name: dict(stub.counters) for name, stub in stubs.items()}
+    report['telemetry'] = {
+        key: value for key, value in telemetry.snapshot().items() if key != 'recent_spans'
+    }
+    report['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+# -----------------------------
+# AI Finder Service API + Batch CLI (no Streamlit widgets)
+# -----------------------------
+# Usage (app.py's __main__ can dispatch `python app.py batch ...` here):
+#   python -c "import sys, app; sys.exit(app.ai_finder_batch_cli(sys.argv[1:]))" \
+#       queries.jsonl --concurrency 8 > results.jsonl
+# Each input line is {"type": "search", "query": "..."} or
+# {"type": "chat", "message": "...", "backend": "gemini" | "assistant"};
+# an optional "id" is echoed back. Output lines arrive in completion order.
+BATCH_DEFAULT_CONCURRENCY = 4
+
+
+def finder_search(query, deadline=AI_FINDER_SEARCH_DEADLINE, details=False):
+    """AI Finder search without the page: every source in parallel, local
+    fallback for late, failed or tripped sources ('fallback' maps those to
+    their status). details=True also fetches (and so caches) OMDB details
+    for the first page of movie results."""
+    results, fallback = {}, {}
+    for source, hits, status in search_all_sources(query, deadline):
+        results[source] = hits
+        if status:
+            fallback[source] = status
+        if details and source == 'movies':
+            list(enrich_movies_bulk(
+                [(r.get('Title'), r.get('Year')) for r in hits[:AI_FINDER_PAGE_SIZE] if r.get('Title')]
+            ))
+    return {'results': results, 'fallback': fallback}
+
+
+def finder_chat(message, backend='gemini', movie_data=None):
+    """One chat turn without the page: the Gemini chat (shared answer cache)
+    or the rule-based assistant over movie_data (collection rows)."""
+    if backend == 'gemini':
+        answer, movies = StreamingGeminiMovieChat().respond(message)
+        return {'answer': answer, 'movies': movies}
+    if backend == 'assistant':
+        return {'answer': AdvancedAIChat(interactive=False).generate_ai_response(message, movie_data or [])}
+    raise ValueError(f"Unknown chat backend: {backend!r}")
+
+
+def run_batch_query(request, movie_data=None):
+    """Run one parsed JSONL request; always returns a JSON-ready result dict"""
+    kind = request.get('type', 'search')
+    text = request.get('query') or request.get('message') or ''
+    out = {'id': request.get('id'), 'type': kind, 'query': text}
+    started = time.perf_counter()
+    try:
+        with telemetry.span(f"batch.{kind}"):
+            if kind == 'search':
+                out.update(finder_search(text, request.get('deadline', AI_FINDER_SEARCH_DEADLINE),
+                                         request.get('details', False)))
+            elif kind == 'chat':
+                backend = request.get('backend', 'gemini')
+                if backend == 'assistant' and movie_data is None:
+                    movie_data = _batch_collection_rows()
+                out.update(finder_chat(text, backend, movie_data))
+            else:
+                raise ValueError(f"Unknown query type: {kind!r}")
+        out['ok'] = True
+    except Exception as e:
+        logging.error(f"Batch query {out['id']!r} failed: {e}")
+        out.update(ok=False, error=str(e))
+    out['seconds'] = round(time.perf_counter() - started, 4)
+    return out
+
+
+def iter_batch_requests(lines):
+    """Parsed requests from JSONL lines; bad lines become error results"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            yield number, {'error': f"line {number}: {e}"}
+            continue
+        request.setdefault('id', number)
+        yield number, request
+
+
+def run_batch(lines, concurrency=BATCH_DEFAULT_CONCURRENCY, movie_data=None):
+    """Yield results for JSONL request lines (any iterable, e.g. an open
+    file) as they complete.
+
+    At most `concurrency` queries run at once and only that many more are
+    read ahead, so huge files stream in constant memory. Upstream calls go
+    through the usual token buckets and breakers, so a batch never exceeds
+    the app's rate limits (share them with a running app through
+    CONFIG['shared_rate_limit_path']).
+    """
+    concurrency = max(1, int(concurrency))
+    requests_iter = iter_batch_requests(lines)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ai-finder-batch") as executor:
+        in_flight = set()
+        for number, request in requests_iter:
+            if 'error' in request:
+                yield {'id': number, 'ok': False, 'error': request['error'], 'seconds': 0.0}
+                continue
+            in_flight.add(executor.submit(run_batch_query, request, movie_data))
+            if len(in_flight) >= concurrency * 2:
+                done = next(as_completed(in_flight))
+                in_flight.discard(done)
+                yield done.result()
+        for future in as_completed(in_flight):
+            yield future.result()
+
+
+@lru_cache(maxsize=1)
+def _batch_collection_rows():
+    """Collection rows for assistant chats (read once per batch process)"""
+    try:
+        return get_db_connection().execute(
+            'SELECT * FROM enhanced_movies ORDER BY added_at DESC'
+        ).fetchall()
+    except sqlite3.Error as e:
+        logging.warning(f"Batch mode runs assistant chats without the collection: {e}")
+        return []
+
+
+def _write_batch_results(results, out):
+    """Write results as JSONL while they arrive; returns (seconds list, failures)"""
+    samples, failures = [], 0
+    for result in results:
+        samples.append(result['seconds'])
+        failures += not result['ok']
+        out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+    return samples, failures
+
+
+def ai_finder_batch_cli(argv=None):
+    """Command-line entry point; returns the process exit code"""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog="ai-finder-batch",
+        description="Run AI Finder search/chat queries from JSONL and stream JSONL results to stdout.")
+    parser.add_argument('input', help="JSONL file of queries ('-' reads stdin)")
+    parser.add_argument('--concurrency', type=int, default=BATCH_DEFAULT_CONCURRENCY,
+                        help="queries in flight at once (default: %(default)s)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="answer from local stub upstreams instead of OMDb/Gemini/Crunchyroll")
+    parser.add_argument('--stub-latency', type=float, default=0.05,
+                        help="dry run: stub response latency in seconds (default: %(default)s)")
+    parser.add_argument('--unthrottled', action='store_true',
+                        help="dry run: lift the production rate limits")
+    parser.add_argument('--summary', action='store_true',
+                        help="print latency percentiles to stderr when done")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    stubs = {}
+    try:
+        with ExitStack() as stack:
+            if args.dry_run:
+                config = StubUpstreamConfig(latency=args.stub_latency, jitter=args.stub_latency / 4)
+                for name in ('omdb', 'gemini', 'crunchyroll'):
+                    stubs[name] = StubUpstreamServer(name, config).start()
+                workdir = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(benchmark_environment(stubs, workdir, unthrottled=args.unthrottled))
+            samples, failures = _write_batch_results(run_batch(source, args.concurrency), sys.stdout)
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+        if source is not sys.stdin:
+            source.close()
+
+    if args.summary:
+        sys.stderr.write(json.dumps({'failed': failures, **_summarize_samples(samples)}) + "\n")
+    return 1 if failures else 0
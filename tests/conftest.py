@@ -0,0 +1,98 @@
+"""Fixtures that run ai_finder.py the way it ships: pasted into the
+namespace of CodeFlix's app.py (taken from CodeFlix.zip).
+
+The fragment is executed once per test session, like one Streamlit server
+process; process_singleton() state is therefore shared between tests the
+same way it is shared between reruns.
+"""
+import importlib
+import os
+import socket
+import sys
+import zipfile
+
+import pytest
+
+for _dependency in ('streamlit', 'requests', 'numpy', 'pandas', 'plotly', 'matplotlib', 'PIL'):
+    pytest.importorskip(_dependency)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRAGMENT = os.path.join(ROOT, 'ai_finder.py')
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """app.py with ai_finder.py executed in its namespace"""
+    workdir = tmp_path_factory.mktemp('codeflix')
+    with zipfile.ZipFile(os.path.join(ROOT, 'CodeFlix.zip')) as archive:
+        archive.extractall(workdir)
+    app_dir = str(workdir / 'CodeFlix')
+    sys.path.insert(0, app_dir)
+    cwd = os.getcwd()
+    os.chdir(app_dir)  # app.py logs to ./codeflix.log and imports ./seed.py
+    try:
+        module = importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
+    module.CONFIG.update({
+        'database_url': str(workdir / 'movies.db'),
+        'omdb_cache_path': str(workdir / 'omdb_cache.db'),
+        'recommendation_index_path': str(workdir / 'recommendation_index'),
+        'omdb_api_key': 'test',
+        'gemini_api_key': 'test',
+        'max_retries': 2,
+    })
+    with open(FRAGMENT, encoding='utf-8') as f:
+        # The real path lets st.cache_resource read the decorated sources
+        exec(compile(f.read(), FRAGMENT, 'exec'), module.__dict__)
+    yield module
+    sys.path.remove(app_dir)
+
+
+@pytest.fixture
+def db(app, tmp_path, monkeypatch):
+    """A fresh, migrated (and seeded) app database for one test"""
+    path = str(tmp_path / 'movies.db')
+    monkeypatch.setitem(app.CONFIG, 'database_url', path)
+    app.ensure_schema_once()
+    return path
+
+
+@pytest.fixture
+def empty_db(app, tmp_path, monkeypatch):
+    """A fresh app database with init_db()'s schema and no movies"""
+    path = str(tmp_path / 'movies.db')
+    monkeypatch.setitem(app.CONFIG, 'database_url', path)
+    app.init_db()
+    return path
+
+
+@pytest.fixture
+def stub_configs():
+    """Per-upstream StubUpstreamConfig overrides; tests override this fixture"""
+    return {}
+
+
+@pytest.fixture
+def upstreams(app, tmp_path, stub_configs):
+    """Local stub OMDb/Gemini/Crunchyroll servers with fresh limiters,
+    breakers and response caches (benchmark_environment) around the test"""
+    stubs = {
+        name: app.StubUpstreamServer(name, stub_configs.get(name, app.StubUpstreamConfig(latency=0.01, jitter=0))).start()
+        for name in ('omdb', 'gemini', 'crunchyroll')
+    }
+    try:
+        with app.benchmark_environment(stubs, str(tmp_path)):
+            yield stubs
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+
+@pytest.fixture
+def dead_url():
+    """A local URL nothing listens on (connection refused)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
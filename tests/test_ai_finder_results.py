@@ -0,0 +1,72 @@
+"""AI Finder results memo and paging (user-012)"""
+from collections import OrderedDict
+
+import pytest
+
+
+@pytest.fixture
+def panel(app, upstreams, monkeypatch):
+    """render_ai_finder_search_panel() with a typed-in query and a plain memo"""
+    memo = OrderedDict()
+    searches = []
+    search_all_sources = app.search_all_sources
+
+    def counting_search(query, *args, **kwargs):
+        searches.append(query)
+        return search_all_sources(query, *args, **kwargs)
+
+    monkeypatch.setattr(app, 'get_ai_finder_memo', lambda: memo)
+    monkeypatch.setattr(app, 'search_all_sources', counting_search)
+    monkeypatch.setattr(app, 'display_enhanced_search_result', lambda *args: None)
+    # Background prefetches would outlive the stubs and run into later tests
+    monkeypatch.setattr(app, 'prefetch_movie_details', lambda results: None)
+
+    def run(query):
+        monkeypatch.setattr(app.st, 'text_input', lambda *args, **kwargs: query)
+        app.render_ai_finder_search_panel()
+
+    run.memo, run.searches = memo, searches
+    return run
+
+
+def _entry(fallback=None):
+    return {'results': {'movies': []}, 'fallback': fallback or {}, 'shown': {'movies': 6}}
+
+
+def test_rerun_with_the_same_query_does_not_search_again(panel):
+    panel("Heat")
+    panel("  heat ")
+    assert panel.searches == ["Heat"]
+    assert list(panel.memo) == ["heat"]
+
+
+def test_memo_keeps_the_most_recent_queries(app):
+    memo = OrderedDict()
+    for n in range(app.AI_FINDER_MEMO_QUERIES + 2):
+        app._remember_search(memo, f"query {n}", _entry())
+    assert len(memo) == app.AI_FINDER_MEMO_QUERIES
+    assert "query 0" not in memo and "query 1" not in memo
+
+
+def test_degraded_results_expire_and_are_searched_again(app, panel):
+    panel.memo["heat"] = dict(_entry({'movies': 'failed'}), expires_at=0)
+    panel("heat")
+    assert panel.searches == ["heat"]
+
+
+def test_live_results_do_not_expire(app):
+    memo = OrderedDict()
+    app._remember_search(memo, "live", _entry())
+    app._remember_search(memo, "degraded", _entry({'anime': 'slow'}))
+    assert 'expires_at' not in memo["live"]
+    assert memo["degraded"]['expires_at'] > 0
+
+
+def test_show_more_reveals_the_next_page_and_prefetches_it(app, monkeypatch):
+    prefetched = []
+    monkeypatch.setattr(app, 'prefetch_movie_details', prefetched.append)
+    results = [{'Title': f"Movie {n}"} for n in range(15)]
+    entry = {'results': {'movies': results}, 'fallback': {}, 'shown': {'movies': app.AI_FINDER_PAGE_SIZE}}
+    app._show_more_results(entry, 'movies')
+    assert entry['shown']['movies'] == 2 * app.AI_FINDER_PAGE_SIZE
+    assert prefetched == [results[app.AI_FINDER_PAGE_SIZE:2 * app.AI_FINDER_PAGE_SIZE]]
@@ -0,0 +1,116 @@
+"""Trigger-maintained analytics store for the collection charts (user-017)"""
+import io
+import json
+
+import pytest
+
+
+def _scan(app):
+    """The chart counts get_analytics_snapshot() reports, straight from enhanced_movies"""
+    genre_counts, watch_counts, year_counts, rating_counts = {}, {'Watched': 0, 'Unwatched': 0}, {}, {}
+    for genre, watched, year, rating in app.get_db_connection().execute(
+            'SELECT genre, watched, year, rating FROM enhanced_movies'):
+        genre_counts[genre] = genre_counts.get(genre, 0) + 1
+        watch_counts['Watched' if watched == 1 else 'Unwatched'] += 1
+        if year:
+            year_counts[year] = year_counts.get(year, 0) + 1
+        if rating:
+            rating_counts[rating] = rating_counts.get(rating, 0) + 1
+    return {'genre_counts': genre_counts, 'watch_counts': watch_counts,
+            'year_counts': dict(sorted(year_counts.items())), 'rating_counts': dict(sorted(rating_counts.items()))}
+
+
+def _counts(snapshot):
+    return {key: snapshot[key] for key in ('genre_counts', 'watch_counts', 'year_counts', 'rating_counts')}
+
+
+def _rebuilt(app):
+    with app.db_transaction() as c:
+        app._rebuild_analytics(c)
+    return app.get_analytics_snapshot()
+
+
+@pytest.fixture
+def analytics_db(app, db):
+    assert app.init_analytics_store()
+    return db
+
+
+def _insert(app, title, **columns):
+    columns = {'title': title, 'genre': "Drama", **columns}
+    with app.db_transaction() as c:
+        c.execute(f"INSERT INTO enhanced_movies ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                  tuple(columns.values()))
+        return c.lastrowid
+
+
+def test_backfilled_from_existing_rows(app, analytics_db):
+    snapshot = app.get_analytics_snapshot()
+    assert _counts(snapshot) == _scan(app)
+    assert sum(snapshot['monthly_added'].values()) == snapshot['watch_counts']['Watched'] + \
+        snapshot['watch_counts']['Unwatched']
+
+
+def test_insert_update_delete_keep_counts_in_step(app, analytics_db):
+    movie_id = _insert(app, "Analytics Movie", genre="Brand New Genre", year=1901, rating=3, watched=1,
+                       added_at='1999-12-31 10:00:00')
+    snapshot = app.get_analytics_snapshot()
+    assert _counts(snapshot) == _scan(app)
+    assert snapshot['genre_watch']["Brand New Genre"] == {'Watched': 1, 'Unwatched': 0}
+    assert snapshot['monthly_added']['1999-12'] == 1
+
+    with app.db_transaction() as c:
+        c.execute("UPDATE enhanced_movies SET watched = 0, year = 1902, added_at = '2000-01-01' WHERE id = ?",
+                  (movie_id,))
+    snapshot = app.get_analytics_snapshot()
+    assert _counts(snapshot) == _scan(app)
+    assert 1901 not in snapshot['year_counts'] and '1999-12' not in snapshot['monthly_added']
+
+    app.delete_movie(movie_id)
+    snapshot = app.get_analytics_snapshot()
+    assert _counts(snapshot) == _scan(app)
+    assert "Brand New Genre" not in snapshot['genre_counts']
+    assert snapshot == _rebuilt(app)
+
+
+def test_null_and_undated_rows_land_in_the_zero_buckets(app, analytics_db):
+    before = app.get_analytics_snapshot()
+    _insert(app, "Analytics Nulls", year=None, rating=None, watched=None, added_at=None)
+    after = app.get_analytics_snapshot()
+    assert after['year_counts'] == before['year_counts']
+    assert after['rating_counts'] == before['rating_counts']
+    assert after['watch_counts']['Unwatched'] == before['watch_counts']['Unwatched'] + 1
+    assert after == _rebuilt(app)
+
+
+def test_bulk_import_adds_what_the_triggers_would(app, analytics_db):
+    lines = [json.dumps({'title': f"Analytics Bulk {n}", 'year': 1950 + n % 3, 'rating': n % 6,
+                         'genre': "Bulk Genre", 'added_at': '2001-02-03'}) for n in range(30)]
+    source = io.BytesIO("\n".join(lines).encode('utf-8'))
+    source.name = 'bulk.jsonl'
+    assert app.bulk_import_movies(source, enrich=False).inserted == 30
+
+    snapshot = app.get_analytics_snapshot()
+    assert snapshot['genre_counts']["Bulk Genre"] == 30
+    assert snapshot['monthly_added']['2001-02'] == 30
+    assert _counts(snapshot) == _scan(app)
+    assert snapshot == _rebuilt(app)
+    triggers = {name for (name,) in app.get_db_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_analytics_%'")}
+    assert triggers == {'trg_analytics_insert', 'trg_analytics_update', 'trg_analytics_delete'}
+
+
+def test_charts_match_the_dataframe_version(app, analytics_db):
+    charts = app.create_analytics_charts_incremental()
+    expected = app.create_advanced_analytics_charts(app.get_movies_safe())
+    assert [chart is None for chart in charts[:5]] == [chart is None for chart in expected[:5]]
+    snapshot = app.get_analytics_snapshot()
+    assert sum(sum(trace['y']) for trace in charts[5].data) == sum(snapshot['genre_counts'].values())
+    assert sum(charts[0].data[0]['values']) == sum(snapshot['genre_counts'].values())
+    assert list(charts[1].data[0]['y']) + list(charts[1].data[1]['y']) == [
+        snapshot['watch_counts']['Watched'], snapshot['watch_counts']['Unwatched']]
+
+
+def test_empty_collection_has_no_charts(app, empty_db):
+    assert app.init_analytics_store()
+    assert app.create_analytics_charts_incremental() == (None,) * 6
@@ -0,0 +1,66 @@
+"""Bulk streaming-availability snapshot (user-010)"""
+import time
+
+import pytest
+
+
+@pytest.fixture
+def snapshot(app, db):
+    """The snapshot after the background refresh a fresh database starts"""
+    snapshot = app.get_availability_snapshot()
+    deadline = time.monotonic() + 10
+    while app._availability_refreshing.is_set() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not snapshot.is_stale()
+    return snapshot
+
+
+def _add(app, title, year=2001, genre="Drama"):
+    with app.db_transaction() as c:
+        c.execute("INSERT INTO enhanced_movies (title, genre, year) VALUES (?, ?, ?)", (title, genre, year))
+        return c.lastrowid
+
+
+def test_one_snapshot_per_database(app, snapshot):
+    assert app.get_availability_snapshot() is snapshot
+    assert snapshot.db_path == app.CONFIG['database_url']
+
+
+def test_entries_are_deterministic(app, snapshot):
+    first = snapshot.compute_entry("Some Film", 2001, "Drama")
+    assert snapshot.compute_entry("  some film ", 2001, "Drama") == first
+    assert app.StreamingAvailabilitySnapshot().compute_entry("Some Film", 2001, "Drama") == first
+
+
+def test_non_ascii_titles_hit_the_snapshot(app, snapshot, monkeypatch):
+    movie_id = _add(app, "  ÉTÉ À Amélie ")
+    snapshot.build()
+
+    def no_build(movies=None):
+        raise AssertionError(f"rebuilt {movies}")
+    monkeypatch.setattr(snapshot, 'build', no_build)
+    options = snapshot.get_watch_options_bulk([movie_id])
+    assert options[movie_id] == snapshot.get_watch_options("  ÉTÉ À Amélie ", 2001, "Drama")
+
+
+def test_miss_computes_the_entry_once(app, snapshot, monkeypatch):
+    calls = []
+    compute_entry = snapshot.compute_entry
+    monkeypatch.setattr(snapshot, 'compute_entry', lambda *args: (calls.append(args), compute_entry(*args))[1])
+    snapshot.get_watch_options("Never Seen Before", 1999, "Drama")
+    assert len(calls) == 1
+    snapshot.get_watch_options("Never Seen Before", 1999, "Drama")
+    assert len(calls) == 1
+
+
+def test_bulk_fills_missing_entries_once(app, snapshot, monkeypatch):
+    ids = [_add(app, "Bulk One"), _add(app, "Bulk Two", year=None)]
+    calls = []
+    compute_entry = snapshot.compute_entry
+    monkeypatch.setattr(snapshot, 'compute_entry', lambda *args: (calls.append(args), compute_entry(*args))[1])
+    options = snapshot.get_watch_options_bulk(ids)
+    assert set(options) == set(ids)
+    assert len(calls) == 2
+    assert snapshot.get_watch_options_bulk(ids) == options
+    assert len(calls) == 2
+    assert options[ids[0]] == snapshot.expand("Bulk One", 2001, *compute_entry("Bulk One", 2001, "Drama"))
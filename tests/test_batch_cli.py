@@ -0,0 +1,87 @@
+"""UI-free AI Finder service API and the JSONL batch CLI (user-020)"""
+import json
+import os
+import threading
+import time
+
+
+def test_requests_are_parsed_and_bad_lines_reported(app):
+    lines = ['{"type": "search", "query": "heat"}', '', '{"id": "x", "type": "chat", "message": "hi"}',
+             '{broken', '["not", "an", "object"]']
+    parsed = list(app.iter_batch_requests(lines))
+    assert [number for number, _ in parsed] == [1, 3, 4, 5]
+    assert parsed[0][1]['id'] == 1
+    assert parsed[1][1]['id'] == "x"
+    assert parsed[2][1]['error'].startswith("line 4:")
+    assert "expected a JSON object" in parsed[3][1]['error']
+
+
+def test_batch_answers_searches_and_chats(app, upstreams):
+    lines = [
+        json.dumps({'id': "s", 'type': "search", 'query': "heat"}),
+        json.dumps({'id': "g", 'type': "chat", 'message': "recommend a heist movie"}),
+        json.dumps({'id': "a", 'type': "chat", 'message': "how many movies do I have", 'backend': "assistant"}),
+        json.dumps({'id': "u", 'type': "lookup", 'query': "heat"}),
+        "not json",
+    ]
+    results = {result['id']: result for result in app.run_batch(lines, concurrency=2)}
+    assert set(results) == {"s", "g", "a", "u", 5}
+    assert results["s"]['ok'] and results["s"]['results']['movies']
+    assert results["g"]['ok'] and results["g"]['answer']
+    assert results["a"]['ok'] and results["a"]['answer']
+    assert not results["u"]['ok'] and "Unknown query type" in results["u"]['error']
+    assert not results[5]['ok'] and results[5]['error'].startswith("line 5:")
+
+
+def test_concurrency_and_read_ahead_are_bounded(app, monkeypatch):
+    lock, running, peak, read = threading.Lock(), [0], [0], [0]
+
+    def slow_query(request, movie_data=None):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return {'id': request['id'], 'ok': True, 'seconds': 0.02}
+
+    def lines():
+        for n in range(40):
+            read[0] += 1
+            yield json.dumps({'query': f"q{n}"})
+
+    monkeypatch.setattr(app, 'run_batch_query', slow_query)
+    results = app.run_batch(lines(), concurrency=3)
+    next(results)
+    assert read[0] <= 3 * 2 + 1
+    assert len(list(results)) == 39
+    assert peak[0] <= 3
+
+
+def test_dry_run_uses_stubs_and_leaves_the_real_database_alone(app, tmp_path, monkeypatch, capsys):
+    real_db = str(tmp_path / 'never_created.db')
+    monkeypatch.setitem(app.CONFIG, 'database_url', real_db)
+    queries = tmp_path / 'queries.jsonl'
+    queries.write_text("\n".join([
+        json.dumps({'type': "search", 'query': "inception"}),
+        json.dumps({'type': "chat", 'message': "what haven't I watched?", 'backend': "assistant"}),
+    ]) + "\n", encoding='utf-8')
+
+    code = app.ai_finder_batch_cli([str(queries), '--dry-run', '--unthrottled', '--stub-latency', '0.01',
+                                    '--summary'])
+    out, err = capsys.readouterr()
+    results = [json.loads(line) for line in out.splitlines()]
+    assert code == 0
+    assert sorted(result['id'] for result in results) == [1, 2]
+    assert all(result['ok'] for result in results)
+    assert json.loads(err)['failed'] == 0
+    assert not os.path.exists(real_db)
+    assert app.CONFIG['database_url'] == real_db
+
+
+def test_failed_queries_set_the_exit_code(app, tmp_path, capsys):
+    queries = tmp_path / 'queries.jsonl'
+    queries.write_text(json.dumps({'type': "chat", 'message': "hi", 'backend': "nope"}) + "\n", encoding='utf-8')
+    assert app.ai_finder_batch_cli([str(queries), '--dry-run', '--unthrottled', '--stub-latency', '0.01']) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert not result['ok'] and "Unknown chat backend" in result['error']
@@ -0,0 +1,57 @@
+"""Benchmark stand-ins and the benchmark environment (user-014)"""
+import sqlite3
+
+import pytest
+import requests
+
+
+def test_stub_answers_are_deterministic(app):
+    stubs = [app.StubUpstreamServer('omdb', app.StubUpstreamConfig(latency=0, jitter=0)).start() for _ in range(2)]
+    try:
+        answers = [requests.get(stub.url, params={'t': "Heat"}, timeout=5).json() for stub in stubs]
+        assert answers[0] == answers[1] and answers[0]['Title'] == "Heat"
+        assert requests.get(stubs[0].url, params={'s': "heat"}, timeout=5).json()['totalResults']
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+
+def test_stub_error_and_throttle_rates(app):
+    stub = app.StubUpstreamServer('omdb', app.StubUpstreamConfig(latency=0, jitter=0, rate_429=1.0)).start()
+    try:
+        assert requests.get(stub.url, params={'t': "Heat"}, timeout=5).status_code == 429
+        stub.config.rate_429, stub.config.error_rate = 0.0, 1.0
+        assert requests.get(stub.url, params={'t': "Heat"}, timeout=5).status_code >= 500
+        assert stub.counters == {'requests': 2, 'errors': 1, 'throttled': 1}
+    finally:
+        stub.stop()
+
+
+def test_seeded_database_is_reproducible_and_reused(app, tmp_path):
+    first = app.seed_benchmark_database(str(tmp_path / 'a.db'), 300, seed=1)
+    second = app.seed_benchmark_database(str(tmp_path / 'b.db'), 300, seed=1)
+    query = 'SELECT title, watched, rating, added_at FROM enhanced_movies ORDER BY id'
+    with sqlite3.connect(first) as a, sqlite3.connect(second) as b:
+        assert a.execute(query).fetchall() == b.execute(query).fetchall()
+    assert app.seed_benchmark_database(first, 300, seed=2) == first  # same size: reused
+
+
+def test_environment_is_restored(app, tmp_path):
+    saved = dict(app.CONFIG)
+    cache = app.get_omdb_response_cache()
+    stubs = {name: app.StubUpstreamServer(name).start() for name in ('omdb', 'gemini', 'crunchyroll')}
+    try:
+        with app.benchmark_environment(stubs, str(tmp_path)):
+            assert app.CONFIG['upstream_urls']['omdb'] == stubs['omdb'].url
+            assert app.CONFIG['database_url'] != saved['database_url']
+            bench_cache = app.get_omdb_response_cache()
+            assert bench_cache is not cache
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+    assert app.CONFIG == saved
+    assert app.get_omdb_response_cache() is cache
+    # A background lookup still holding the benchmark cache gets a miss, not a crash
+    with pytest.raises(sqlite3.ProgrammingError):
+        bench_cache.get({'t': "Heat"})
+    assert app.get_omdb_client()._cached(bench_cache, {'t': "Heat"}) is None
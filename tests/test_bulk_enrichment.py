@@ -0,0 +1,45 @@
+"""Deduplicated bulk enrichment and search-result prefetch (user-009)"""
+import time
+
+
+def _wait_until_cached(app, items, timeout=5.0):
+    cache = app.get_omdb_response_cache()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(cache.get(app.omdb_details_params(item)) is not None for item in items):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_duplicates_are_fetched_once(app, upstreams):
+    items = [("Heat", 1995), ("heat ", "1995"), ("Ronin", 1998), ("Heat", 1995)]
+    results = list(app.enrich_movies_bulk(items))
+    assert sorted(map(repr, (item for item, _ in results))) == sorted(map(repr, items))
+    assert all(details and details['Response'] == "True" for _, details in results)
+    assert upstreams['omdb'].counters['requests'] == 2
+
+
+def test_cache_hits_are_not_fetched_again(app, upstreams):
+    list(app.enrich_movies_bulk([("Heat", 1995)]))
+    list(app.enrich_movies_bulk([("Heat", 1995), "tt0113277"]))
+    assert upstreams['omdb'].counters['requests'] == 2
+
+
+def test_pending_lookups_time_out_as_none(app, upstreams):
+    upstreams['omdb'].config.latency = 1.0
+    results = list(app.enrich_movies_bulk([("Slow Movie", 2001)], timeout=0.1))
+    assert results == [(("Slow Movie", 2001), None)]
+
+
+def test_prefetched_results_serve_the_card_views(app, upstreams):
+    search_results = app._search_movie_source("heat")[:3]
+    assert search_results
+    app.prefetch_movie_details(search_results)
+    items = [(r['Title'], r['Year']) for r in search_results]
+    assert _wait_until_cached(app, items)
+    requests_made = upstreams['omdb'].counters['requests']
+
+    for index, result in enumerate(search_results):
+        app.display_enhanced_search_result(result, 'movie', index)
+    assert upstreams['omdb'].counters['requests'] == requests_made
@@ -0,0 +1,89 @@
+"""Streaming bulk import: rejected rows, id validation, background rate tier (user-016)"""
+import io
+import json
+
+import pytest
+
+
+def _import(app, lines, **kwargs):
+    source = io.BytesIO("\n".join(lines).encode('utf-8'))
+    source.name = 'history.jsonl'
+    return app.bulk_import_movies(source, enrich=False, **kwargs)
+
+
+def test_non_object_jsonl_lines_are_counted_invalid(app, db):
+    report = _import(app, [
+        json.dumps({'title': "Import Test One", 'year': 2001}),
+        json.dumps(["Import Test Two", 2002]),
+        json.dumps("Import Test Three"),
+        "42",
+        "null",
+        "{not json",
+        json.dumps({'title': "Import Test Four", 'year': 2004}),
+    ])
+    assert report.read == 7
+    assert report.inserted == 2
+    assert report.invalid == 5
+
+
+def test_rows_without_a_title_are_invalid(app, db):
+    report = _import(app, [json.dumps({'year': 1999}), json.dumps({'title': "   ", 'year': 1999})])
+    assert (report.inserted, report.invalid) == (0, 2)
+
+
+def test_duplicates_in_the_file_and_the_table_are_skipped(app, db):
+    _import(app, [json.dumps({'title': "Import Dupe", 'year': 2010, 'imdbID': "tt7654321"})])
+    report = _import(app, [
+        json.dumps({'title': "import dupe", 'year': 2010}),
+        json.dumps({'title': "Renamed", 'year': 2011, 'imdbID': "tt7654321"}),
+        json.dumps({'title': "Import Fresh", 'year': 2012}),
+        json.dumps({'title': "Import Fresh", 'year': 2012}),
+    ])
+    assert (report.inserted, report.duplicates) == (1, 3)
+
+
+def test_details_id_must_be_an_imdb_id(app):
+    field_map = app.import_field_map(['title', 'imdbID', 'url'])
+    record = app.normalize_import_record({'title': "X", 'imdbID': " tt0113277 ", 'url': ""}, 2024, field_map)
+    assert record['details_id'] == "tt0113277"
+    record = app.normalize_import_record(
+        {'title': "X", 'imdbID': "12345", 'url': "https://www.imdb.com/title/tt0122690/"}, 2024, field_map)
+    assert record['details_id'] == "tt0122690"
+    assert not app.is_imdb_id("local:0123456789ab")
+    assert not app.is_imdb_id("Heat")
+
+
+def test_rows_with_a_non_imdb_id_are_not_enriched(app, db, upstreams):
+    _import(app, [
+        json.dumps({'title': "Import Skip Me", 'year': 2003, 'imdbID': "letterboxd-123"}),
+        json.dumps({'title': "Import Enrich Me", 'year': 2003}),
+    ])
+    conn = app.get_db_connection()
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM enhanced_movies WHERE details_id = 'letterboxd-123' OR title = 'Import Enrich Me'")]
+    skipped = app.BULK_ENRICHMENT_STATUS['skipped']
+
+    assert app.enrich_collection_rows(ids) == 1
+    assert app.BULK_ENRICHMENT_STATUS['skipped'] == skipped + 1
+    assert upstreams['omdb'].counters['requests'] == 1
+    plot = conn.execute("SELECT plot FROM enhanced_movies WHERE details_id = 'letterboxd-123'").fetchone()[0]
+    assert plot is None
+
+
+def test_background_requests_queue_on_the_bulk_bucket_first(app, upstreams):
+    assert app._limiters_for('omdb') == [app.get_rate_limiter('omdb')]
+    with app.background_requests():
+        assert app._limiters_for('omdb') == [app.get_rate_limiter('omdb_bulk'), app.get_rate_limiter('omdb')]
+        assert app._limiters_for('gemini') == [app.get_rate_limiter('gemini')]
+    assert app._limiters_for('omdb') == [app.get_rate_limiter('omdb')]
+
+
+def test_exhausted_bulk_bucket_leaves_interactive_calls_alone(app, upstreams):
+    app._rate_limiters['omdb_bulk'] = app.TokenBucket(rate=0.01, burst=1)
+    url = upstreams['omdb'].url
+    params = {'apikey': 'test', 't': "Heat"}
+    with app.background_requests():
+        assert app.upstream_request('omdb', 'GET', url, params=params).status_code == 200
+        with pytest.raises(app.APIError):
+            app.upstream_request('omdb', 'GET', url, params=params)
+    assert app.upstream_request('omdb', 'GET', url, params=params).status_code == 200
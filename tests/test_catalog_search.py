@@ -0,0 +1,31 @@
+"""Ranked local catalogue search for the offline fallback (user-011)"""
+import re
+
+
+def test_catalog_ids_are_stable_and_not_imdb_ids(app):
+    catalog_id = app.stable_catalog_id("The Matrix", 1999)
+    assert catalog_id == app.stable_catalog_id("the  matrix", 1999)
+    assert catalog_id != app.stable_catalog_id("The Matrix", 2003)
+    assert catalog_id.startswith("local:")
+    assert not re.fullmatch(r"tt\d+", catalog_id)
+    assert "i" not in app.omdb_details_params(catalog_id)
+
+
+def test_local_results_never_carry_imdb_ids(app):
+    results = app.get_omdb_client()._search_local_database("matrix", "movie")
+    assert results and results[0]['Title'] == "The Matrix"
+    assert all(r['imdbID'].startswith("local:") for r in results)
+
+
+def test_prefix_exact_and_typo_matches(app):
+    index = app.get_catalog_search_index()
+    assert index.search("The Matrix", kind='movie')[0]['title'] == "The Matrix"
+    assert index.search("matr", kind='movie')[0]['title'].startswith("The Matrix")
+    assert index.search("inceptoin", kind='movie')[0]['title'] == "Inception"
+
+
+def test_kind_filter_and_limit(app):
+    index = app.get_catalog_search_index()
+    anime = index.search("demon slayer", kind='anime', limit=2)
+    assert anime and len(anime) <= 2
+    assert all(entry['kind'] == 'anime' for entry in anime)
@@ -0,0 +1,35 @@
+"""ChatIntentClassifier: one compiled scan, priority order, genre signals (user-004)"""
+import pytest
+
+
+@pytest.fixture
+def classifier(app):
+    return app.get_chat_intent_classifier()
+
+
+@pytest.mark.parametrize('text, intent', [
+    ("Where can I stream Inception?", 'streaming'),
+    ("What should I watch tonight?", 'recommendation'),
+    ("buy   ticket for Dune", 'ticketing'),
+    ("Hi there", 'greeting'),
+    ("tell me about Heat", 'details'),
+    ("Show my collection stats", 'analysis'),
+    ("this is nothing in particular", 'fallback'),  # "this" is not "hi"
+    ("high-octane thrills", 'fallback'),  # "hi" inside a hyphenated word
+])
+def test_intent(classifier, text, intent):
+    assert classifier.classify(text)[0] == intent
+
+
+def test_first_listed_intent_wins(classifier):
+    # 'best' and 'recommendation' both match; recommendation is listed first
+    assert classifier.classify("recommend the best comedy")[0] == 'recommendation'
+
+
+def test_genre_signals_are_collected_once_in_order(classifier):
+    assert classifier.classify("a funny space comedy")[1] == ['comedy', 'sci-fi']
+    assert classifier.classify("science  fiction about aliens")[1] == ['sci-fi']
+
+
+def test_compiled_once_per_process(app, classifier):
+    assert app.get_chat_intent_classifier() is classifier
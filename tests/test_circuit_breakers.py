@@ -0,0 +1,181 @@
+"""Circuit breakers, deadlines and jittered retries for upstream calls (user-019)"""
+import time
+
+import pytest
+
+RESET = 0.05
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def breaker(app, request, tmp_path):
+    if request.param == 'sqlite':
+        return app.SQLiteCircuitBreaker('test', failure_threshold=2, reset_timeout=RESET,
+                                        db_path=str(tmp_path / 'breakers.db'))
+    return app.CircuitBreaker('test', failure_threshold=2, reset_timeout=RESET)
+
+
+def _state(breaker):
+    return breaker._locked(lambda now: breaker.state)
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert _state(breaker) == 'open'
+
+
+def test_opens_after_consecutive_failures_only(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert _state(breaker) == 'closed'
+    breaker.record_failure()
+    assert _state(breaker) == 'open'
+
+
+def test_open_breaker_fails_fast_until_the_reset_timeout(breaker):
+    _open(breaker)
+    assert breaker.is_open()
+    assert not breaker.allow()
+    time.sleep(RESET)
+    assert not breaker.is_open()
+
+
+def test_half_open_lets_exactly_one_probe_through(breaker):
+    _open(breaker)
+    time.sleep(RESET)
+    assert breaker.allow()
+    assert _state(breaker) == 'half_open'
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(breaker):
+    _open(breaker)
+    time.sleep(RESET)
+    assert breaker.allow()
+    breaker.record_success()
+    assert _state(breaker) == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_at_once(breaker):
+    _open(breaker)
+    time.sleep(RESET)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert _state(breaker) == 'open'
+    assert not breaker.allow()
+
+
+def test_released_probe_goes_to_the_next_caller(breaker):
+    _open(breaker)
+    time.sleep(RESET)
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_another_reset_timeout(breaker):
+    _open(breaker)
+    time.sleep(RESET)
+    assert breaker.allow()
+    time.sleep(RESET)
+    assert breaker.allow()
+
+
+def test_sqlite_breakers_share_state(app, tmp_path):
+    path = str(tmp_path / 'breakers.db')
+    first = app.SQLiteCircuitBreaker('omdb', failure_threshold=1, reset_timeout=30, db_path=path)
+    second = app.SQLiteCircuitBreaker('omdb', failure_threshold=1, reset_timeout=30, db_path=path)
+    first.record_failure()
+    assert second.is_open()
+    assert not second.allow()
+
+
+@pytest.fixture
+def omdb_breaker(app, upstreams, monkeypatch):
+    monkeypatch.setitem(app.CONFIG, 'circuit_breakers', {'omdb': {'failure_threshold': 2, 'reset_timeout': RESET}})
+    return app.get_circuit_breaker('omdb')
+
+
+def test_upstream_5xx_opens_the_breaker_and_later_calls_skip_the_network(app, upstreams, omdb_breaker):
+    omdb = upstreams['omdb']
+    omdb.config.error_rate = 1.0
+    for _ in range(2):
+        assert app.upstream_request('omdb', 'GET', omdb.url, params={'t': "Heat"}).status_code >= 500
+    assert app.circuit_breaker_states()['omdb'] == 'open'
+
+    sent = omdb.counters['requests']
+    with pytest.raises(app.CircuitOpenError):
+        app.upstream_request('omdb', 'GET', omdb.url, params={'t': "Heat"})
+    assert omdb.counters['requests'] == sent
+
+    omdb.config.error_rate = 0.0
+    time.sleep(RESET)
+    assert app.upstream_request('omdb', 'GET', omdb.url, params={'t': "Heat"}).status_code == 200
+    assert app.circuit_breaker_states()['omdb'] == 'closed'
+
+
+def test_429_does_not_count_against_the_upstream(app, upstreams, omdb_breaker):
+    upstreams['omdb'].config.rate_429 = 1.0
+    for _ in range(3):
+        assert app.upstream_request('omdb', 'GET', upstreams['omdb'].url, params={'t': "Heat"}).status_code == 429
+    assert app.circuit_breaker_states()['omdb'] == 'closed'
+
+
+def test_expired_deadline_releases_a_claimed_probe(app, upstreams, omdb_breaker):
+    for _ in range(2):
+        omdb_breaker.record_failure()
+    time.sleep(RESET)
+    with app.request_deadline(0):
+        with pytest.raises(app.DeadlineExceededError):
+            app.upstream_request('omdb', 'GET', upstreams['omdb'].url, params={'t': "Heat"})
+    assert app.upstream_request('omdb', 'GET', upstreams['omdb'].url, params={'t': "Heat"}).status_code == 200
+
+
+def test_nested_deadlines_only_tighten(app):
+    assert app.deadline_remaining() == float('inf')
+    with app.request_deadline(0.5):
+        with app.request_deadline(10):
+            assert app.deadline_remaining() <= 0.5
+        with app.request_deadline(0.1):
+            assert app.deadline_remaining() <= 0.1
+        assert 0.1 < app.deadline_remaining() <= 0.5
+    assert app.deadline_remaining() == float('inf')
+
+
+def test_backoff_is_jittered_and_capped(app):
+    for attempt in range(12):
+        delays = [app.backoff_delay(attempt) for _ in range(50)]
+        assert all(0 <= d <= min(app.RETRY_BACKOFF_CAP, app.RETRY_BACKOFF_BASE * 2 ** attempt) for d in delays)
+        assert len(set(delays)) > 1
+
+
+def test_retries_stop_at_the_callers_deadline(app, upstreams, monkeypatch):
+    upstreams['omdb'].config.error_rate = 1.0
+    monkeypatch.setattr(app, 'backoff_delay', lambda attempt: 5.0)
+    started = time.monotonic()
+    with app.request_deadline(1.0):
+        assert app.get_omdb_client()._fetch_omdb({'t': "Heat"}, max_retries=5) is None
+    assert time.monotonic() - started < 1.0
+    assert upstreams['omdb'].counters['requests'] == 1
+
+
+def test_retries_recover_from_transient_errors(app, upstreams, monkeypatch):
+    upstreams['omdb'].config.error_rate = 1.0
+    monkeypatch.setattr(app, 'backoff_delay', lambda attempt: 0.0)
+    calls = []
+    upstream_request = app.upstream_request
+
+    def flaky_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            upstreams['omdb'].config.error_rate = 0.0
+        return upstream_request(*args, **kwargs)
+
+    monkeypatch.setattr(app, 'upstream_request', flaky_once)
+    data = app.get_omdb_client()._fetch_omdb({'t': "Heat"}, max_retries=3)
+    assert data['Title'] == "Heat"
+    assert len(calls) == 2
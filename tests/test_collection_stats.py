@@ -0,0 +1,77 @@
+"""Trigger-maintained collection statistics (user-006)"""
+import pytest
+
+
+def _scan(app):
+    """The same figures as get_stats(), straight from enhanced_movies"""
+    total, watched, rating_sum, rated, in_theaters, genres = app.get_db_connection().execute('''
+        SELECT COUNT(*), IFNULL(SUM(watched = 1), 0), IFNULL(SUM(CASE WHEN rating > 0 THEN rating END), 0),
+               IFNULL(SUM(rating > 0), 0), IFNULL(SUM(ticket_available = 1), 0), COUNT(DISTINCT genre)
+        FROM enhanced_movies
+    ''').fetchone()
+    return {
+        'total_movies': total,
+        'watched_count': watched,
+        'completion_rate': watched / total * 100 if total else 0,
+        'unique_genres': genres,
+        'average_rating': rating_sum / rated if rated else 0,
+        'in_theaters_count': in_theaters,
+    }
+
+
+@pytest.fixture
+def stats_db(app, db):
+    app.init_collection_stats()
+    return db
+
+
+def _insert(app, title, genre="Drama", **columns):
+    columns = {'title': title, 'genre': genre, **columns}
+    with app.db_transaction() as c:
+        c.execute(f"INSERT INTO enhanced_movies ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                  tuple(columns.values()))
+        return c.lastrowid
+
+
+def test_backfilled_from_existing_rows(app, stats_db):
+    assert app.get_stats_incremental() == pytest.approx(_scan(app))
+
+
+def test_insert_update_delete_keep_counts_in_step(app, stats_db):
+    movie_id = _insert(app, "Stats Movie", genre="Brand New Genre", watched=1, rating=4, ticket_available=1)
+    assert app.get_stats_incremental() == pytest.approx(_scan(app))
+
+    with app.db_transaction() as c:
+        c.execute("UPDATE enhanced_movies SET watched = 0, rating = 2, genre = 'Other New Genre' WHERE id = ?",
+                  (movie_id,))
+    assert app.get_stats_incremental() == pytest.approx(_scan(app))
+
+    app.delete_movie(movie_id)
+    stats = app.get_stats_incremental()
+    assert stats == pytest.approx(_scan(app))
+    genres = {genre for (genre,) in app.get_db_connection().execute('SELECT genre FROM collection_genre_counts')}
+    assert 'Other New Genre' not in genres
+
+
+def test_null_columns_count_as_zero(app, stats_db):
+    before = app.get_stats_incremental()
+    movie_id = _insert(app, "All Nulls", watched=None, rating=None, ticket_available=None)
+    after = app.get_stats_incremental()
+    assert after['total_movies'] == before['total_movies'] + 1
+    assert after == pytest.approx(_scan(app))
+
+    with app.db_transaction() as c:
+        c.execute("UPDATE enhanced_movies SET watched = 1, rating = 5, ticket_available = 1 WHERE id = ?",
+                  (movie_id,))
+        c.execute("UPDATE enhanced_movies SET watched = NULL, rating = NULL, ticket_available = NULL WHERE id = ?",
+                  (movie_id,))
+    assert app.get_stats_incremental() == pytest.approx(_scan(app))
+    app.delete_movie(movie_id)
+    assert app.get_stats_incremental() == pytest.approx(_scan(app))
+
+
+def test_verify_rebuilds_after_drift(app, stats_db):
+    with app.db_transaction() as c:
+        c.execute('UPDATE collection_stats SET watched_count = watched_count + 7')
+    assert app.get_stats_incremental(verify=True) == pytest.approx(_scan(app))
+    assert app.get_stats_incremental() == pytest.approx(_scan(app))
@@ -0,0 +1,76 @@
+"""Pooled connections, keyset pagination and FTS5 search (user-015)"""
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def movies(app, empty_db):
+    """23 movies; added_at has ties so the id tiebreak is exercised"""
+    rows = [(f"Movie {n:02d}", "Drama" if n % 2 else "Comedy", 2000 + n, n % 3 == 0,
+             f"2024-01-{1 + n // 4:02d} 12:00:00") for n in range(23)]
+    with app.db_transaction() as c:
+        c.executemany("INSERT INTO enhanced_movies (title, genre, year, watched, added_at) VALUES (?, ?, ?, ?, ?)",
+                      rows)
+    app.init_data_layer()
+    return app.get_db_connection().execute(
+        'SELECT id FROM enhanced_movies ORDER BY added_at DESC, id DESC').fetchall()
+
+
+def _walk(app, page_size, filters=None):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = app.get_movies_page(cursor, page_size, filters)
+        pages.append([row[0] for row in rows])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('page_size', [1, 5, 10, 23, 50])
+def test_pages_cover_every_row_once_in_order(app, movies, page_size):
+    pages = _walk(app, page_size)
+    assert [movie_id for page in pages for movie_id in page] == [movie_id for (movie_id,) in movies]
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert pages[-1]  # no trailing empty page, even when the size divides evenly
+
+
+def test_empty_collection(app, empty_db):
+    assert app.get_movies_page(None, 10) == ([], None)
+
+
+def test_filters_and_counts(app, movies):
+    watched = [movie_id for page in _walk(app, 4, {'watched': 'Watched'}) for movie_id in page]
+    assert len(watched) == 8 == app.count_movies({'watched': 'Watched'})
+    comedy = [movie_id for page in _walk(app, 4, {'genre': 'Comedy', 'watched': 'Unwatched'}) for movie_id in page]
+    assert len(comedy) == app.count_movies({'genre': 'Comedy', 'watched': 'Unwatched'}) == 8
+    assert app.count_movies() == 23
+
+
+def test_full_text_search(app, movies):
+    with app.db_transaction() as c:
+        c.execute("INSERT INTO enhanced_movies (title, genre, year, plot) VALUES "
+                  "('Arrival', 'Sci-Fi', 2016, 'A linguist decodes an alien language')")
+    assert [row[1] for row in app.search_movies_fts("linguist")] == ["Arrival"]
+    assert [row[1] for row in app.search_movies_fts("arriv")] == ["Arrival"]  # prefix
+    assert app.search_movies_fts('"); DROP TABLE enhanced_movies; --') == []
+    assert app.count_movies({'search': 'alien'}) == 1
+
+
+def test_connections_are_pooled_per_thread(app, empty_db):
+    conn = app.get_db_connection()
+    assert app.get_db_connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    other = []
+    thread = threading.Thread(target=lambda: other.append(app.get_db_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_failed_transaction_rolls_back(app, movies):
+    with pytest.raises(RuntimeError):
+        with app.db_transaction() as c:
+            c.execute("DELETE FROM enhanced_movies")
+            raise RuntimeError("abort")
+    assert app.count_movies({'genre': 'Drama'}) == 11
+    assert not app.get_db_connection().in_transaction
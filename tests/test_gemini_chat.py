@@ -0,0 +1,56 @@
+"""Streaming Gemini chat: answer cache, single-flight and fallbacks (user-007)"""
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def chat(app, upstreams):
+    return app.StreamingGeminiMovieChat()
+
+
+def test_streamed_answer_is_cached(app, upstreams, chat):
+    partials = []
+    answer, _ = chat.respond("Recommend a heist movie", on_partial=partials.append)
+    assert answer and partials
+    assert all("MOVIES:" not in partial for partial in partials)
+    requests_made = upstreams['gemini'].counters['requests']
+
+    assert chat.respond("  recommend a HEIST movie!")[0] == answer
+    assert upstreams['gemini'].counters['requests'] == requests_made
+
+
+def test_concurrent_identical_questions_ask_once(app, upstreams, chat):
+    upstreams['gemini'].config.latency = 0.3
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(chat.respond("Space operas please")[0]))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upstreams['gemini'].counters['requests'] == 1
+    assert len(set(answers)) == 1
+
+
+def test_unreachable_gemini_answers_locally(app, upstreams, chat, dead_url, monkeypatch):
+    monkeypatch.setitem(app.CONFIG['upstream_urls'], 'gemini', dead_url)
+    answer, _ = chat.respond("The Dark Knight")
+    assert answer.startswith("⚠ The AI assistant is temporarily unavailable")
+    # Local answers are not cached, and the claim was released
+    cache = app.get_gemini_response_cache()
+    assert cache.get(cache.make_key("The Dark Knight")) is None
+    assert not cache.inflight
+
+
+def test_failed_leader_releases_its_claim(app, upstreams, chat, monkeypatch):
+    def broken_prompt(user_message):
+        raise RuntimeError("prompt template broken")
+    monkeypatch.setattr(app, 'build_movie_chat_prompt', broken_prompt)
+    with pytest.raises(RuntimeError):
+        chat.respond("Anything")
+
+    cache = app.get_gemini_response_cache()
+    assert not cache.inflight
+    claimed, _ = cache.claim(cache.make_key("Anything"))
+    assert claimed
@@ -0,0 +1,60 @@
+"""Shared OMDB client, response cache and single-flight lookups (user-001)"""
+import threading
+
+
+def test_one_client_and_streaming_finder_per_process(app):
+    client = app.get_omdb_client()
+    assert app.get_omdb_client() is client
+    assert client.streaming_finder is app.get_streaming_finder()
+    assert app.AdvancedAIChat(interactive=False).omdb is client
+
+
+def test_client_reads_config_on_every_call(app, upstreams):
+    client = app.get_omdb_client()
+    assert client.base_url == upstreams['omdb'].url + "/"
+    assert client.api_key == app.CONFIG['omdb_api_key']
+
+
+def test_cache_key_ignores_api_key_and_case(app, upstreams):
+    cache = app.get_omdb_response_cache()
+    assert cache.make_key({'apikey': 'a', 't': 'Heat '}) == cache.make_key({'apikey': 'b', 't': 'heat'})
+    assert cache.make_key({'t': 'Heat', 'y': 1995}) == cache.make_key({'t': 'heat', 'y': '1995'})
+
+
+def test_detail_lookups_are_served_from_the_shared_cache(app, upstreams):
+    omdb = upstreams['omdb']
+    first = app.get_movie_details_cached("Heat", 1995)
+    assert first['Title'] == "Heat"
+    assert omdb.counters['requests'] == 1
+
+    assert app.get_movie_details_cached("heat", 1995) == first
+    assert app.get_omdb_client().get_movie_details("Heat", "1995") == first
+    assert omdb.counters['requests'] == 1
+
+
+def test_not_found_is_cached_as_a_negative_entry(app, upstreams):
+    app.get_movie_details_cached("notfound title")
+    app.get_movie_details_cached("notfound title")
+    assert upstreams['omdb'].counters['requests'] == 1
+    assert app.get_omdb_response_cache().stats()['negative_hits'] == 1
+
+
+def test_concurrent_identical_lookups_are_coalesced(app, upstreams):
+    upstreams['omdb'].config.latency = 0.3
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(app.get_movie_details_cached("Ronin", 1998)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstreams['omdb'].counters['requests'] == 1
+    assert [r['Title'] for r in results] == ["Ronin"] * 5
+
+
+def test_card_and_detail_views_share_one_lookup(app, upstreams):
+    item = {'Title': "Heat", 'Year': 1995, 'Genre': "Crime"}
+    app.display_enhanced_search_result(item, 'movie', 0)
+    app.display_full_movie_details("Heat", 1995, "test")
+    assert upstreams['omdb'].counters['requests'] == 1
@@ -0,0 +1,35 @@
+"""process_singleton(): one object per name for the server process (user-003)"""
+import threading
+
+
+def test_factory_runs_once_per_name(app):
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    first = app.process_singleton('test.once', factory)
+    assert app.process_singleton('test.once', factory) is first
+    assert len(calls) == 1
+
+
+def test_concurrent_first_use_builds_one_object(app):
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def worker():
+        barrier.wait()
+        seen.append(app.process_singleton('test.concurrent', object))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(obj) for obj in seen}) == 1
+
+
+def test_shared_state_is_registered(app):
+    assert app.process_singleton('telemetry', app.PerfTelemetry) is app.telemetry
+    assert app.get_omdb_response_cache() is app.get_omdb_response_cache()
@@ -0,0 +1,58 @@
+"""Token-bucket limiters and pooled sessions per upstream (user-003)"""
+import threading
+import time
+
+
+def test_burst_is_free_then_callers_queue_at_the_rate(app):
+    bucket = app.TokenBucket(rate=20, burst=2)
+    assert bucket._reserve(0) == 0.0
+    assert bucket._reserve(0) == 0.0
+    wait = bucket._reserve(1.0)
+    assert 0.04 <= wait <= 0.05  # one token at 20/s
+    # The next caller queues behind the previous reservation
+    assert bucket._reserve(1.0) > wait
+
+
+def test_queue_longer_than_max_wait_is_rejected_without_a_token(app):
+    bucket = app.TokenBucket(rate=1, burst=1)
+    assert bucket.acquire(0)
+    assert not bucket.acquire(0.5)
+    assert bucket.tokens > -1  # the rejected caller did not reserve a slot
+
+
+def test_tokens_refill_up_to_burst_only(app):
+    bucket = app.TokenBucket(rate=100, burst=2)
+    bucket._reserve(0)
+    time.sleep(0.1)
+    bucket._reserve(0)
+    assert bucket.tokens <= 1.0
+
+
+def test_concurrent_callers_are_spaced_by_the_rate(app):
+    bucket = app.TokenBucket(rate=20, burst=1)
+    stamps = []
+    threads = [threading.Thread(target=lambda: (bucket.acquire(5), stamps.append(time.monotonic())))
+               for _ in range(5)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(stamps) - started >= 4 / 20 - 0.01
+
+
+def test_sqlite_bucket_is_shared_between_instances(app, tmp_path):
+    path = str(tmp_path / 'limits.db')
+    first = app.SQLiteTokenBucket('omdb', rate=1, burst=1, db_path=path)
+    second = app.SQLiteTokenBucket('omdb', rate=1, burst=1, db_path=path)
+    assert first.acquire(0)
+    assert not second.acquire(0)
+
+
+def test_limiter_and_session_are_one_per_upstream(app, monkeypatch):
+    monkeypatch.setitem(app.CONFIG, 'rate_limits', {'test-upstream': {'rate': 7}})
+    limiter = app.get_rate_limiter('test-upstream')
+    assert app.get_rate_limiter('test-upstream') is limiter
+    assert limiter.rate == 7
+    assert app.get_http_session('test-upstream') is app.get_http_session('test-upstream')
+    assert app.get_http_session('test-upstream') is not app.get_http_session('other-upstream')
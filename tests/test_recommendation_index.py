@@ -0,0 +1,58 @@
+"""Persistent TF-IDF recommendation index (user-008)"""
+import numpy as np
+import pytest
+
+DOCS = [
+    {'title': "Alien", 'genre': "Sci-Fi", 'year': 1979, 'plot': "A crew meets a deadly creature in space"},
+    {'title': "Heat", 'genre': "Crime", 'year': 1995, 'plot': "A detective hunts a crew of bank robbers"},
+    {'title': "Notting Hill", 'genre': "Romance", 'year': 1999, 'plot': "A bookseller falls for a film star"},
+    {'title': "Interstellar", 'genre': "Sci-Fi", 'year': 2014, 'plot': "Astronauts travel through a wormhole in space"},
+]
+
+
+@pytest.fixture
+def index(app):
+    return app.RecommendationIndex().fit(DOCS)
+
+
+def test_query_ranks_matching_documents(index):
+    results = index.query("space sci-fi", top_k=3)
+    assert {r['title'] for r in results} == {"Alien", "Interstellar"}
+    assert results[0]['similarity_score'] >= results[1]['similarity_score']
+
+
+def test_exclude_and_similar_to(app, index):
+    assert all(r['title'] != "Alien" for r in index.query("space", exclude={"alien"}))
+    assert index.similar_to("Alien", top_k=1)[0]['title'] == "Interstellar"
+
+
+def test_saved_index_loads_memory_mapped_with_the_same_scores(app, index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = app.RecommendationIndex.load(str(tmp_path))
+    assert isinstance(loaded.weights, np.memmap)
+    np.testing.assert_allclose(loaded.scores("crew in space"), index.scores("crew in space"), rtol=1e-6)
+
+
+def test_added_documents_are_queryable_before_a_refit(app, index):
+    base_terms = len(index.term_ptr) - 1
+    index.REFIT_RATIO = 10  # keep the new movie in the delta
+    index.add_documents([{'title': "Gravity", 'genre': "Sci-Fi", 'year': 2013, 'plot': "Stranded in orbit"}])
+    assert len(index.term_ptr) - 1 == base_terms
+    assert index.query("stranded orbit", top_k=1)[0]['title'] == "Gravity"
+
+
+def test_large_delta_triggers_a_refit(app, index):
+    index.add_documents([{'title': f"New {n}", 'genre': "Drama", 'year': 2020, 'plot': "quiet story"}
+                         for n in range(3)])
+    assert index.base_size == len(index.docs) == 7
+    assert not index.delta_postings
+
+
+def test_index_is_fitted_once_and_saved(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'recommendations')
+    monkeypatch.setitem(app.CONFIG, 'recommendation_index_path', path)
+    first = app.get_recommendation_index()
+    assert app.get_recommendation_index() is first
+    reloaded = app._load_recommendation_index(path)  # next server process
+    assert isinstance(reloaded.weights, np.memmap)
+    assert len(reloaded.docs) == len(first.docs)
@@ -0,0 +1,37 @@
+"""search_all_sources() statuses for live, failed, slow and tripped sources (user-002)"""
+
+
+def _statuses(app, query, **kwargs):
+    return {source: status for source, _, status in app.search_all_sources(query, **kwargs)}
+
+
+def test_live_sources_have_no_status(app, upstreams):
+    assert _statuses(app, "naruto") == {'movies': None, 'anime': None}
+
+
+def test_anime_error_is_reported_as_failed(app, upstreams):
+    upstreams['crunchyroll'].config.error_rate = 1.0
+    results = {source: (rows, status) for source, rows, status in app.search_all_sources("naruto")}
+    rows, status = results['anime']
+    assert status == 'failed'
+    assert rows  # local fallback answer
+    assert results['movies'][1] is None
+
+
+def test_search_anime_still_falls_back_without_raising(app, upstreams):
+    upstreams['crunchyroll'].config.error_rate = 1.0
+    assert app.SharedAnimeIntegration().search_anime("naruto")
+
+
+def test_source_missing_the_deadline_is_slow(app, upstreams):
+    upstreams['crunchyroll'].config.latency = 1.0
+    assert _statuses(app, "naruto", deadline=0.3)['anime'] == 'slow'
+
+
+def test_tripped_source_is_unavailable_and_not_queried(app, upstreams):
+    breaker = app.get_circuit_breaker('crunchyroll')
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    before = upstreams['crunchyroll'].counters['requests']
+    assert _statuses(app, "naruto")['anime'] == 'unavailable'
+    assert upstreams['crunchyroll'].counters['requests'] == before
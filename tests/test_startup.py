@@ -0,0 +1,127 @@
+"""Fast cold start: lazy imports, one-time schema init, background key check (user-018)"""
+import sys
+import time
+
+import pytest
+
+
+def _observations(app, operation):
+    return app.telemetry.snapshot()['operations'].get(operation, {}).get('count', 0)
+
+
+def _wait_for_verdict(app, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = app.get_api_key_status()
+        if status is not None:
+            return status
+        time.sleep(0.02)
+    return None
+
+
+def test_lazy_module_imports_on_first_attribute_access(app, monkeypatch):
+    monkeypatch.delitem(sys.modules, 'tabnanny', raising=False)
+    lazy = app.LazyModule('tabnanny')
+    assert 'tabnanny' not in sys.modules
+    assert "not loaded" in repr(lazy)
+
+    assert callable(lazy.check)
+    assert 'tabnanny' in sys.modules
+    assert "(loaded)" in repr(lazy)
+    assert _observations(app, "startup.import.tabnanny") == 1
+    lazy.check
+    assert _observations(app, "startup.import.tabnanny") == 1
+
+
+def test_heavy_modules_are_lazy_handles(app):
+    assert all(isinstance(module, app.LazyModule) for module in (app.px, app.pd, app.np))
+    assert app.pd.DataFrame({'a': [1, 2]})['a'].sum() == 3
+    assert app.np.zeros(3).shape == (3,)
+
+
+def test_schema_is_migrated_once_per_process(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.CONFIG, 'database_url', str(tmp_path / 'startup.db'))
+    migrations = app.telemetry.counters.get("startup.schema_migration", 0)
+    app.ensure_schema_once()
+    app.ensure_schema_once()
+    assert app.telemetry.counters["startup.schema_migration"] == migrations + 1
+
+    # Next process: the stamped database costs one metadata read
+    app._schema_ready.discard(app.CONFIG['database_url'])
+    app.ensure_schema_once()
+    assert app.telemetry.counters["startup.schema_migration"] == migrations + 1
+    assert app.CONFIG['database_url'] in app._schema_ready
+    assert app._read_app_metadata(app.get_db_connection())['schema_version'] == app.APP_SCHEMA_VERSION
+
+
+def test_outdated_schema_version_migrates_again(app, db):
+    with app.db_transaction() as c:
+        c.execute("UPDATE app_metadata SET value = '0' WHERE key = 'schema_version'")
+    app._schema_ready.discard(db)
+    migrations = app.telemetry.counters.get("startup.schema_migration", 0)
+    app.ensure_schema_once()
+    assert app.telemetry.counters["startup.schema_migration"] == migrations + 1
+    assert app._read_app_metadata(app.get_db_connection())['schema_version'] == app.APP_SCHEMA_VERSION
+
+
+class _Client:
+    def __init__(self, verdict):
+        self.verdict = verdict
+        self.calls = 0
+
+    def validate_api_key(self):
+        self.calls += 1
+        if isinstance(self.verdict, Exception):
+            raise self.verdict
+        return self.verdict
+
+
+@pytest.fixture
+def omdb_client(app, monkeypatch, request):
+    monkeypatch.setitem(app.CONFIG, 'omdb_api_key', f"key-for-{request.node.name}")
+    client = _Client(True)
+    monkeypatch.setattr(app, 'get_omdb_client', lambda: client)
+    return client
+
+
+def test_key_check_runs_in_the_background_once(app, omdb_client):
+    assert app.get_api_key_status() is None
+    assert _wait_for_verdict(app) is True
+    assert app.get_api_key_status() is True
+    assert omdb_client.calls == 1
+
+
+def test_failed_key_check_records_a_verdict(app, omdb_client):
+    omdb_client.verdict = RuntimeError("network down")
+    app.get_api_key_status()
+    assert _wait_for_verdict(app) is False
+
+
+def test_key_is_rechecked_after_the_ttl(app, omdb_client, monkeypatch):
+    app.get_api_key_status()
+    assert _wait_for_verdict(app) is True
+    omdb_client.verdict = False
+    monkeypatch.setattr(app, 'API_KEY_CHECK_TTL', 0)
+    assert app.get_api_key_status() is True  # the previous verdict while rechecking
+    monkeypatch.setattr(app, 'API_KEY_CHECK_TTL', 3600)
+    deadline = time.monotonic() + 5
+    while app.get_api_key_status() is not False and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert app.get_api_key_status() is False
+    assert omdb_client.calls == 2
+
+
+def test_main_uses_fast_startup_and_records_first_paint(app, db, omdb_client, monkeypatch):
+    pages = []
+    monkeypatch.setattr(app, 'init_db', lambda: pytest.fail("main() ran the full init"))
+    monkeypatch.setattr(app, 'inject_color_bends_background', lambda: None)
+    monkeypatch.setattr(app, 'inject_advanced_style', lambda: None)
+    monkeypatch.setattr(app.st, 'radio', lambda label, options, index=0: options[0])
+    monkeypatch.setattr(app, 'show_dashboard', lambda movies, stats: pages.append(stats['total_movies']))
+    monkeypatch.setitem(app._startup_state, 'first_paint_done', False)
+    first_paints = _observations(app, "startup.first_paint")
+
+    app.main()
+    app.main()
+    assert pages == [app.get_stats()['total_movies']] * 2
+    assert _observations(app, "startup.first_paint") == first_paints + 1
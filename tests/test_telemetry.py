@@ -0,0 +1,72 @@
+"""In-process telemetry: spans, histograms and exports (user-013)"""
+import pytest
+
+
+@pytest.fixture
+def telemetry(app):
+    return app.PerfTelemetry(recent_spans=3)
+
+
+def test_spans_record_parent_and_errors(telemetry):
+    with telemetry.span("outer"):
+        with pytest.raises(ValueError):
+            with telemetry.span("inner"):
+                raise ValueError("boom")
+    recent = telemetry.snapshot()['recent_spans']
+    assert [(s['operation'], s['parent'], s['error']) for s in recent] == [
+        ("inner", "outer", True), ("outer", None, False)]
+
+
+def test_histogram_buckets_and_quantiles(telemetry):
+    for seconds in (0.001, 0.002, 0.003, 0.2):
+        telemetry.observe("op", seconds)
+    op = telemetry.snapshot()['operations']['op']
+    assert op['count'] == 4
+    assert op['buckets']['0.005'] == 3 and op['buckets']['0.25'] == 1
+    assert op['p50_seconds'] == 0.005
+    assert op['p95_seconds'] == 0.2  # capped at the observed max
+    assert op['max_seconds'] == 0.2
+
+
+def test_traced_counts_and_recent_ring(telemetry):
+    @telemetry.traced("decorated")
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4
+    telemetry.count("cache_hit")
+    telemetry.count("cache_hit", 2)
+    for _ in range(5):
+        work(1)
+    snapshot = telemetry.snapshot()
+    assert snapshot['operations']['decorated']['count'] == 6
+    assert snapshot['counters'] == {'cache_hit': 3}
+    assert len(snapshot['recent_spans']) == 3
+
+
+def test_disabled_records_nothing(telemetry):
+    telemetry.enabled = False
+    with telemetry.span("op"):
+        telemetry.count("event")
+    assert telemetry.snapshot()['operations'] == {} and telemetry.snapshot()['counters'] == {}
+
+
+def test_prometheus_histograms_are_cumulative(telemetry):
+    telemetry.observe("op", 0.001)
+    telemetry.observe("op", 0.02)
+    telemetry.count("retry")
+    text = telemetry.to_prometheus()
+    assert 'codeflix_operation_duration_seconds_bucket{operation="op",le="0.005"} 1' in text
+    assert 'codeflix_operation_duration_seconds_bucket{operation="op",le="0.025"} 2' in text
+    assert 'codeflix_operation_duration_seconds_bucket{operation="op",le="+Inf"} 2' in text
+    assert 'codeflix_events_total{event="retry"} 1' in text
+
+
+def test_hot_paths_are_instrumented(app, upstreams):
+    app.telemetry.reset()
+    app.get_movie_details_cached("Heat", 1995)
+    app.get_movie_details_cached("Heat", 1995)
+    snapshot = app.telemetry.snapshot()
+    assert snapshot['counters']['omdb.cache_miss'] == 1
+    assert snapshot['counters']['omdb.cache_hit'] == 1
+    assert snapshot['operations']['http.omdb']['count'] == 1
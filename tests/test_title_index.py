@@ -0,0 +1,99 @@
+"""Collection title index kept in step through the change log (user-005)"""
+import pytest
+
+
+@pytest.fixture
+def index(app, db):
+    return app.get_collection_title_index()
+
+
+@pytest.fixture
+def no_rebuild(app, index, monkeypatch):
+    """Fail the test if the index is rebuilt instead of updated in place"""
+    def build(*args):
+        raise AssertionError("title index was rebuilt")
+    monkeypatch.setattr(index, 'build', build)
+
+
+def _count(app):
+    return app.get_db_connection().execute('SELECT COUNT(*) FROM enhanced_movies').fetchone()[0]
+
+
+def test_built_from_the_whole_collection(app, index):
+    assert index.total() == _count(app)
+    assert index.signature[0] == app.CONFIG['database_url']
+
+
+def test_insert_is_applied_without_a_rebuild(app, index, no_rebuild):
+    movie_id = app.add_movie("Zyxwv Unique Title", "Drama", 2031)
+    refreshed = app.get_collection_title_index()
+    assert refreshed.best_match("zyxwv unique")[0] == movie_id
+    assert refreshed.total() == _count(app)
+    # Newest first, like ORDER BY added_at DESC
+    assert refreshed.released_since(2031, limit=1)[0][0] == movie_id
+
+
+def test_rename_and_watched_toggle_are_applied(app, index, no_rebuild):
+    movie_id = app.add_movie("Before Rename Qwerty", "Drama", 2001)
+    app.get_collection_title_index()
+    watched = index.watched_count()
+
+    app.update_movie(movie_id, "After Rename Asdfg", "Drama", 2001)
+    app.toggle_watched_atomic(movie_id)
+    refreshed = app.get_collection_title_index()
+    assert refreshed.best_match("after rename asdfg")[0] == movie_id
+    assert refreshed.normalized[movie_id] == "after rename asdfg"
+    assert refreshed.watched_count() == watched + 1
+
+
+def test_delete_is_applied(app, index, no_rebuild):
+    movie_id = app.add_movie("Soon Deleted Hjkl", "Drama", 2001)
+    app.get_collection_title_index()
+    app.delete_movie(movie_id)
+    refreshed = app.get_collection_title_index()
+    assert movie_id not in refreshed.rows
+    assert refreshed.total() == _count(app)
+
+
+def test_unlogged_bump_forces_a_rebuild(app, index, monkeypatch):
+    with app.db_transaction() as c:
+        c.execute('UPDATE collection_version SET version = version + 1 WHERE id = 1')
+    builds = []
+    original = index.build
+    monkeypatch.setattr(index, 'build', lambda *args: (builds.append(1), original(*args)))
+    app.get_collection_title_index()
+    assert builds == [1]
+
+
+def test_large_delta_rebuilds(app, index, monkeypatch):
+    monkeypatch.setattr(app, 'TITLE_INDEX_MAX_DELTA', 1)
+    app.add_movie("Delta One", "Drama", 2001)
+    app.add_movie("Delta Two", "Drama", 2001)
+    builds = []
+    original = index.build
+    monkeypatch.setattr(index, 'build', lambda *args: (builds.append(1), original(*args)))
+    assert app.get_collection_title_index().total() == _count(app)
+    assert builds == [1]
+
+
+def test_change_log_is_pruned(app, index):
+    keep = app.COLLECTION_CHANGE_LOG_KEEP
+    with app.db_transaction() as c:
+        c.executemany("INSERT INTO enhanced_movies (title, genre, year) VALUES (?, 'Drama', 2001)",
+                      [(f"Log Entry {n}",) for n in range(keep + 50)])
+    conn = app.get_db_connection()
+    version = conn.execute('SELECT version FROM collection_version').fetchone()[0]
+    oldest, logged = conn.execute('SELECT MIN(version), COUNT(*) FROM collection_changes').fetchone()
+    assert logged == keep and oldest == version - keep + 1
+    # More changes than the log keeps: rebuilt, and still consistent
+    assert app.get_collection_title_index().total() == _count(app)
+
+
+def test_snapshot_reuses_an_open_transaction(app, db):
+    with app.db_transaction() as c:
+        c.execute("INSERT INTO enhanced_movies (title, genre, year) VALUES ('Uncommitted', 'Drama', 2001)")
+        with app.db_snapshot() as snapshot:
+            assert snapshot.execute(
+                "SELECT COUNT(*) FROM enhanced_movies WHERE title = 'Uncommitted'").fetchone()[0] == 1
+        assert c.connection.in_transaction
+    assert not app.get_db_connection().in_transaction